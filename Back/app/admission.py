@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+准入控制模块
+限制同时执行的下载数，超出的请求进入有界优先级队列（短视频优先于长视频），
+队列已满、租户超出配额或排队超时的请求立即返回429/503和重试时间，突发流量下不会全部一起变慢
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from app import profiling
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 请求优先级（数值越小越优先）
+PRIORITY_SHORT = 0  # 短视频平台
+PRIORITY_LONG = 1  # 长视频平台
+
+# 时长不超过该值（秒）的视频按短视频优先
+SHORT_VIDEO_SECONDS = 300
+
+# 默认租户
+DEFAULT_TENANT = "default"
+
+# 参与等待时间分位数统计的最近样本数
+WAIT_SAMPLES = 1000
+
+
+class AdmissionRejected(Exception):
+    """
+    请求被拒绝异常（服务繁忙）
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        """
+        初始化拒绝异常
+
+        参数:
+        - message: 错误信息
+        - status_code: HTTP状态码（429为租户超出配额，503为服务整体繁忙）
+        - retry_after: 建议的重试等待时间（秒）
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def priority_of(short_form: bool, duration: Optional[float] = None) -> int:
+    """
+    计算请求优先级：已知视频时长（信息缓存中有该链接）时按时长，否则按平台是否为短视频平台
+
+    参数:
+    - short_form: 平台是否为短视频平台
+    - duration: 视频时长（秒），未知时为None
+
+    返回:
+    - 请求优先级
+    """
+    if duration is not None:
+        return PRIORITY_SHORT if duration <= SHORT_VIDEO_SECONDS else PRIORITY_LONG
+    return PRIORITY_SHORT if short_form else PRIORITY_LONG
+
+
+def parse_tenant_limits(spec: Optional[str]) -> Dict[str, int]:
+    """
+    解析租户配额配置
+
+    参数:
+    - spec: 形如 "miniapp=32,partner=4" 的配置字符串
+
+    返回:
+    - 租户 -> 配额（同时执行和排队的请求数之和）
+    """
+    limits: Dict[str, int] = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, value = item.partition("=")
+        if not sep or not name.strip() or not value.strip().isdigit():
+            raise ValueError(f"无效的租户配额配置: {item}")
+        limits[name.strip()] = int(value)
+    return limits
+
+
+class AdmissionController:
+    """
+    准入控制类
+    名额释放时直接交给队列中优先级最高（同优先级先到先得）的请求
+    """
+
+    def __init__(self, max_active: int = 16, max_queue: int = 64, max_wait: float = 20.0,
+                 tenant_limits: Optional[Dict[str, int]] = None, default_tenant_limit: int = 0):
+        """
+        初始化准入控制
+
+        参数:
+        - max_active: 同时执行的请求数上限
+        - max_queue: 排队的请求数上限，超出时返回503
+        - max_wait: 默认的最长排队时间（秒），超时返回503
+        - tenant_limits: 各租户的配额（同时执行和排队的请求数之和），超出时返回429
+        - default_tenant_limit: 未配置租户的配额，0表示只受整体上限限制
+        """
+        self.max_active = max(1, max_active)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.tenant_limits = dict(tenant_limits or {})
+        self.default_tenant_limit = default_tenant_limit
+        self.active = 0  # 正在执行的请求数
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []  # (优先级, 序号, 等待者) 小顶堆
+        self._waiting = 0  # 排队中的请求数（堆中可能残留已放弃的等待者）
+        self._sequence = itertools.count()
+        self._tenants: Dict[str, int] = {}  # 租户 -> 执行和排队中的请求数
+        self._service_seconds = 1.0  # 平均执行时间（指数加权，用于估算重试时间）
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)  # 最近的排队时间
+        self._admitted = 0  # 准入的请求数
+        self._rejected: Dict[str, int] = {"tenant_limit": 0, "queue_full": 0, "timeout": 0}
+
+    def retry_after(self) -> float:
+        """
+        估算排队请求全部开始执行所需的时间（秒）
+
+        返回:
+        - 建议的重试等待时间
+        """
+        return max(1.0, (self._waiting + 1) * self._service_seconds / self.max_active)
+
+    def _reject(self, reason: str, message: str, status_code: int):
+        """记录并抛出拒绝异常"""
+        self._rejected[reason] += 1
+        logger.warning(f"拒绝请求（{reason}）: {message}")
+        raise AdmissionRejected(message, status_code, self.retry_after())
+
+    def check(self, tenant: str = DEFAULT_TENANT):
+        """
+        检查当前是否可以接收请求（不占用名额，用于异步任务提交时快速拒绝）
+
+        参数:
+        - tenant: 租户
+
+        异常:
+        - AdmissionRejected: 租户超出配额或队列已满
+        """
+        limit = self.tenant_limits.get(tenant, self.default_tenant_limit)
+        if limit and self._tenants.get(tenant, 0) >= limit:
+            self._reject("tenant_limit", f"租户 {tenant} 的请求数已达上限", 429)
+        if self.active >= self.max_active and self._waiting >= self.max_queue:
+            self._reject("queue_full", "服务繁忙，请稍后重试", 503)
+
+    @asynccontextmanager
+    async def admit(self, priority: int = PRIORITY_LONG, tenant: str = DEFAULT_TENANT,
+                    max_wait: Optional[float] = -1, check: bool = True) -> AsyncIterator[None]:
+        """
+        获取执行名额，名额已满时排队等待
+
+        参数:
+        - priority: 请求优先级
+        - tenant: 租户
+        - max_wait: 最长排队时间（秒），-1表示使用默认值，None表示不限
+        - check: 是否先检查配额和队列；已在接收时检查过的请求（异步任务、批量下载的项）传False，只排队不再拒绝
+
+        异常:
+        - AdmissionRejected: 租户超出配额、队列已满或排队超时
+        """
+        if check:
+            self.check(tenant)
+        if max_wait is not None and max_wait < 0:
+            max_wait = self.max_wait
+
+        self._tenants[tenant] = self._tenants.get(tenant, 0) + 1
+        try:
+            started = time.monotonic()
+            if self.active < self.max_active and self._waiting == 0:
+                self.active += 1
+            else:
+                await self._enqueue(priority, max_wait)
+            self._admitted += 1
+            self._waits.append(time.monotonic() - started)
+            profiling.add_span("admission_wait", self._waits[-1], priority=priority)
+
+            running = time.monotonic()
+            try:
+                yield
+            finally:
+                elapsed = time.monotonic() - running
+                self._service_seconds = 0.8 * self._service_seconds + 0.2 * elapsed
+                self._release()
+        finally:
+            self._tenants[tenant] -= 1
+            if not self._tenants[tenant]:
+                del self._tenants[tenant]
+
+    async def _enqueue(self, priority: int, max_wait: Optional[float]):
+        """
+        排队等待名额（名额由 _release 直接转交，active 不变）
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), max_wait)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                self._reject("timeout", "排队超时，服务繁忙，请稍后重试", 503)
+            # 超时的同时拿到了名额，继续执行
+        except asyncio.CancelledError:
+            # 调用方取消（如客户端断开），已转交的名额要归还
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            self._waiting -= 1
+
+    def _release(self):
+        """
+        释放名额：转交给优先级最高的等待者，没有等待者时减少执行数
+        """
+        while self._queue:
+            _, _, waiter = heapq.heappop(self._queue)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取准入控制统计信息
+
+        返回:
+        - 执行数、队列深度、排队时间分位数和拒绝次数
+        """
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))], 3) if waits else 0.0
+
+        return {
+            "max_active": self.max_active,
+            "active": self.active,
+            "max_queue": self.max_queue,
+            "queue_depth": self._waiting,
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "wait_seconds": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+            "avg_service_seconds": round(self._service_seconds, 2),
+            "tenants": dict(self._tenants),
+        }
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+批量下载模块
+并发执行多个下载请求，限制整体和每个平台的并发数，按完成顺序逐项返回结果
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+
+class BatchRunner:
+    """
+    批量任务执行类
+    每一项先获取平台并发名额，再获取整体并发名额，避免单个平台的排队项占满整体名额；
+    名额由所有批次共享，同时执行多个批次时总并发数仍不超过上限
+    """
+
+    def __init__(self, max_concurrency: int = 8):
+        """
+        初始化批量任务执行器
+
+        参数:
+        - max_concurrency: 所有批次同时执行的项数上限
+        """
+        self.max_concurrency = max_concurrency  # 整体并发上限
+        self._overall: Optional[asyncio.Semaphore] = None  # 整体并发名额（首次使用时创建）
+        self._groups: Dict[Hashable, asyncio.Semaphore] = {}  # 分组（平台） -> 并发名额
+
+    async def run(self, items: Sequence[Any], worker: Callable[[int, Any], Awaitable[Dict[str, Any]]],
+                  group_of: Callable[[Any], Optional[Hashable]],
+                  group_limit: Callable[[Hashable], int]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        并发执行所有项，按完成顺序返回结果
+
+        参数:
+        - items: 待执行的项
+        - worker: 执行单项的协程函数，参数为(序号, 项)，需要自行处理异常并返回结果字典
+        - group_of: 获取项所属分组（平台），无法识别时返回None
+        - group_limit: 获取分组的并发上限
+
+        返回:
+        - 结果异步迭代器（客户端断开时取消未完成的项）
+        """
+        if self._overall is None:
+            self._overall = asyncio.Semaphore(self.max_concurrency)
+        overall = self._overall
+        groups = self._groups
+
+        async def run_item(index: int, item: Any) -> Dict[str, Any]:
+            group = group_of(item)
+            if group is None:
+                async with overall:
+                    return await worker(index, item)
+            if group not in groups:
+                groups[group] = asyncio.Semaphore(max(1, group_limit(group)))
+            async with groups[group]:
+                async with overall:
+                    return await worker(index, item)
+
+        tasks: List[asyncio.Task] = [asyncio.ensure_future(run_item(i, item)) for i, item in enumerate(items)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            if pending:
+                logger.info(f"批量下载提前结束，取消 {len(pending)} 项")
+                for task in pending:
+                    task.cancel()
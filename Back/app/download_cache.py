@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+下载缓存模块
+使用SQLite索引记录已下载的视频文件，重复请求直接返回缓存结果，无需再次下载
+索引使用WAL模式，可在多个uvicorn工作进程之间共享
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app import metrics
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 索引表结构
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    cache_key TEXT PRIMARY KEY,      -- 缓存键：提取器 + 视频ID + 下载选项
+    extractor_key TEXT NOT NULL,     -- yt-dlp提取器标识
+    video_id TEXT NOT NULL,          -- 平台视频ID
+    options TEXT NOT NULL,           -- 下载选项签名
+    file_path TEXT NOT NULL,         -- 视频文件路径
+    file_size INTEGER,               -- 文件大小（字节）
+    duration REAL,                   -- 视频时长（秒）
+    metadata TEXT,                   -- 视频元数据（JSON）
+    content_hash TEXT,               -- 文件内容SHA-256（用作ETag）
+    created_at REAL NOT NULL,        -- 创建时间
+    last_access REAL NOT NULL        -- 最后访问时间
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    url_key TEXT PRIMARY KEY,        -- 规范化链接 + 下载选项
+    cache_key TEXT NOT NULL,         -- 对应的缓存键
+    created_at REAL NOT NULL         -- 创建时间
+);
+CREATE INDEX IF NOT EXISTS idx_aliases_cache_key ON aliases (cache_key);
+CREATE INDEX IF NOT EXISTS idx_entries_file_path ON entries (file_path);
+CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access);
+"""
+
+# 旧版本索引缺少的列
+MIGRATIONS = [
+    "ALTER TABLE entries ADD COLUMN content_hash TEXT",
+]
+
+
+class DownloadCache:
+    """
+    下载结果缓存类
+    以提取器的规范视频ID和下载选项为键，记录文件路径、大小、时长和元数据
+    """
+
+    def __init__(self, db_path: str):
+        """
+        初始化下载缓存
+
+        参数:
+        - db_path: SQLite索引文件路径
+        """
+        self.db_path = db_path  # 索引文件路径
+        self._local = threading.local()  # 每个线程独立的数据库连接
+        self._hits = 0  # 缓存命中次数
+        self._misses = 0  # 缓存未命中次数
+
+        # 创建索引表
+        self._init_schema()
+        logger.info(f"下载缓存初始化完成: {db_path}")
+
+    def __getstate__(self):
+        """
+        序列化时排除数据库连接（进程池模式下在子进程中重新连接）
+        """
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        """
+        反序列化时重新创建线程本地存储
+        """
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _init_schema(self):
+        """
+        创建索引表，并为旧版本索引补充新增的列
+        """
+        conn = self._connect()
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(entries)")}
+        if columns and 'content_hash' not in columns:
+            for statement in MIGRATIONS:
+                conn.execute(statement)
+        conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        获取当前线程的数据库连接
+
+        返回:
+        - SQLite连接
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # 自动提交模式，busy超时用于多进程并发写入
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")  # 读写互不阻塞，支持多进程共享
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(extractor_key: str, video_id: str, options: str) -> str:
+        """
+        生成缓存键
+
+        参数:
+        - extractor_key: yt-dlp提取器标识
+        - video_id: 平台视频ID
+        - options: 下载选项签名
+
+        返回:
+        - 缓存键
+        """
+        return f"{extractor_key}:{video_id}:{options}"
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        按缓存键查询
+
+        参数:
+        - cache_key: 缓存键
+
+        返回:
+        - 缓存条目，不存在或文件已丢失则返回None
+        """
+        row = self._connect().execute(
+            "SELECT * FROM entries WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+        return self._load(row)
+
+    def get_by_url(self, url_key: str) -> Optional[Dict[str, Any]]:
+        """
+        按链接别名查询（无需提取视频信息）
+
+        参数:
+        - url_key: 规范化链接 + 下载选项
+
+        返回:
+        - 缓存条目，不存在或文件已丢失则返回None
+        """
+        row = self._connect().execute(
+            "SELECT e.* FROM aliases a JOIN entries e ON a.cache_key = e.cache_key WHERE a.url_key = ?",
+            (url_key,)
+        ).fetchone()
+        return self._load(row)
+
+    def get_by_path(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """
+        按文件路径查询（文件服务使用，不更新命中统计）
+
+        参数:
+        - file_path: 视频文件路径
+
+        返回:
+        - 缓存条目，不存在则返回None
+        """
+        row = self._connect().execute(
+            "SELECT cache_key, file_path, file_size, content_hash FROM entries WHERE file_path = ?",
+            (file_path,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def _load(self, row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        """
+        解析缓存条目并更新访问时间
+
+        参数:
+        - row: 数据库查询结果
+
+        返回:
+        - 缓存条目字典
+        """
+        if row is None:
+            self._misses += 1
+            metrics.record_cache_lookup(False)
+            return None
+
+        entry = dict(row)
+
+        # 文件已被删除，移除失效条目
+        if not os.path.exists(entry['file_path']):
+            logger.warning(f"缓存文件已丢失: {entry['file_path']}")
+            self.delete(entry['cache_key'])
+            self._misses += 1
+            metrics.record_cache_lookup(False)
+            return None
+
+        entry['metadata'] = json.loads(entry['metadata']) if entry['metadata'] else {}
+        self._connect().execute(
+            "UPDATE entries SET last_access = ? WHERE cache_key = ?",
+            (time.time(), entry['cache_key'])
+        )
+        self._hits += 1
+        metrics.record_cache_lookup(True)
+        return entry
+
+    def put(self, cache_key: str, extractor_key: str, video_id: str, options: str,
+            file_path: str, file_size: Optional[int], duration: Optional[float],
+            metadata: Dict[str, Any], content_hash: Optional[str] = None):
+        """
+        写入缓存条目
+
+        参数:
+        - cache_key: 缓存键
+        - extractor_key: yt-dlp提取器标识
+        - video_id: 平台视频ID
+        - options: 下载选项签名
+        - file_path: 视频文件路径
+        - file_size: 文件大小（字节）
+        - duration: 视频时长（秒）
+        - metadata: 视频元数据
+        - content_hash: 文件内容SHA-256
+        """
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO entries "
+            "(cache_key, extractor_key, video_id, options, file_path, file_size, duration, metadata, "
+            "content_hash, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (cache_key, extractor_key, video_id, options, file_path, file_size, duration,
+             json.dumps(metadata, ensure_ascii=False, default=str), content_hash, now, now)
+        )
+        logger.info(f"写入下载缓存: {cache_key}")
+
+    def add_alias(self, url_key: str, cache_key: str):
+        """
+        记录链接别名，之后相同链接的请求可直接命中缓存
+
+        参数:
+        - url_key: 规范化链接 + 下载选项
+        - cache_key: 缓存键
+        """
+        self._connect().execute(
+            "INSERT OR REPLACE INTO aliases (url_key, cache_key, created_at) VALUES (?, ?, ?)",
+            (url_key, cache_key, time.time())
+        )
+
+    def delete(self, cache_key: str):
+        """
+        删除缓存条目及其链接别名
+
+        参数:
+        - cache_key: 缓存键
+        """
+        conn = self._connect()
+        conn.execute("DELETE FROM entries WHERE cache_key = ?", (cache_key,))
+        conn.execute("DELETE FROM aliases WHERE cache_key = ?", (cache_key,))
+
+    def least_recent(self, limit: int, before: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        按最后访问时间从早到晚查询条目（使用 last_access 索引，不扫描全表）
+
+        参数:
+        - limit: 最多返回的条目数
+        - before: 只返回最后访问时间早于该时间的条目，None表示不限
+
+        返回:
+        - 条目列表（缓存键、文件路径、文件大小、最后访问时间）
+        """
+        sql = "SELECT cache_key, file_path, file_size, last_access FROM entries"
+        params: tuple = ()
+        if before is not None:
+            sql += " WHERE last_access < ?"
+            params = (before,)
+        sql += " ORDER BY last_access LIMIT ?"
+        rows = self._connect().execute(sql, params + (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete_many(self, cache_keys: Iterable[str]):
+        """
+        在一个事务中删除多个缓存条目及其链接别名
+
+        参数:
+        - cache_keys: 缓存键列表
+        """
+        keys = [(key,) for key in cache_keys]
+        if not keys:
+            return
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("DELETE FROM entries WHERE cache_key = ?", keys)
+            conn.executemany("DELETE FROM aliases WHERE cache_key = ?", keys)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def relocate_many(self, moves: Iterable[Tuple[str, str]]) -> int:
+        """
+        在一个事务中更新多个条目的文件路径（迁移存储布局使用）
+
+        参数:
+        - moves: (原路径, 新路径) 列表
+
+        返回:
+        - 更新的条目数
+        """
+        moves = list(moves)
+        if not moves:
+            return 0
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            updated = 0
+            for old_path, new_path in moves:
+                updated += conn.execute(
+                    "UPDATE entries SET file_path = ? WHERE file_path = ?", (new_path, old_path)
+                ).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return updated
+
+    def total_bytes(self) -> int:
+        """
+        获取所有缓存文件的总大小
+
+        返回:
+        - 总字节数
+        """
+        return self._connect().execute("SELECT COALESCE(SUM(file_size), 0) FROM entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        返回:
+        - 条目数量、总大小和命中统计
+        """
+        row = self._connect().execute(
+            "SELECT COUNT(*) AS entries, COALESCE(SUM(file_size), 0) AS total_bytes FROM entries"
+        ).fetchone()
+        return {
+            "entries": row['entries'],
+            "total_bytes": row['total_bytes'],
+            "hits": self._hits,
+            "misses": self._misses,
+        }
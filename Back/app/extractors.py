@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+提取器模块
+延迟加载yt-dlp，并按链接所属平台直接选择对应的提取器：
+yt-dlp默认对每个链接依次匹配全部一千多个提取器（首次匹配时逐个编译链接正则），
+这里只创建支持平台的提取器，平台提取器都不匹配时才加载全部提取器
+"""
+
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.platforms import PlatformRegistry
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+
+def load_ytdlp():
+    """
+    导入yt-dlp（首次调用时加载，之后直接返回已加载的模块）
+
+    返回:
+    - yt_dlp模块
+    """
+    import yt_dlp
+    return yt_dlp
+
+
+def preload_extractors(ie_keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    预加载yt-dlp和指定的提取器（导入提取器模块并编译链接正则）
+    在启动阶段或fork工作进程之前调用，请求不再承担加载开销，fork出的进程以写时复制方式共享这部分内存
+
+    参数:
+    - ie_keys: 提取器标识
+
+    返回:
+    - 加载耗时（秒）、已加载和不存在的提取器标识
+    """
+    started = time.perf_counter()
+    load_ytdlp()
+    from yt_dlp.extractor import get_info_extractor
+
+    loaded: List[str] = []
+    missing: List[str] = []
+    for key in dict.fromkeys(ie_keys):
+        try:
+            get_info_extractor(key).suitable("")  # 编译链接正则（按类缓存）
+            loaded.append(key)
+        except (KeyError, AttributeError):
+            missing.append(key)
+    if missing:
+        logger.warning(f"yt-dlp中不存在的提取器: {', '.join(missing)}")
+    return {"seconds": round(time.perf_counter() - started, 3), "loaded": loaded, "missing": missing}
+
+
+class ExtractorSelector:
+    """
+    提取器预选类
+    接管yt-dlp实例的信息提取调用：未指定提取器时按链接所属平台的提取器标识直接选择，
+    平台提取器都不匹配（或平台没有对应的提取器）时才为该实例加载全部提取器，按yt-dlp默认方式查找
+    """
+
+    def __init__(self, platforms: PlatformRegistry):
+        """
+        初始化提取器预选
+
+        参数:
+        - platforms: 平台注册表（提供链接所属平台的提取器标识）
+        """
+        self.platforms = platforms
+        self._selected = 0  # 直接选中平台提取器的次数
+        self._fallbacks = 0  # 按默认方式查找的次数
+
+    def select(self, ydl, url: str) -> Optional[str]:
+        """
+        选择链接对应的提取器
+
+        参数:
+        - ydl: yt-dlp实例
+        - url: 视频链接
+
+        返回:
+        - 提取器标识，平台提取器都不匹配时返回None
+        """
+        match = self.platforms.match(url)
+        if match is None:
+            return None
+        for key in match.platform.ie_keys:
+            try:
+                if ydl.get_info_extractor(key).suitable(url):
+                    return key
+            except (KeyError, AttributeError):
+                continue
+        return None
+
+    def install(self, ydl):
+        """
+        接管yt-dlp实例的信息提取调用（实例应以 auto_init=False 创建，不预先注册全部提取器）
+
+        参数:
+        - ydl: yt-dlp实例
+        """
+        original = ydl.extract_info
+        state = {"defaults": False}  # 该实例是否已加载全部提取器
+
+        def extract_info(url, download=True, ie_key=None, *args, **kwargs):
+            if ie_key is None:
+                ie_key = self.select(ydl, url)
+                if ie_key is not None:
+                    self._selected += 1
+                else:
+                    self._fallbacks += 1
+                    if not state["defaults"]:
+                        ydl.add_default_info_extractors()
+                        state["defaults"] = True
+            return original(url, download, ie_key, *args, **kwargs)
+
+        ydl.extract_info = extract_info
+
+    def ie_keys(self) -> List[str]:
+        """
+        获取所有支持平台的提取器标识（预加载使用）
+
+        返回:
+        - 提取器标识列表
+        """
+        return [key for platform in self.platforms.platforms.values() for key in platform.ie_keys]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取提取器预选统计信息
+
+        返回:
+        - 直接选中和按默认方式查找的次数（当前进程）
+        """
+        return {"selected": self._selected, "fallbacks": self._fallbacks}
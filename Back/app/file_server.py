@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+文件服务模块
+提供已下载视频文件的HTTP响应，支持Range断点续传、ETag协商缓存和零拷贝发送
+"""
+
+import email.utils
+import logging
+import mimetypes
+import os
+import re
+from typing import Optional, Tuple
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app import metrics
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 分块读取大小（字节），没有零拷贝能力时每个连接最多占用这么多内存
+CHUNK_SIZE = 256 * 1024
+
+# 基于内容哈希的文件永不变化，允许客户端和CDN长期缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# 没有内容哈希时使用较短的缓存时间
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+# Range请求头格式（只支持单个字节范围）
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class RangeNotSatisfiable(Exception):
+    """
+    Range请求无法满足异常
+    """
+
+
+def parse_range(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析Range请求头
+
+    参数:
+    - range_header: Range请求头的值
+    - file_size: 文件大小（字节）
+
+    返回:
+    - (起始字节, 结束字节) 闭区间；不是单个字节范围时返回None（按完整文件响应）
+    """
+    if not range_header:
+        return None
+
+    match = RANGE_RE.fullmatch(range_header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        # 多个范围或格式不支持时返回完整文件（RFC 7233允许忽略Range）
+        return None
+
+    if match.group(1):
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else file_size - 1
+    else:
+        # 后缀范围：bytes=-N 表示最后N个字节
+        suffix = int(match.group(2))
+        if suffix == 0:
+            raise RangeNotSatisfiable()
+        start = max(file_size - suffix, 0)
+        end = file_size - 1
+
+    if start >= file_size or start > end:
+        raise RangeNotSatisfiable()
+
+    return start, min(end, file_size - 1)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    判断If-None-Match/If-Range请求头是否与ETag匹配（弱比较）
+
+    参数:
+    - header: 请求头的值
+    - etag: 当前ETag
+
+    返回:
+    - 是否匹配
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    current = etag[2:] if etag.startswith("W/") else etag
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == current:
+            return True
+    return False
+
+
+def read_at(file, size: int, position: int) -> bytes:
+    """
+    从文件的指定偏移读取数据
+    优先使用 os.pread（不移动文件位置）；Windows等没有 os.pread 的平台改用 seek + read
+    （文件对象属于单个响应，不会被并发使用）
+
+    参数:
+    - file: 以二进制模式打开的文件对象
+    - size: 读取的字节数
+    - position: 起始偏移
+
+    返回:
+    - 读取到的数据（到达文件末尾时可能少于size）
+    """
+    if hasattr(os, "pread"):
+        return os.pread(file.fileno(), size, position)
+    file.seek(position)
+    return file.read(size)
+
+
+class FileRangeResponse(Response):
+    """
+    支持Range和ETag的文件响应类
+    优先使用反向代理的X-Accel-Redirect或ASGI零拷贝扩展发送文件，否则按固定大小分块发送，不会把整个文件读入内存
+    """
+
+    def __init__(self, path: str, method: str = "GET", request_headers=None,
+                 content_hash: Optional[str] = None, accel_prefix: Optional[str] = None,
+                 accel_path: Optional[str] = None):
+        """
+        初始化文件响应
+
+        参数:
+        - path: 文件路径
+        - method: 请求方法（HEAD请求只返回响应头）
+        - request_headers: 请求头（用于Range和条件请求）
+        - content_hash: 文件内容哈希，作为强ETag
+        - accel_prefix: nginx内部location前缀，设置后通过X-Accel-Redirect交给nginx用sendfile发送
+        - accel_path: 文件在nginx location下的相对路径，默认为文件名
+        """
+        self.path = path
+        self.method = method
+        self.request_headers = request_headers or {}
+        self.content_hash = content_hash
+        self.accel_prefix = accel_prefix
+        self.accel_path = accel_path or os.path.basename(path)
+        self.background = None
+        self.status_code = 200
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.init_headers({})
+
+    def _cache_headers(self, stat_result: os.stat_result) -> dict:
+        """
+        生成缓存相关响应头
+
+        参数:
+        - stat_result: 文件状态信息
+
+        返回:
+        - 响应头字典
+        """
+        if self.content_hash:
+            etag = f'"{self.content_hash}"'
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            # 没有内容哈希时使用大小和修改时间生成弱ETag
+            etag = f'W/"{stat_result.st_size:x}-{int(stat_result.st_mtime):x}"'
+            cache_control = DEFAULT_CACHE_CONTROL
+        return {
+            "etag": etag,
+            "cache-control": cache_control,
+            "last-modified": email.utils.formatdate(stat_result.st_mtime, usegmt=True),
+            "accept-ranges": "bytes",
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        发送文件响应
+        """
+        try:
+            stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+        except FileNotFoundError:
+            await Response("文件不存在", status_code=404)(scope, receive, send)
+            return
+
+        file_size = stat_result.st_size
+        headers = self._cache_headers(stat_result)
+        etag = headers["etag"]
+
+        # 协商缓存：ETag未变化时返回304
+        if etag_matches(self.request_headers.get("if-none-match"), etag):
+            await self._send_head(send, 304, headers)
+            return
+
+        # 解析Range，If-Range与当前ETag不一致时返回完整文件
+        byte_range = None
+        if_range = self.request_headers.get("if-range")
+        if not if_range or etag_matches(if_range, etag):
+            try:
+                byte_range = parse_range(self.request_headers.get("range"), file_size)
+            except RangeNotSatisfiable:
+                headers["content-range"] = f"bytes */{file_size}"
+                headers["content-length"] = "0"
+                await self._send_head(send, 416, headers)
+                return
+
+        if byte_range is None:
+            status, offset, count = 200, 0, file_size
+        else:
+            status, offset, count = 206, byte_range[0], byte_range[1] - byte_range[0] + 1
+            headers["content-range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{file_size}"
+
+        headers["content-type"] = self.media_type
+        headers["content-length"] = str(count)
+
+        if self.method == "HEAD":
+            await self._send_head(send, status, headers)
+            return
+
+        # 交给nginx发送（nginx自行处理Range和sendfile）
+        if self.accel_prefix:
+            headers["x-accel-redirect"] = f"{self.accel_prefix.rstrip('/')}/{self.accel_path}"
+            headers["content-length"] = "0"
+            headers.pop("content-range", None)
+            await self._send_head(send, 200, headers)
+            metrics.record_bytes_served(count, "accel")
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+        })
+
+        with open(self.path, "rb") as file:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                # 服务器支持零拷贝扩展时由内核sendfile直接发送
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": offset,
+                    "count": count,
+                    "more_body": False,
+                })
+                metrics.record_bytes_served(count, "zerocopy")
+                return
+
+            # 分块读取发送，内存占用不超过CHUNK_SIZE
+            remaining = count
+            position = offset
+            while remaining > 0:
+                size = min(CHUNK_SIZE, remaining)
+                chunk = await anyio.to_thread.run_sync(read_at, file, size, position)
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                position += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                metrics.record_bytes_served(len(chunk), "chunked")
+            if remaining > 0 or count == 0:
+                # 空文件或文件被截断时结束响应体
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_head(self, send: Send, status: int, headers: dict):
+        """
+        发送只有响应头的响应
+
+        参数:
+        - send: ASGI发送函数
+        - status: 状态码
+        - headers: 响应头
+        """
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+        })
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+格式选择策略模块
+把请求的视频质量转换为yt-dlp格式选择表达式，并根据最终格式决定后处理方式：
+优先直接下载MP4且无水印的格式，其次无损封装转换（只复制音视频流），最后才重新编码
+"""
+
+import logging
+import re
+import shutil
+from typing import Any, Dict, List, Optional
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 质量名称 -> 最大分辨率高度（None表示不限制）
+QUALITY_HEIGHTS = {
+    "best": None,
+    "high": 1080,
+    "medium": 720,
+    "low": 480,
+}
+
+# 形如 720p 的质量参数
+QUALITY_HEIGHT_RE = re.compile(r"(\d{3,4})p")
+
+# 目标封装格式
+TARGET_EXT = "mp4"
+
+# 可以直接放入MP4容器的编码（封装转换即可，无需重新编码）
+MP4_VIDEO_CODECS = {"avc1", "avc3", "h264", "hvc1", "hev1", "h265", "hevc", "av01", "av1", "vp09", "vp9"}
+MP4_AUDIO_CODECS = {"mp4a", "aac", "mp3", "opus", "ac-3", "ec-3", "alac", "flac"}
+
+# 后处理方式（对应yt-dlp后处理器）
+POSTPROCESS_NONE = None
+POSTPROCESS_REMUX = "FFmpegVideoRemuxer"  # 只复制音视频流，耗时与文件读写相当
+POSTPROCESS_CONVERT = "FFmpegVideoConvertor"  # 重新编码，CPU开销大
+
+# 排除平台标记为带水印的格式（没有该字段的格式不受影响）
+NO_WATERMARK = "[format_note!*=?watermark]"
+
+
+def normalize_quality(quality: Optional[str]) -> str:
+    """
+    校验并规范化质量参数
+
+    参数:
+    - quality: 质量参数（best、high、medium、low、worst 或 720p 之类的分辨率）
+
+    返回:
+    - 规范化后的质量参数
+    """
+    quality = (quality or "best").strip().lower()
+    if quality in QUALITY_HEIGHTS or quality == "worst" or QUALITY_HEIGHT_RE.fullmatch(quality):
+        return quality
+    raise ValueError(f"不支持的视频质量: {quality}")
+
+
+def _max_height(quality: str) -> Optional[int]:
+    """
+    获取质量对应的最大分辨率高度
+
+    参数:
+    - quality: 规范化后的质量参数
+
+    返回:
+    - 最大高度，不限制时返回None
+    """
+    match = QUALITY_HEIGHT_RE.fullmatch(quality)
+    if match:
+        return int(match.group(1))
+    return QUALITY_HEIGHTS.get(quality)
+
+
+def has_ffmpeg() -> bool:
+    """
+    是否安装了ffmpeg（合并分离的音视频流和后处理都需要）
+
+    返回:
+    - 是否安装了ffmpeg
+    """
+    return shutil.which("ffmpeg") is not None
+
+
+def format_selector(quality: Optional[str] = "best", remove_watermark: bool = False,
+                    merge: bool = True) -> str:
+    """
+    生成yt-dlp格式选择表达式（按优先级用 / 连接）
+
+    参数:
+    - quality: 视频质量
+    - remove_watermark: 是否去除水印（为True时不会退回到带水印的格式）
+    - merge: 是否允许选择需要合并的分离音视频流
+
+    返回:
+    - 格式选择表达式
+    """
+    quality = normalize_quality(quality)
+
+    if quality == "worst":
+        return f"worst{NO_WATERMARK}" + ("" if remove_watermark else "/worst")
+
+    height = _max_height(quality)
+    limit = f"[height<=?{height}]" if height else ""
+    clean = f"{NO_WATERMARK}{limit}"
+
+    selectors: List[str] = []
+    if merge:
+        selectors.append(f"bv*{clean}+ba")  # 分离的音视频流（合并时只复制流）
+    selectors.append(f"b{clean}")  # 包含音视频的单个文件
+    if not remove_watermark:
+        # 不要求去水印时允许退回到带水印的格式
+        selectors.append(f"b{limit}")
+    if limit:
+        # 没有不超过指定分辨率的格式时不限制分辨率
+        selectors.append(f"b{NO_WATERMARK}" if remove_watermark else "b")
+    return "/".join(dict.fromkeys(selectors))
+
+
+def format_sort(quality: Optional[str] = "best") -> List[str]:
+    """
+    生成yt-dlp格式排序规则：先按分辨率，分辨率相同时优先MP4/M4A（无需封装转换）和MP4兼容的编码
+
+    参数:
+    - quality: 视频质量
+
+    返回:
+    - 排序字段列表
+    """
+    height = _max_height(normalize_quality(quality))
+    return [f"res:{height}" if height else "res", "ext:mp4:m4a", "vcodec:h264", "acodec:aac"]
+
+
+def _codec_family(codec: Optional[str]) -> Optional[str]:
+    """
+    获取编码族名称（avc1.64001F -> avc1）
+
+    参数:
+    - codec: yt-dlp格式信息中的编码字符串
+
+    返回:
+    - 编码族名称，未知或不存在时返回None
+    """
+    if not codec or codec == "none":
+        return None
+    return codec.split(".")[0].lower()
+
+
+def selected_codecs(info: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """
+    获取已选格式的音视频编码
+
+    参数:
+    - info: yt-dlp提取的视频信息（已完成格式选择）
+
+    返回:
+    - {"vcodec": 视频编码族, "acodec": 音频编码族}
+    """
+    formats = info.get("requested_formats") or [info]
+    vcodec = acodec = None
+    for fmt in formats:
+        vcodec = vcodec or _codec_family(fmt.get("vcodec"))
+        acodec = acodec or _codec_family(fmt.get("acodec"))
+    return {"vcodec": vcodec, "acodec": acodec}
+
+
+def choose_postprocessor(info: Dict[str, Any], transcode: str = "remux",
+                         allow_convert: bool = False) -> Optional[str]:
+    """
+    根据已选格式和平台转码策略决定后处理方式
+    重新编码只在平台策略允许且调用方要求处理（去水印）时进行，普通下载最多封装转换，否则保留原始封装格式
+
+    参数:
+    - info: yt-dlp提取的视频信息（已完成格式选择）
+    - transcode: 平台转码策略：never（不处理）、remux（最多封装转换）、convert（必要时允许重新编码）
+    - allow_convert: 本次下载是否允许重新编码（请求了去水印）
+
+    返回:
+    - 后处理器名称，不需要后处理时返回None
+    """
+    if transcode == "never" or info.get("ext") == TARGET_EXT:
+        return POSTPROCESS_NONE
+
+    codecs = selected_codecs(info)
+    video_ok = codecs["vcodec"] is None or codecs["vcodec"] in MP4_VIDEO_CODECS
+    audio_ok = codecs["acodec"] is None or codecs["acodec"] in MP4_AUDIO_CODECS
+    if (codecs["vcodec"] or codecs["acodec"]) and video_ok and audio_ok:
+        return POSTPROCESS_REMUX
+
+    if transcode == "convert" and allow_convert:
+        logger.info(f"格式无法直接封装为{TARGET_EXT}，需要重新编码: {info.get('ext')} {codecs}")
+        return POSTPROCESS_CONVERT
+
+    # 不允许重新编码时保留原始封装格式
+    return POSTPROCESS_NONE
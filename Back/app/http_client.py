@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+共享HTTP客户端模块
+所有异步HTTP请求复用同一个aiohttp会话，保持长连接并限制每个主机的连接数
+"""
+
+import logging
+from typing import Optional
+
+import aiohttp
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 模拟浏览器的默认请求头（部分平台会拒绝非浏览器请求）
+DEFAULT_HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"),
+}
+
+
+class SharedHttpClient:
+    """
+    共享HTTP客户端类
+    在首次使用时于当前事件循环中创建aiohttp会话，服务关闭时统一释放
+    """
+
+    def __init__(self, limit: int = 200, limit_per_host: int = 16, keepalive_timeout: float = 30.0,
+                 connect_timeout: float = 10.0, read_timeout: float = 60.0):
+        """
+        初始化共享HTTP客户端
+
+        参数:
+        - limit: 连接池总连接数上限
+        - limit_per_host: 每个主机的连接数上限
+        - keepalive_timeout: 空闲长连接保留时间（秒）
+        - connect_timeout: 建立连接超时（秒）
+        - read_timeout: 两次读取之间的超时（秒）
+        """
+        self.limit = limit  # 总连接数上限
+        self.limit_per_host = limit_per_host  # 每个主机的连接数上限
+        self.keepalive_timeout = keepalive_timeout  # 长连接保留时间
+        self.timeout = aiohttp.ClientTimeout(total=None, connect=connect_timeout, sock_read=read_timeout)
+        self._session: Optional[aiohttp.ClientSession] = None  # 共享会话
+
+    def __getstate__(self):
+        """
+        序列化时排除会话（进程池模式下子进程不使用异步客户端）
+        """
+        state = self.__dict__.copy()
+        state['_session'] = None
+        return state
+
+    def session(self) -> aiohttp.ClientSession:
+        """
+        获取共享会话（必须在事件循环中调用）
+
+        返回:
+        - aiohttp会话
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,  # DNS缓存5分钟
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout, headers=DEFAULT_HEADERS
+            )
+            logger.info(f"创建共享HTTP会话: limit={self.limit}, limit_per_host={self.limit_per_host}")
+        return self._session
+
+    async def close(self):
+        """
+        关闭共享会话
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("共享HTTP会话已关闭")
+        self._session = None
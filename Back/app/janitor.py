@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+下载目录清理模块
+按下载缓存索引中的最后访问时间清理过期文件，并在超出磁盘预算时按LRU淘汰，
+不遍历下载目录；清理分小批执行，不会长时间占用事件循环或数据库
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.download_cache import DownloadCache
+from app.projection import info_json_path
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 与视频文件同名的旁路文件（缩略图由yt-dlp按图片格式命名）
+THUMBNAIL_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".image")
+
+
+def sidecar_paths(file_path: str) -> List[str]:
+    """
+    获取视频文件的旁路文件路径（.info.json 和缩略图）
+
+    参数:
+    - file_path: 视频文件路径
+
+    返回:
+    - 旁路文件路径列表（不检查是否存在）
+    """
+    base = os.path.splitext(file_path)[0]
+    return [info_json_path(file_path)] + [base + ext for ext in THUMBNAIL_EXTS]
+
+
+class Janitor:
+    """
+    下载目录清理类
+    先清理超过最长保留时间未被访问的条目，再在总大小超出预算时从最久未访问的条目开始淘汰
+    """
+
+    def __init__(self, cache: DownloadCache, max_age_seconds: float = 24 * 3600, max_bytes: int = 0,
+                 batch_size: int = 200, interval: float = 300.0, pause: float = 0.05):
+        """
+        初始化清理器
+
+        参数:
+        - cache: 下载缓存（清理依据的索引）
+        - max_age_seconds: 未被访问的最长保留时间（秒），0表示不按时间清理
+        - max_bytes: 视频文件总大小预算（字节），0表示不限
+        - batch_size: 每批处理的条目数
+        - interval: 后台清理的间隔（秒）
+        - pause: 两批之间的停顿（秒），让出事件循环和数据库
+        """
+        self.cache = cache
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.pause = pause
+        self._task: Optional[asyncio.Task] = None  # 后台清理任务
+        self._runs = 0  # 完成的清理轮数
+        self._removed_entries = 0  # 删除的条目数
+        self._removed_files = 0  # 删除的文件数（含旁路文件）
+        self._removed_bytes = 0  # 释放的字节数（含旁路文件）
+        self._last_run: Optional[Dict[str, Any]] = None  # 最近一轮的结果
+
+    def _remove_files(self, file_path: str) -> Tuple[int, int]:
+        """
+        删除视频文件及其旁路文件
+
+        参数:
+        - file_path: 视频文件路径
+
+        返回:
+        - (删除的文件数, 释放的字节数)
+        """
+        files, freed = 0, 0
+        for path in [file_path] + sidecar_paths(file_path):
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            files += 1
+            freed += size
+        return files, freed
+
+    def _sweep_batch(self, cutoff: Optional[float], excess: int) -> Tuple[int, int]:
+        """
+        清理一批条目（在线程池中执行）
+
+        参数:
+        - cutoff: 最后访问时间早于该时间的条目视为过期，None表示不按时间清理
+        - excess: 超出预算的字节数
+
+        返回:
+        - (删除的条目数, 删除条目的视频文件大小之和)
+        """
+        entries = self.cache.least_recent(self.batch_size, before=cutoff) if cutoff is not None else []
+        if not entries and excess > 0:
+            # 没有过期条目时按LRU淘汰，直到回到预算以内
+            entries, needed = [], excess
+            for entry in self.cache.least_recent(self.batch_size):
+                if needed <= 0:
+                    break
+                entries.append(entry)
+                needed -= entry['file_size'] or 0
+        if not entries:
+            return 0, 0
+
+        # 先删除索引，避免请求命中即将被删除的文件
+        self.cache.delete_many(entry['cache_key'] for entry in entries)
+        indexed = 0
+        for entry in entries:
+            files, freed = self._remove_files(entry['file_path'])
+            self._removed_files += files
+            self._removed_bytes += freed
+            indexed += entry['file_size'] or 0
+        self._removed_entries += len(entries)
+        return len(entries), indexed
+
+    def _begin(self) -> Tuple[Optional[float], int]:
+        """计算本轮的过期时间点和超出预算的字节数"""
+        cutoff = time.time() - self.max_age_seconds if self.max_age_seconds > 0 else None
+        excess = self.cache.total_bytes() - self.max_bytes if self.max_bytes > 0 else 0
+        return cutoff, excess
+
+    def _finish(self, started: float, removed: int):
+        """记录本轮结果"""
+        self._runs += 1
+        self._last_run = {
+            "finished_at": time.time(),
+            "seconds": round(time.monotonic() - started, 3),
+            "removed_entries": removed,
+        }
+        if removed:
+            logger.info(f"清理下载文件 {removed} 个")
+
+    def run_once(self) -> int:
+        """
+        同步执行一轮完整清理
+
+        返回:
+        - 删除的条目数
+        """
+        started = time.monotonic()
+        cutoff, excess = self._begin()
+        removed = 0
+        while True:
+            count, size = self._sweep_batch(cutoff, excess)
+            if not count:
+                break
+            removed += count
+            excess -= size
+        self._finish(started, removed)
+        return removed
+
+    async def sweep(self) -> int:
+        """
+        异步执行一轮清理：每批在线程池中执行，批次之间让出事件循环
+
+        返回:
+        - 删除的条目数
+        """
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        cutoff, excess = await loop.run_in_executor(None, self._begin)
+        removed = 0
+        while True:
+            count, size = await loop.run_in_executor(None, self._sweep_batch, cutoff, excess)
+            if not count:
+                break
+            removed += count
+            excess -= size
+            await asyncio.sleep(self.pause)
+        self._finish(started, removed)
+        return removed
+
+    async def _run_forever(self):
+        """后台定期清理"""
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"清理下载文件失败: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """
+        启动后台清理任务（必须在事件循环中调用）
+        """
+        if self._task is None and (self.max_age_seconds > 0 or self.max_bytes > 0):
+            self._task = asyncio.ensure_future(self._run_forever())
+
+    async def stop(self):
+        """
+        停止后台清理任务
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取清理统计信息
+
+        返回:
+        - 配置、累计删除数量和最近一轮的结果
+        """
+        return {
+            "max_age_seconds": self.max_age_seconds,
+            "max_bytes": self.max_bytes,
+            "runs": self._runs,
+            "removed_entries": self._removed_entries,
+            "removed_files": self._removed_files,
+            "removed_bytes": self._removed_bytes,
+            "last_run": self._last_run,
+        }
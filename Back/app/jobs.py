@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+异步任务模块
+提供下载任务的提交、状态查询和结果获取，任务结果保存在带过期时间的内存存储中
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.progress import ProgressChannel
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_PENDING = "pending"  # 已提交，等待执行
+JOB_RUNNING = "running"  # 正在执行
+JOB_SUCCEEDED = "succeeded"  # 执行成功
+JOB_FAILED = "failed"  # 执行失败
+
+# 已结束的任务状态
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+# 当前正在执行的任务ID（下载日志记录所属任务，重启恢复时沿用同一ID）
+current_job_id: ContextVar[Optional[str]] = ContextVar("current_job_id", default=None)
+
+
+class Job:
+    """
+    下载任务类
+    记录单个任务的状态、结果和时间信息
+    """
+
+    def __init__(self, job_id: str, payload: Optional[Dict[str, Any]] = None,
+                 progress: Optional[ProgressChannel] = None):
+        """
+        初始化任务
+
+        参数:
+        - job_id: 任务ID
+        - payload: 任务的请求参数（用于查询时展示）
+        - progress: 任务的进度通道
+        """
+        self.id = job_id  # 任务ID
+        self.payload = payload or {}  # 请求参数
+        self.status = JOB_PENDING  # 任务状态
+        self.result: Any = None  # 任务结果
+        self.error: Optional[str] = None  # 错误信息
+        self.created_at = datetime.now()  # 创建时间
+        self.updated_at = self.created_at  # 最后更新时间
+        self.finished_at: Optional[float] = None  # 结束时间（monotonic，用于过期判断）
+        self.task: Optional[asyncio.Task] = None  # 执行任务的asyncio.Task
+        self.progress = progress or ProgressChannel()  # 下载进度
+
+    @property
+    def finished(self) -> bool:
+        """任务是否已结束"""
+        return self.status in FINISHED_STATES
+
+    def _set_status(self, status: str):
+        """更新任务状态"""
+        self.status = status
+        self.updated_at = datetime.now()
+        if status in FINISHED_STATES:
+            self.finished_at = time.monotonic()
+
+
+class JobStore:
+    """
+    进程内任务存储类
+    负责创建和执行任务，并在任务结束超过TTL后自动清除
+    """
+
+    def __init__(self, ttl_seconds: int = 3600, max_jobs: int = 10000, max_running: int = 16):
+        """
+        初始化任务存储
+
+        参数:
+        - ttl_seconds: 已结束任务的保留时间（秒）
+        - max_jobs: 最多保存的任务数量
+        - max_running: 同时执行的任务上限（与HTTP连接数无关）
+        """
+        self.ttl_seconds = ttl_seconds  # 结果保留时间
+        self.max_jobs = max_jobs  # 任务数量上限
+        self.max_running = max_running  # 同时执行的任务上限
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()  # 按创建顺序保存的任务
+        self._semaphore: Optional[asyncio.Semaphore] = None  # 执行并发控制
+        self._last_sweep = time.monotonic()  # 上次清理时间
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取执行并发控制信号量"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_running)
+        return self._semaphore
+
+    def submit(self, func: Callable[[], Awaitable[Any]], payload: Optional[Dict[str, Any]] = None,
+               progress: Optional[ProgressChannel] = None, job_id: Optional[str] = None) -> Job:
+        """
+        提交任务，立即返回任务对象
+
+        参数:
+        - func: 返回协程的可调用对象，任务执行时调用
+        - payload: 任务的请求参数
+        - progress: 任务的进度通道（由func发布进度）
+        - job_id: 任务ID，默认生成新ID（重启后恢复的任务沿用原ID）
+
+        返回:
+        - 新创建的任务
+        """
+        self._evict_expired()
+        if len(self._jobs) >= self.max_jobs:
+            raise RuntimeError("任务队列已满，请稍后重试")
+
+        job = Job(job_id or uuid.uuid4().hex, payload, progress)
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, func))
+        logger.info(f"任务已提交: {job.id}")
+        return job
+
+    async def _run(self, job: Job, func: Callable[[], Awaitable[Any]]):
+        """
+        执行任务并记录结果
+
+        参数:
+        - job: 任务对象
+        - func: 返回协程的可调用对象
+        """
+        current_job_id.set(job.id)
+        async with self._get_semaphore():
+            job._set_status(JOB_RUNNING)
+            try:
+                job.result = await func()
+                job._set_status(JOB_SUCCEEDED)
+                logger.info(f"任务执行成功: {job.id}")
+            except Exception as e:
+                job.error = str(e)
+                job._set_status(JOB_FAILED)
+                logger.error(f"任务执行失败: {job.id}, {str(e)}")
+            finally:
+                job.task = None
+                job.progress.close()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        查询任务
+
+        参数:
+        - job_id: 任务ID
+
+        返回:
+        - 任务对象，不存在或已过期则返回None
+        """
+        self._evict_expired()
+        return self._jobs.get(job_id)
+
+    def _evict_expired(self, force: bool = False):
+        """
+        清除已结束且超过TTL的任务
+        为避免每次访问都遍历，最多每秒执行一次
+
+        参数:
+        - force: 是否忽略时间间隔立即清理
+        """
+        now = time.monotonic()
+        if not force and now - self._last_sweep < 1.0:
+            return
+        self._last_sweep = now
+
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if expired:
+            logger.info(f"清除过期任务: {len(expired)}个")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取任务统计信息
+
+        返回:
+        - 各状态的任务数量
+        """
+        counts = {JOB_PENDING: 0, JOB_RUNNING: 0, JOB_SUCCEEDED: 0, JOB_FAILED: 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        counts["total"] = len(self._jobs)
+        return counts
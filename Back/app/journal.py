@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+下载日志模块
+使用SQLite（WAL模式）持久化记录正在执行的下载（链接、选项、阶段和部分文件），服务重启或工作进程崩溃后，
+由存活的进程接管这些下载：能恢复的从 .part 文件的已下载位置继续，无法恢复的清理部分文件
+"""
+
+import asyncio
+import glob
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.download_cache import DownloadCache
+from app.janitor import sidecar_paths
+from app.progress import STAGE_QUEUED
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 下载失败（保留部分文件供重试时继续下载）
+STAGE_FAILED = "failed"
+
+# 日志表结构
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    url_key TEXT PRIMARY KEY,        -- 规范化链接 + 下载选项（同一下载只有一条记录）
+    url TEXT NOT NULL,               -- 视频链接
+    remove_watermark INTEGER NOT NULL,  -- 是否去除水印
+    quality TEXT NOT NULL,           -- 视频质量
+    job_id TEXT,                     -- 所属异步任务ID（恢复时沿用）
+    stage TEXT NOT NULL,             -- 阶段：queued、download、postprocess、failed
+    partial_path TEXT,               -- 部分文件路径前缀（不含扩展名）
+    cache_key TEXT,                  -- 缓存键（开始下载媒体数据后才知道）
+    owner TEXT NOT NULL,             -- 执行该下载的进程标识
+    attempts INTEGER NOT NULL DEFAULT 0,  -- 被接管恢复的次数
+    error TEXT,                      -- 失败原因
+    created_at REAL NOT NULL,        -- 创建时间
+    updated_at REAL NOT NULL         -- 最后更新时间
+);
+CREATE TABLE IF NOT EXISTS owners (
+    owner TEXT PRIMARY KEY,          -- 进程标识
+    pid INTEGER NOT NULL,            -- 进程ID
+    heartbeat REAL NOT NULL          -- 最后心跳时间
+);
+CREATE INDEX IF NOT EXISTS idx_downloads_stage ON downloads (stage, updated_at);
+"""
+
+
+class DownloadJournal:
+    """
+    下载日志类
+    每个进程有唯一的标识并定期写入心跳；心跳过期的进程留下的下载记录可以被其他进程接管
+    """
+
+    def __init__(self, db_path: str):
+        """
+        初始化下载日志
+
+        参数:
+        - db_path: SQLite日志文件路径
+        """
+        self.db_path = db_path  # 日志文件路径
+        # 进程标识（进程ID可能在容器重启后重复，加上随机后缀区分）
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()  # 每个线程独立的数据库连接
+
+        # 创建日志表
+        self._connect().executescript(SCHEMA)
+        logger.info(f"下载日志初始化完成: {db_path}")
+
+    def __getstate__(self):
+        """
+        序列化时排除数据库连接（进程池模式下在子进程中重新连接）
+        """
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        """
+        反序列化时重新创建线程本地存储
+        """
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        获取当前线程的数据库连接
+
+        返回:
+        - SQLite连接
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # 自动提交模式，busy超时用于多进程并发写入
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")  # 读写互不阻塞，支持多进程共享
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def begin(self, url_key: str, url: str, remove_watermark: bool, quality: str, job_id: Optional[str] = None):
+        """
+        记录一个开始执行的下载（已有记录时沿用其部分文件和恢复次数）
+
+        参数:
+        - url_key: 规范化链接 + 下载选项
+        - url: 视频链接
+        - remove_watermark: 是否去除水印
+        - quality: 视频质量
+        - job_id: 所属异步任务ID
+        """
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO downloads (url_key, url, remove_watermark, quality, job_id, stage, owner, "
+            "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (url_key) DO UPDATE SET stage = excluded.stage, owner = excluded.owner, "
+            "job_id = COALESCE(excluded.job_id, job_id), error = NULL, updated_at = excluded.updated_at",
+            (url_key, url, int(bool(remove_watermark)), quality or "best", job_id, STAGE_QUEUED, self.owner,
+             now, now)
+        )
+
+    def update(self, url_key: str, stage: str, partial_path: Optional[str] = None,
+               cache_key: Optional[str] = None):
+        """
+        更新下载阶段（工作进程中也可调用）
+
+        参数:
+        - url_key: 规范化链接 + 下载选项
+        - stage: 阶段
+        - partial_path: 部分文件路径前缀，None表示不修改
+        - cache_key: 缓存键，None表示不修改
+        """
+        self._connect().execute(
+            "UPDATE downloads SET stage = ?, partial_path = COALESCE(?, partial_path), "
+            "cache_key = COALESCE(?, cache_key), updated_at = ? WHERE url_key = ?",
+            (stage, partial_path, cache_key, time.time(), url_key)
+        )
+
+    def finish(self, url_key: str):
+        """
+        下载完成，删除记录
+
+        参数:
+        - url_key: 规范化链接 + 下载选项
+        """
+        self._connect().execute("DELETE FROM downloads WHERE url_key = ?", (url_key,))
+
+    def fail(self, url_key: str, error: str):
+        """
+        下载失败，保留记录和部分文件（重试时继续下载，超过保留时间后清理）
+
+        参数:
+        - url_key: 规范化链接 + 下载选项
+        - error: 失败原因
+        """
+        self._connect().execute(
+            "UPDATE downloads SET stage = ?, error = ?, updated_at = ? WHERE url_key = ?",
+            (STAGE_FAILED, error[:1000], time.time(), url_key)
+        )
+
+    def heartbeat(self):
+        """
+        写入本进程的心跳
+        """
+        self._connect().execute(
+            "INSERT OR REPLACE INTO owners (owner, pid, heartbeat) VALUES (?, ?, ?)",
+            (self.owner, os.getpid(), time.time())
+        )
+
+    def release(self):
+        """
+        删除本进程的心跳（正常退出时调用，其他进程无需等待心跳过期即可接管未完成的下载）
+        """
+        self._connect().execute("DELETE FROM owners WHERE owner = ?", (self.owner,))
+
+    def take_over(self, stale_after: float, max_attempts: int,
+                  max_age: float) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        接管心跳已过期的进程留下的未完成下载（在一个事务中完成，多个进程同时接管时每条记录只归属一个进程）
+
+        参数:
+        - stale_after: 心跳超过该时间（秒）未更新的进程视为已退出
+        - max_attempts: 最多恢复次数，超过时放弃（避免反复导致崩溃的下载无限重试）
+        - max_age: 创建超过该时间（秒）的下载不再恢复
+
+        返回:
+        - (需要恢复的记录, 放弃的记录)，放弃的记录已从日志中删除
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM owners WHERE heartbeat < ?", (now - stale_after,))
+            rows = conn.execute(
+                "SELECT * FROM downloads WHERE stage != ? AND owner NOT IN (SELECT owner FROM owners)",
+                (STAGE_FAILED,)
+            ).fetchall()
+            resumed, abandoned = [], []
+            for row in rows:
+                entry = dict(row)
+                if entry['attempts'] >= max_attempts or entry['created_at'] < now - max_age:
+                    conn.execute("DELETE FROM downloads WHERE url_key = ?", (entry['url_key'],))
+                    abandoned.append(entry)
+                else:
+                    conn.execute(
+                        "UPDATE downloads SET owner = ?, attempts = attempts + 1, updated_at = ? WHERE url_key = ?",
+                        (self.owner, now, entry['url_key'])
+                    )
+                    resumed.append(entry)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return resumed, abandoned
+
+    def purge_failed(self, before: float, limit: int = 200) -> List[Dict[str, Any]]:
+        """
+        删除失败时间早于指定时间的记录（之后由调用方清理部分文件）
+
+        参数:
+        - before: 时间点
+        - limit: 最多删除的记录数
+
+        返回:
+        - 删除的记录
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = [dict(row) for row in conn.execute(
+                "SELECT * FROM downloads WHERE stage = ? AND updated_at < ? LIMIT ?", (STAGE_FAILED, before, limit)
+            ).fetchall()]
+            conn.executemany("DELETE FROM downloads WHERE url_key = ?", [(row['url_key'],) for row in rows])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取日志统计信息
+
+        返回:
+        - 各阶段的下载记录数
+        """
+        rows = self._connect().execute("SELECT stage, COUNT(*) AS count FROM downloads GROUP BY stage").fetchall()
+        return {row['stage']: row['count'] for row in rows}
+
+
+class JournalRecovery:
+    """
+    下载恢复类
+    定期写入心跳、接管已退出进程留下的下载并交给恢复回调，清理无法恢复或失败后超过保留时间的部分文件
+    """
+
+    def __init__(self, journal: DownloadJournal, cache: DownloadCache,
+                 resume: Callable[[Dict[str, Any]], None], interval: float = 5.0, stale_after: float = 15.0,
+                 max_attempts: int = 3, max_age: float = 24 * 3600, failed_ttl: float = 3600.0):
+        """
+        初始化下载恢复
+
+        参数:
+        - journal: 下载日志
+        - cache: 下载缓存（判断记录对应的文件是否已经完成）
+        - resume: 恢复回调，参数为日志记录（在事件循环中调用，应尽快返回）
+        - interval: 心跳和接管的间隔（秒）
+        - stale_after: 心跳超过该时间（秒）未更新的进程视为已退出
+        - max_attempts: 单个下载最多恢复次数
+        - max_age: 创建超过该时间（秒）的下载不再恢复
+        - failed_ttl: 失败下载的部分文件保留时间（秒），期间重试可以继续下载
+        """
+        self.journal = journal
+        self.cache = cache
+        self.resume = resume
+        self.interval = interval
+        self.stale_after = max(stale_after, interval * 2)
+        self.max_attempts = max_attempts
+        self.max_age = max_age
+        self.failed_ttl = failed_ttl
+        self._task: Optional[asyncio.Task] = None  # 后台任务
+        self._resumed = 0  # 恢复的下载数
+        self._completed = 0  # 已经完成、只需删除记录的下载数
+        self._abandoned = 0  # 放弃的下载数
+        self._purged = 0  # 清理的失败下载数
+        self._removed_files = 0  # 删除的部分文件数
+        self._removed_bytes = 0  # 删除的部分文件字节数
+
+    def remove_partials(self, entry: Dict[str, Any]):
+        """
+        删除下载记录的部分文件（.part、分片、缩略图等同前缀的文件；已登记到缓存的文件及其旁路文件保留）
+
+        参数:
+        - entry: 日志记录
+        """
+        prefix = entry.get('partial_path')
+        if not prefix:
+            return
+        keep = set()
+        committed = self.cache.get(entry['cache_key']) if entry.get('cache_key') else None
+        if committed is not None:
+            keep = {committed['file_path']} | set(sidecar_paths(committed['file_path']))
+        for path in glob.glob(glob.escape(prefix) + ".*"):
+            if path in keep:
+                continue
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._removed_files += 1
+            self._removed_bytes += size
+
+    def _take_over(self) -> List[Dict[str, Any]]:
+        """
+        写入心跳，接管并分类未完成的下载，清理过期的失败下载（在线程池中执行）
+
+        返回:
+        - 需要恢复的记录
+        """
+        self.journal.heartbeat()
+        resumed, abandoned = self.journal.take_over(self.stale_after, self.max_attempts, self.max_age)
+        for entry in abandoned:
+            logger.warning(f"放弃恢复下载: {entry['url']}（已恢复 {entry['attempts']} 次）")
+            self.remove_partials(entry)
+            self._abandoned += 1
+
+        pending = []
+        for entry in resumed:
+            if entry.get('cache_key') and self.cache.get(entry['cache_key']) is not None:
+                # 文件已登记到缓存（退出前未来得及删除记录）
+                self.journal.finish(entry['url_key'])
+                self.remove_partials(entry)
+                self._completed += 1
+            else:
+                pending.append(entry)
+
+        for entry in self.journal.purge_failed(time.time() - self.failed_ttl):
+            self.remove_partials(entry)
+            self._purged += 1
+        return pending
+
+    async def run_once(self) -> int:
+        """
+        执行一轮心跳、接管和清理
+
+        返回:
+        - 恢复的下载数
+        """
+        loop = asyncio.get_running_loop()
+        pending = await loop.run_in_executor(None, self._take_over)
+        for entry in pending:
+            logger.info(f"恢复未完成的下载: {entry['url']}（阶段 {entry['stage']}）")
+            self.resume(entry)
+            self._resumed += 1
+        return len(pending)
+
+    async def _run_forever(self):
+        """后台定期执行"""
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"恢复下载失败: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """
+        启动后台任务（必须在事件循环中调用）
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run_forever())
+
+    async def stop(self):
+        """
+        停止后台任务并删除本进程的心跳
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            self.journal.release()
+        except Exception as e:
+            logger.error(f"删除下载日志心跳失败: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取恢复统计信息
+
+        返回:
+        - 各阶段的记录数和累计恢复、放弃、清理数量
+        """
+        return {
+            "owner": self.journal.owner,
+            "entries": self.journal.stats(),
+            "resumed": self._resumed,
+            "completed": self._completed,
+            "abandoned": self._abandoned,
+            "purged": self._purged,
+            "removed_files": self._removed_files,
+            "removed_bytes": self._removed_bytes,
+        }
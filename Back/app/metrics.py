@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+监控指标模块
+使用prometheus_client导出下载流程各阶段的耗时直方图和缓存、流量、队列等指标；
+设置 PROMETHEUS_MULTIPROC_DIR 后使用多进程模式，多个uvicorn工作进程（以及进程池子进程）的指标合并导出
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 流程阶段
+STAGE_DETECT = "detect"  # 识别平台
+STAGE_RESOLVE = "resolve"  # 解析短链接
+STAGE_EXTRACT = "extract"  # 提取视频信息
+STAGE_DOWNLOAD = "download"  # 下载媒体数据
+STAGE_POSTPROCESS = "postprocess"  # FFmpeg后处理
+STAGE_SERIALIZE = "serialize"  # 构建并序列化响应
+
+# 结果标签
+OUTCOME_SUCCESS = "success"
+OUTCOME_ERROR = "error"
+
+# 无法识别平台时的标签值
+UNKNOWN_PLATFORM = "unknown"
+
+# 耗时分桶（秒）：识别平台为微秒级，下载和编码可达数分钟
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "video_downloader_stage_seconds", "下载流程各阶段耗时（秒）",
+    ["stage", "platform", "outcome"], buckets=LATENCY_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    "video_downloader_cache_lookups", "下载缓存查询次数", ["result"]
+)
+BYTES_SERVED = Counter(
+    "video_downloader_bytes_served", "返回给客户端的视频字节数", ["via"]
+)
+QUEUE_DEPTH = Gauge(
+    "video_downloader_queue_depth", "排队中的请求/任务数", ["queue"], multiprocess_mode="livesum"
+)
+ACTIVE_WORKERS = Gauge(
+    "video_downloader_active_workers", "正在执行的请求/任务数", ["pool"], multiprocess_mode="livesum"
+)
+
+
+def multiprocess_enabled() -> bool:
+    """是否启用了多进程模式"""
+    return bool(os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir"))
+
+
+def observe(stage: str, seconds: float, platform: Optional[str] = None, outcome: str = OUTCOME_SUCCESS):
+    """
+    记录阶段耗时
+
+    参数:
+    - stage: 阶段
+    - seconds: 耗时（秒）
+    - platform: 平台标识（英文key，避免标签值过多）
+    - outcome: 结果
+    """
+    STAGE_SECONDS.labels(stage, platform or UNKNOWN_PLATFORM, outcome).observe(seconds)
+
+
+@contextmanager
+def timed(stage: str, platform: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    计时上下文：正常结束记为成功，抛出异常记为失败
+
+    参数:
+    - stage: 阶段
+    - platform: 平台标识，可在上下文中通过 span['platform'] 补充
+
+    返回:
+    - span字典，结束后 span['seconds'] 为耗时
+    """
+    span: Dict[str, Any] = {"platform": platform}
+    started = time.perf_counter()
+    outcome = OUTCOME_ERROR
+    try:
+        yield span
+        outcome = OUTCOME_SUCCESS
+    finally:
+        span["seconds"] = time.perf_counter() - started
+        observe(stage, span["seconds"], span["platform"], outcome)
+
+
+def record_cache_lookup(hit: bool):
+    """
+    记录缓存查询结果
+
+    参数:
+    - hit: 是否命中
+    """
+    CACHE_LOOKUPS.labels("hit" if hit else "miss").inc()
+
+
+def record_bytes_served(count: int, via: str):
+    """
+    记录返回给客户端的字节数
+
+    参数:
+    - count: 字节数
+    - via: 发送方式（chunked、zerocopy、accel、stream）
+    """
+    if count > 0:
+        BYTES_SERVED.labels(via).inc(count)
+
+
+def update_pool_gauges(pools: Dict[str, Dict[str, Any]]):
+    """
+    更新队列深度和执行数（按各组件的统计信息）
+
+    参数:
+    - pools: 名称 -> 统计信息（包含 queue_depth 和 active）
+    """
+    for name, stats in pools.items():
+        QUEUE_DEPTH.labels(name).set(stats.get("queue_depth", 0))
+        ACTIVE_WORKERS.labels(name).set(stats.get("active", 0))
+
+
+def render() -> Tuple[bytes, str]:
+    """
+    生成指标文本
+
+    返回:
+    - (指标内容, Content-Type)
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """
+    工作进程退出时清理其实时指标文件（多进程模式）
+    """
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(os.getpid())
@@ -4,10 +4,12 @@
 定义API请求和响应的数据结构
 """
 
-from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional
+from pydantic import BaseModel, Field, HttpUrl, field_validator
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
+from app.format_policy import normalize_quality
+
 class DownloadRequest(BaseModel):
     """
     视频下载请求模型
@@ -27,9 +29,17 @@ class DownloadRequest(BaseModel):
     
     quality: Optional[str] = Field(
         default="best",  # 默认最佳质量
-        description="视频质量选择",
+        description="视频质量选择：best、high（≤1080p）、medium（≤720p）、low（≤480p）、worst 或 720p 之类的分辨率",
         example="best"
     )
+    
+    @field_validator("quality")
+    @classmethod
+    def check_quality(cls, value: Optional[str]) -> str:
+        """
+        校验并规范化视频质量
+        """
+        return normalize_quality(value)
 
 class DownloadResponse(BaseModel):
     """
@@ -89,6 +99,178 @@ class DownloadResponse(BaseModel):
         description="创建时间"
     )
 
+class VideoInfoResponse(BaseModel):
+    """
+    视频预览响应模型
+    只提取视频信息不下载，用于下载前展示标题、缩略图和时长
+    """
+    success: bool = Field(
+        ...,  # 表示必填字段
+        description="提取是否成功",
+        example=True
+    )
+    
+    message: str = Field(
+        ...,  # 表示必填字段
+        description="响应消息",
+        example="获取成功"
+    )
+    
+    title: Optional[str] = Field(
+        default=None,
+        description="视频标题",
+        example="一段有趣的视频"
+    )
+    
+    duration: Optional[float] = Field(
+        default=None,
+        description="视频时长（秒）",
+        example=30.5
+    )
+    
+    thumbnail_url: Optional[str] = Field(
+        default=None,
+        description="视频缩略图URL",
+        example="https://example.com/thumbnails/thumb_123.jpg"
+    )
+    
+    uploader: Optional[str] = Field(
+        default=None,
+        description="上传者",
+        example="某某"
+    )
+    
+    webpage_url: Optional[str] = Field(
+        default=None,
+        description="视频页面地址",
+        example="https://www.douyin.com/video/123456789"
+    )
+    
+    platform: Optional[str] = Field(
+        default=None,
+        description="视频来源平台",
+        example="抖音"
+    )
+    
+    cached: bool = Field(
+        default=False,
+        description="是否来自信息缓存（未访问平台）",
+        example=False
+    )
+
+class JobSubmitResponse(BaseModel):
+    """
+    任务提交响应模型
+    提交下载任务后立即返回任务ID
+    """
+    job_id: str = Field(
+        ...,  # 表示必填字段
+        description="任务ID",
+        example="3f2b9c0e8d7a4f6b9e1c2d3a4b5c6d7e"
+    )
+    
+    status: str = Field(
+        ...,  # 表示必填字段
+        description="任务状态：pending/running/succeeded/failed",
+        example="pending"
+    )
+    
+    created_at: datetime = Field(
+        default_factory=datetime.now,  # 使用当前时间作为默认值
+        description="创建时间"
+    )
+
+class JobStatusResponse(BaseModel):
+    """
+    任务状态响应模型
+    定义任务查询接口返回的数据结构
+    """
+    job_id: str = Field(
+        ...,  # 表示必填字段
+        description="任务ID",
+        example="3f2b9c0e8d7a4f6b9e1c2d3a4b5c6d7e"
+    )
+    
+    status: str = Field(
+        ...,  # 表示必填字段
+        description="任务状态：pending/running/succeeded/failed",
+        example="succeeded"
+    )
+    
+    result: Optional[DownloadResponse] = Field(
+        default=None,
+        description="下载结果（任务成功后返回）"
+    )
+    
+    error: Optional[str] = Field(
+        default=None,
+        description="错误信息（任务失败后返回）",
+        example="视频下载失败: 不支持的视频平台"
+    )
+    
+    progress: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="最新下载进度：stage（queued/extract/download/postprocess）、downloaded_bytes、total_bytes、speed、eta、percent",
+        example={"stage": "download", "downloaded_bytes": 1048576, "total_bytes": 4194304,
+                 "speed": 524288.0, "eta": 6, "percent": 25.0}
+    )
+    
+    created_at: datetime = Field(
+        ...,  # 表示必填字段
+        description="创建时间"
+    )
+    
+    updated_at: datetime = Field(
+        ...,  # 表示必填字段
+        description="最后更新时间"
+    )
+
+class BatchDownloadRequest(BaseModel):
+    """
+    批量下载请求模型
+    一次提交多个下载请求
+    """
+    items: List[DownloadRequest] = Field(
+        ...,  # 表示必填字段
+        min_length=1,
+        max_length=100,
+        description="下载请求列表（最多100个）"
+    )
+
+class BatchItemResult(BaseModel):
+    """
+    批量下载单项结果模型
+    每完成一项返回一行（NDJSON）
+    """
+    index: int = Field(
+        ...,  # 表示必填字段
+        description="该项在请求列表中的位置（从0开始）",
+        example=0
+    )
+    
+    url: str = Field(
+        ...,  # 表示必填字段
+        description="视频链接",
+        example="https://www.douyin.com/video/123456789"
+    )
+    
+    success: bool = Field(
+        ...,  # 表示必填字段
+        description="该项是否下载成功",
+        example=True
+    )
+    
+    result: Optional[DownloadResponse] = Field(
+        default=None,
+        description="下载结果（成功时返回）"
+    )
+    
+    error: Optional[str] = Field(
+        default=None,
+        description="错误信息（失败时返回）",
+        example="视频下载失败: 不支持的视频平台"
+    )
+
 class ErrorResponse(BaseModel):
     """
     错误响应模型
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+平台注册模块
+集中定义支持的视频平台及其配置，并通过反向域名标签索引（后缀树）识别链接所属平台
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 后缀树中标记平台节点的键（域名标签不会包含该字符）
+_TERMINAL = "$"
+
+
+class Platform:
+    """
+    平台配置类
+    描述一个视频平台的域名、短链接域名和处理策略
+    """
+
+    def __init__(self, key: str, name: str, domains: Iterable[str],
+                 short_link_domains: Iterable[str] = (), ie_keys: Iterable[str] = (),
+                 max_concurrency: int = 4, transcode: str = "remux",
+                 rate_limit: float = 2.0, burst: int = 5, short_form: bool = False):
+        """
+        初始化平台配置
+
+        参数:
+        - key: 平台标识（英文）
+        - name: 平台名称
+        - domains: 主域名及别名域名（匹配其所有子域名）
+        - short_link_domains: 分享短链接域名（需要跟随跳转才能得到视频页面）
+        - ie_keys: 对应的yt-dlp提取器标识（按优先级排列）
+        - max_concurrency: 该平台同时进行的下载数上限
+        - transcode: 转码策略：never（不处理）、remux（优先无损封装转换）、convert（去水印下载时允许重新编码）
+        - rate_limit: 每秒最多发起的提取请求数（0表示不限速）
+        - burst: 允许的突发请求数
+        - short_form: 是否为短视频平台（下载耗时短，排队时优先执行）
+        """
+        self.key = key  # 平台标识
+        self.name = name  # 平台名称
+        self.domains = tuple(domains)  # 主域名及别名
+        self.short_link_domains = tuple(short_link_domains)  # 短链接域名
+        self.ie_keys = tuple(ie_keys)  # yt-dlp提取器标识
+        self.max_concurrency = max_concurrency  # 并发上限
+        self.transcode = transcode  # 转码策略
+        self.rate_limit = rate_limit  # 限速（每秒请求数）
+        self.burst = burst  # 突发请求数
+        self.short_form = short_form  # 是否为短视频平台
+
+    @property
+    def primary_domain(self) -> str:
+        """主域名"""
+        return self.domains[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为字典（用于接口返回）
+
+        返回:
+        - 平台配置字典
+        """
+        return {
+            "key": self.key,
+            "name": self.name,
+            "domains": list(self.domains),
+            "short_link_domains": list(self.short_link_domains),
+            "max_concurrency": self.max_concurrency,
+            "transcode": self.transcode,
+            "rate_limit": self.rate_limit,
+            "burst": self.burst,
+            "short_form": self.short_form,
+        }
+
+
+class PlatformMatch:
+    """
+    平台识别结果类
+    """
+
+    def __init__(self, platform: Platform, host: str, is_short_link: bool):
+        """
+        初始化识别结果
+
+        参数:
+        - platform: 匹配到的平台
+        - host: 链接的主机名
+        - is_short_link: 是否为短链接
+        """
+        self.platform = platform  # 平台配置
+        self.host = host  # 主机名
+        self.is_short_link = is_short_link  # 是否为短链接
+
+    @property
+    def name(self) -> str:
+        """平台名称"""
+        return self.platform.name
+
+
+# 默认支持的平台
+DEFAULT_PLATFORMS = [
+    Platform("douyin", "抖音", ["douyin.com", "iesdouyin.com"],
+             short_link_domains=["v.douyin.com"], ie_keys=["Douyin"], transcode="convert",
+             short_form=True),
+    # yt-dlp没有快手的专用提取器，由通用提取器处理
+    Platform("kuaishou", "快手", ["kuaishou.com", "gifshow.com", "chenzhongtech.com"],
+             short_link_domains=["v.kuaishou.com"], ie_keys=["Generic"], transcode="convert", short_form=True),
+    Platform("weibo", "微博", ["weibo.com", "weibo.cn"],
+             short_link_domains=["t.cn"], ie_keys=["Weibo", "WeiboVideo"], transcode="convert"),
+    Platform("bilibili", "B站", ["bilibili.com"],
+             short_link_domains=["b23.tv"], ie_keys=["BiliBili"], max_concurrency=3, transcode="remux"),
+    Platform("youtube", "YouTube", ["youtube.com", "youtube-nocookie.com"],
+             short_link_domains=["youtu.be"], ie_keys=["Youtube"], max_concurrency=3, transcode="remux",
+             rate_limit=1.0, burst=3),
+    Platform("instagram", "Instagram", ["instagram.com"],
+             short_link_domains=["instagr.am"], ie_keys=["Instagram"], max_concurrency=2, transcode="never",
+             rate_limit=0.5, burst=2),
+    Platform("tiktok", "TikTok", ["tiktok.com"],
+             short_link_domains=["vm.tiktok.com", "vt.tiktok.com"], ie_keys=["TikTok", "TikTokVM"],
+             transcode="never", short_form=True),
+    Platform("xiaohongshu", "小红书", ["xiaohongshu.com"],
+             short_link_domains=["xhslink.com"], ie_keys=["XiaoHongShu"], transcode="convert",
+             short_form=True),
+    Platform("ixigua", "西瓜视频", ["ixigua.com"], ie_keys=["Ixigua"], transcode="convert"),
+]
+
+
+class PlatformRegistry:
+    """
+    平台注册表类
+    把所有域名按反向标签（com -> douyin -> v）建立后缀树，识别耗时只与域名标签数有关
+    """
+
+    def __init__(self, platforms: Iterable[Platform] = DEFAULT_PLATFORMS):
+        """
+        初始化平台注册表
+
+        参数:
+        - platforms: 平台配置列表
+        """
+        self.platforms: Dict[str, Platform] = {}  # 平台标识 -> 平台配置
+        self._index: Dict[str, Any] = {}  # 反向标签后缀树
+
+        for platform in platforms:
+            self.register(platform)
+
+    def register(self, platform: Platform):
+        """
+        注册平台并建立域名索引
+
+        参数:
+        - platform: 平台配置
+        """
+        self.platforms[platform.key] = platform
+        for domain in platform.domains:
+            self._insert(domain, (platform, False))
+        for domain in platform.short_link_domains:
+            self._insert(domain, (platform, True))
+
+    def _insert(self, domain: str, value: Tuple[Platform, bool]):
+        """
+        将域名插入后缀树
+
+        参数:
+        - domain: 域名
+        - value: (平台配置, 是否为短链接)
+        """
+        node = self._index
+        for label in reversed(domain.lower().split(".")):
+            node = node.setdefault(label, {})
+        node[_TERMINAL] = value
+
+    def match_host(self, host: str) -> Optional[PlatformMatch]:
+        """
+        按主机名识别平台（最长后缀匹配，只在域名标签边界上匹配）
+
+        参数:
+        - host: 主机名（可包含端口）
+
+        返回:
+        - 识别结果，不支持的主机返回None
+        """
+        host = host.lower().split(":")[0].rstrip(".")
+        node = self._index
+        found = None
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            found = node.get(_TERMINAL, found)
+        if found is None:
+            return None
+        return PlatformMatch(found[0], host, found[1])
+
+    def match(self, url: str) -> Optional[PlatformMatch]:
+        """
+        识别链接所属平台
+
+        参数:
+        - url: 视频链接
+
+        返回:
+        - 识别结果，不支持的链接返回None
+        """
+        return self.match_host(urlparse(url).netloc.rsplit("@", 1)[-1])
+
+    def get(self, key: str) -> Optional[Platform]:
+        """
+        按平台标识获取配置
+
+        参数:
+        - key: 平台标识
+
+        返回:
+        - 平台配置
+        """
+        return self.platforms.get(key)
+
+    def by_name(self, name: str) -> Optional[Platform]:
+        """
+        按平台名称获取配置
+
+        参数:
+        - name: 平台名称
+
+        返回:
+        - 平台配置
+        """
+        for platform in self.platforms.values():
+            if platform.name == name:
+                return platform
+        return None
+
+    def domain_map(self) -> Dict[str, str]:
+        """
+        主域名到平台名称的映射
+
+        返回:
+        - 映射字典
+        """
+        return {platform.primary_domain: platform.name for platform in self.platforms.values()}
+
+    def names(self) -> List[str]:
+        """
+        所有平台名称
+
+        返回:
+        - 平台名称列表
+        """
+        return [platform.name for platform in self.platforms.values()]
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+FFmpeg后处理模块
+封装转换和重新编码作为独立的流水线阶段，在按CPU核数配置的进程池中执行，
+与网络下载使用不同的队列，下载不会因为等待编码而停顿
+"""
+
+import logging
+import os
+import subprocess
+from typing import Any, Dict, List, Optional
+
+from app.format_policy import POSTPROCESS_CONVERT, POSTPROCESS_REMUX, TARGET_EXT
+from app.worker_pool import WorkerPool
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 重新编码参数（画质与速度的折中）
+CONVERT_VIDEO_ARGS = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23"]
+CONVERT_AUDIO_ARGS = ["-c:a", "aac", "-b:a", "128k"]
+
+
+def build_ffmpeg_command(input_path: str, output_path: str, action: str, threads: int = 0) -> List[str]:
+    """
+    生成ffmpeg命令
+
+    参数:
+    - input_path: 输入文件路径
+    - output_path: 输出文件路径
+    - action: 后处理方式（封装转换或重新编码）
+    - threads: 编码线程数，0表示由ffmpeg自动决定
+
+    返回:
+    - 命令参数列表
+    """
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-y", "-i", input_path, "-map", "0:v?",
+               "-map", "0:a?"]
+    if action == POSTPROCESS_REMUX:
+        # 只复制音视频流，不解码
+        command += ["-c", "copy"]
+    elif action == POSTPROCESS_CONVERT:
+        command += CONVERT_VIDEO_ARGS + CONVERT_AUDIO_ARGS + ["-threads", str(threads)]
+    else:
+        raise ValueError(f"不支持的后处理方式: {action}")
+
+    # 把索引移到文件头部，客户端无需下载完整文件即可开始播放
+    command += ["-movflags", "+faststart", output_path]
+    return command
+
+
+def run_ffmpeg(command: List[str], nice: int = 0) -> float:
+    """
+    执行ffmpeg命令（在进程池中运行）
+
+    参数:
+    - command: 命令参数列表
+    - nice: 进程优先级调整值，数值越大优先级越低
+
+    返回:
+    - CPU耗时（秒）
+    """
+    preexec_fn = None
+    if nice and hasattr(os, "nice"):
+        preexec_fn = lambda: os.nice(nice)  # 只降低ffmpeg子进程的优先级
+
+    before = os.times()
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, preexec_fn=preexec_fn)
+    after = os.times()
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg执行失败: {result.stderr.decode('utf-8', 'replace').strip()[-500:]}")
+    return (after.children_user - before.children_user) + (after.children_system - before.children_system)
+
+
+class PostProcessStage:
+    """
+    后处理阶段类
+    每个任务占用进程池中的一个名额，并发数不超过CPU核数；编码线程数和优先级按任务设置
+    """
+
+    def __init__(self, pool: Optional[WorkerPool] = None, threads: int = 0, nice: int = 10):
+        """
+        初始化后处理阶段
+
+        参数:
+        - pool: 执行ffmpeg的进程池，默认按CPU核数创建
+        - threads: 每个重新编码任务的线程数，0表示按CPU核数和并发数平均分配
+        - nice: ffmpeg进程的优先级调整值（让出CPU给下载和API请求）
+        """
+        self.pool = pool or WorkerPool("postprocess", max_workers=os.cpu_count() or 1, kind="process")
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.pool.max_concurrency)
+        self.nice = nice
+        self._cpu_seconds = 0.0  # ffmpeg累计CPU耗时
+        self._by_action: Dict[str, int] = {}  # 各后处理方式的执行次数
+
+    async def process(self, input_path: str, action: str) -> str:
+        """
+        对下载完成的文件执行后处理
+
+        参数:
+        - input_path: 下载的原始文件路径
+        - action: 后处理方式
+
+        返回:
+        - 处理后的文件路径（原始文件会被删除）
+        """
+        base = os.path.splitext(input_path)[0]
+        output_path = f"{base}.{TARGET_EXT}"
+        temp_path = f"{base}.pp-{os.getpid()}.{TARGET_EXT}"  # 处理完成前不覆盖目标文件
+        command = build_ffmpeg_command(input_path, temp_path, action, self.threads)
+
+        logger.info(f"开始后处理: {action} {input_path}")
+        try:
+            cpu_seconds = await self.pool.run(run_ffmpeg, command, self.nice)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        os.replace(temp_path, output_path)
+        if os.path.abspath(input_path) != os.path.abspath(output_path):
+            os.remove(input_path)
+
+        self._cpu_seconds += cpu_seconds
+        self._by_action[action] = self._by_action.get(action, 0) + 1
+        logger.info(f"后处理完成: {output_path} (CPU {cpu_seconds:.2f}s)")
+        return output_path
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取后处理统计信息
+
+        返回:
+        - 各方式执行次数和累计CPU耗时（进程池状态见工作池统计）
+        """
+        return {
+            "threads_per_job": self.threads,
+            "nice": self.nice,
+            "by_action": dict(self._by_action),
+            "cpu_seconds": round(self._cpu_seconds, 2),
+        }
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+请求性能剖析模块
+按请求头或采样率对单个下载请求开启剖析：记录各阶段耗时（span），并在工作线程中用cProfile剖析yt-dlp的执行，
+只保留最慢的N个请求的剖析结果供管理接口查看；未开启剖析的请求只多一次上下文变量读取
+"""
+
+import cProfile
+import heapq
+import hmac
+import io
+import itertools
+import logging
+import pstats
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 剖析时钟
+CLOCK_WALL = "wall"  # 墙钟时间（包含网络等待）
+CLOCK_CPU = "cpu"  # 线程CPU时间（只统计计算，如提取器的正则和签名解析）
+
+# 剖析报告保留的函数数
+REPORT_LINES = 40
+
+# 当前请求的剖析会话（未开启剖析时为None）
+_session: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+
+class ProfileSession:
+    """
+    单个请求的剖析会话类
+    """
+
+    def __init__(self, label: str, reason: str, clock: str = CLOCK_WALL):
+        """
+        初始化剖析会话
+
+        参数:
+        - label: 请求描述（如视频链接）
+        - reason: 开启原因（header 或 sample）
+        - clock: cProfile使用的时钟（wall 或 cpu）
+        """
+        self.id = uuid.uuid4().hex  # 会话ID
+        self.label = label  # 请求描述
+        self.reason = reason  # 开启原因
+        self.clock = clock  # 剖析时钟
+        self.started_at = datetime.now()  # 开始时间
+        self._started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []  # 阶段耗时
+        self.profiles: List[Dict[str, Any]] = []  # 工作线程中的cProfile报告
+        self.status = "running"  # 请求结果
+        self.wall_seconds = 0.0  # 总耗时
+
+    def add_span(self, name: str, seconds: float, **attrs):
+        """
+        记录一个阶段的耗时
+
+        参数:
+        - name: 阶段名称
+        - seconds: 耗时（秒）
+        - attrs: 附加信息
+        """
+        offset = time.perf_counter() - self._started - seconds
+        span = {"name": name, "offset": round(max(0.0, offset), 4), "seconds": round(seconds, 4)}
+        span.update(attrs)
+        self.spans.append(span)
+
+    def finish(self, status: str):
+        """
+        结束会话
+
+        参数:
+        - status: 请求结果（succeeded/failed）
+        """
+        self.status = status
+        self.wall_seconds = time.perf_counter() - self._started
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        会话摘要（不含cProfile报告）
+
+        返回:
+        - 摘要字典
+        """
+        return {
+            "id": self.id,
+            "label": self.label,
+            "reason": self.reason,
+            "clock": self.clock,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "wall_seconds": round(self.wall_seconds, 4),
+            "cpu_seconds": round(sum(p["cpu_seconds"] for p in self.profiles), 4),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        完整会话（含阶段耗时和cProfile报告）
+
+        返回:
+        - 会话字典
+        """
+        data = self.summary()
+        data["spans"] = list(self.spans)
+        data["profiles"] = list(self.profiles)
+        return data
+
+
+def current() -> Optional[ProfileSession]:
+    """
+    获取当前请求的剖析会话
+
+    返回:
+    - 剖析会话，未开启剖析时为None
+    """
+    return _session.get()
+
+
+def add_span(name: str, seconds: float, **attrs):
+    """
+    向当前请求的剖析会话记录阶段耗时（未开启剖析时不做任何事）
+
+    参数:
+    - name: 阶段名称
+    - seconds: 耗时（秒）
+    - attrs: 附加信息
+    """
+    session = _session.get()
+    if session is not None:
+        session.add_span(name, seconds, **attrs)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """
+    记录代码块耗时到当前请求的剖析会话（未开启剖析时不计时）
+
+    参数:
+    - name: 阶段名称
+    - attrs: 附加信息
+
+    返回:
+    - 附加信息字典，可在代码块中补充（如工作线程返回的分段耗时）
+    """
+    session = _session.get()
+    if session is None:
+        yield attrs
+        return
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        session.add_span(name, time.perf_counter() - started, **attrs)
+
+
+def run_profiled(clock: str, func: Callable[..., Any], *args) -> Tuple[Any, Dict[str, Any]]:
+    """
+    在当前线程中用cProfile执行函数（在工作池线程/进程中调用）
+
+    参数:
+    - clock: 剖析时钟（wall 或 cpu）
+    - func: 被剖析的函数
+    - args: 函数参数
+
+    返回:
+    - (函数返回值, 剖析报告)
+    """
+    profiler = cProfile.Profile(time.thread_time) if clock == CLOCK_CPU else cProfile.Profile()
+    cpu_started = time.thread_time()
+    wall_started = time.perf_counter()
+    profiler.enable()
+    try:
+        result = func(*args)
+    finally:
+        profiler.disable()
+    report = {
+        "function": getattr(func, "__name__", str(func)),
+        "clock": clock,
+        "wall_seconds": round(time.perf_counter() - wall_started, 4),
+        "cpu_seconds": round(time.thread_time() - cpu_started, 4),
+        "report": format_profile(profiler),
+    }
+    return result, report
+
+
+def format_profile(profiler: cProfile.Profile, lines: int = REPORT_LINES) -> str:
+    """
+    生成按累计耗时排序的文本报告
+
+    参数:
+    - profiler: 已停止的剖析器
+    - lines: 保留的函数数
+
+    返回:
+    - 报告文本
+    """
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(lines)
+    return output.getvalue()
+
+
+class Profiler:
+    """
+    剖析控制类
+    决定请求是否开启剖析，并只保留耗时最长的N个会话
+    """
+
+    def __init__(self, sample_rate: float = 0.0, keep: int = 20, clock: str = CLOCK_WALL,
+                 header_token: Optional[str] = None):
+        """
+        初始化剖析控制
+
+        参数:
+        - sample_rate: 随机开启剖析的比例（0~1），0表示只按请求头开启
+        - keep: 保留的最慢会话数
+        - clock: 剖析时钟（wall 或 cpu）
+        - header_token: 请求头的值必须等于该令牌才开启剖析，None表示任意非空值
+        """
+        if clock not in (CLOCK_WALL, CLOCK_CPU):
+            raise ValueError(f"不支持的剖析时钟: {clock}")
+        self.sample_rate = sample_rate
+        self.keep = max(1, keep)
+        self.clock = clock
+        self.header_token = header_token
+        self._slowest: List[Tuple[float, int, ProfileSession]] = []  # (耗时, 序号, 会话) 小顶堆
+        self._sequence = itertools.count()
+        self._profiled = 0  # 剖析过的请求数
+
+    def should_profile(self, header_value: Optional[str]) -> Optional[str]:
+        """
+        判断请求是否开启剖析
+
+        参数:
+        - header_value: 请求头 X-Debug-Profile 的值
+
+        返回:
+        - 开启原因（header 或 sample），不开启时为None
+        """
+        if header_value and (self.header_token is None or hmac.compare_digest(header_value, self.header_token)):
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    @contextmanager
+    def activate(self, label: str, reason: str) -> Iterator[ProfileSession]:
+        """
+        为当前请求开启剖析会话，结束后按耗时决定是否保留
+
+        参数:
+        - label: 请求描述
+        - reason: 开启原因
+
+        返回:
+        - 剖析会话
+        """
+        session = ProfileSession(label, reason, self.clock)
+        token = _session.set(session)
+        status = "failed"
+        try:
+            yield session
+            status = "succeeded"
+        finally:
+            _session.reset(token)
+            session.finish(status)
+            self._record(session)
+
+    def _record(self, session: ProfileSession):
+        """保留最慢的N个会话"""
+        self._profiled += 1
+        item = (session.wall_seconds, next(self._sequence), session)
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, item)
+        elif item[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+        logger.info(f"请求剖析完成: {session.label} {session.wall_seconds:.3f}s ({session.id})")
+
+    def slowest(self) -> List[Dict[str, Any]]:
+        """
+        获取保留的会话摘要（从慢到快）
+
+        返回:
+        - 会话摘要列表
+        """
+        return [session.summary() for _, _, session in sorted(self._slowest, reverse=True)]
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取保留的完整会话
+
+        参数:
+        - session_id: 会话ID
+
+        返回:
+        - 会话字典，已被淘汰或不存在时为None
+        """
+        for _, _, session in self._slowest:
+            if session.id == session_id:
+                return session.to_dict()
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取剖析统计信息
+
+        返回:
+        - 配置和剖析次数
+        """
+        return {
+            "sample_rate": self.sample_rate,
+            "keep": self.keep,
+            "clock": self.clock,
+            "profiled": self._profiled,
+            "retained": len(self._slowest),
+        }
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+下载进度模块
+在工作线程中接收yt-dlp的进度回调，节流合并后发布到事件循环，再推送给每个任务的订阅者
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 下载阶段
+STAGE_QUEUED = "queued"  # 排队等待
+STAGE_EXTRACT = "extract"  # 提取视频信息
+STAGE_DOWNLOAD = "download"  # 下载媒体数据
+STAGE_POSTPROCESS = "postprocess"  # 合并/封装转换/重新编码
+
+# 默认最短发布间隔（秒）
+DEFAULT_INTERVAL = 0.5
+
+
+class ProgressChannel:
+    """
+    进度通道类（每个任务一个）
+    只保留最新的进度；订阅者处理较慢时丢弃旧进度，不会积压
+    """
+
+    def __init__(self):
+        """
+        初始化进度通道
+        """
+        self.latest: Optional[Dict[str, Any]] = None  # 最新进度
+        self.closed = False  # 是否已结束
+        self._subscribers: List[asyncio.Queue] = []  # 订阅者队列（容量为1）
+
+    def publish(self, snapshot: Dict[str, Any]):
+        """
+        发布进度（必须在事件循环中调用）
+
+        参数:
+        - snapshot: 进度快照
+        """
+        if self.closed:
+            return
+        self.latest = snapshot
+        for queue in self._subscribers:
+            self._offer(queue, snapshot)
+
+    def close(self):
+        """
+        结束通道，通知所有订阅者
+        """
+        self.closed = True
+        for queue in self._subscribers:
+            self._offer(queue, None)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, item: Optional[Dict[str, Any]]):
+        """
+        放入队列，队列已满时替换未被读取的旧进度
+        """
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    async def subscribe(self, heartbeat: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        订阅进度
+
+        参数:
+        - heartbeat: 超过该时间没有新进度时产出None（用于发送心跳保持连接）
+
+        返回:
+        - 进度快照异步迭代器，通道结束时停止
+        """
+        if self.closed:
+            return
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        self._subscribers.append(queue)
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if item is None:
+                    return
+                yield item
+        finally:
+            self._subscribers.remove(queue)
+
+
+class ProgressReporter:
+    """
+    进度上报类（每个实际执行的下载一个，合并的重复请求共享）
+    可在任意线程调用update；同一阶段内的更新按最短间隔合并，阶段变化立即发布
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float = DEFAULT_INTERVAL):
+        """
+        初始化进度上报器
+
+        参数:
+        - loop: 发布进度的事件循环
+        - interval: 同一阶段内两次发布的最短间隔（秒）
+        """
+        self.loop = loop
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._snapshot: Dict[str, Any] = {"stage": STAGE_QUEUED}  # 最新进度
+        self._channels: List[ProgressChannel] = []  # 接收进度的任务通道
+        self._scheduled = False  # 是否已安排发布
+        self._last_publish = 0.0  # 上次发布时间（monotonic）
+        self._updates = 0  # 收到的更新次数
+        self._published = 0  # 实际发布次数
+
+    def attach(self, channel: ProgressChannel):
+        """
+        关联任务通道（必须在事件循环中调用）
+
+        参数:
+        - channel: 任务的进度通道
+        """
+        self._channels.append(channel)
+        with self._lock:
+            snapshot = dict(self._snapshot)
+        channel.publish(snapshot)
+
+    def update(self, immediate: bool = False, **fields):
+        """
+        更新进度（可在工作线程中调用）
+
+        参数:
+        - immediate: 是否立即发布（如下载完成），否则按最短间隔合并
+        - fields: 进度字段（stage、downloaded_bytes、total_bytes、speed、eta等）
+        """
+        with self._lock:
+            self._updates += 1
+            stage_changed = 'stage' in fields and fields['stage'] != self._snapshot.get('stage')
+            if stage_changed:
+                # 新阶段不沿用上一阶段的字节数和速度
+                self._snapshot = {}
+            self._snapshot.update(fields)
+            immediate = immediate or stage_changed
+            if self._scheduled and not immediate:
+                return
+            self._scheduled = True
+            delay = 0.0 if immediate else max(0.0, self.interval - (time.monotonic() - self._last_publish))
+
+        try:
+            self.loop.call_soon_threadsafe(self._schedule, delay)
+        except RuntimeError:
+            # 事件循环已关闭（服务正在退出）
+            pass
+
+    def _schedule(self, delay: float):
+        """
+        在事件循环中安排发布
+        """
+        if delay > 0:
+            self.loop.call_later(delay, self._flush)
+        else:
+            self._flush()
+
+    def _flush(self):
+        """
+        发布最新进度（在事件循环中执行）
+        """
+        with self._lock:
+            if not self._scheduled:
+                return
+            self._scheduled = False
+            self._last_publish = time.monotonic()
+            snapshot = dict(self._snapshot)
+        self._published += 1
+        for channel in self._channels:
+            channel.publish(snapshot)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取上报统计信息
+
+        返回:
+        - 收到的更新次数和实际发布次数
+        """
+        return {"updates": self._updates, "published": self._published}
+
+
+def hook_fields(status: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将yt-dlp进度回调参数转换为进度字段
+
+    参数:
+    - status: yt-dlp progress_hooks 的参数
+
+    返回:
+    - 进度字段
+    """
+    downloaded = status.get('downloaded_bytes')
+    total = status.get('total_bytes') or status.get('total_bytes_estimate')
+    fields = {
+        "stage": STAGE_DOWNLOAD,
+        "downloaded_bytes": downloaded,
+        "total_bytes": total,
+        "speed": status.get('speed'),
+        "eta": status.get('eta'),
+    }
+    if status.get('status') == 'finished':
+        fields["percent"] = 100.0
+    elif downloaded is not None and total:
+        fields["percent"] = round(min(downloaded / total * 100, 100.0), 1)
+    if status.get('fragment_count'):
+        fields["fragment_index"] = status.get('fragment_index')
+        fields["fragment_count"] = status.get('fragment_count')
+    return fields
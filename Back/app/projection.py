@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+结果字段投影模块
+声明下载结果可返回的字段，只提取和序列化调用方需要的字段
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, Optional, Set
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 默认返回的字段（与DownloadResponse一致）
+DEFAULT_FIELDS = ("video_url", "filename", "file_size", "duration", "thumbnail_url", "platform")
+
+# 轻量字段：结果字段名 -> yt-dlp信息字段名，随下载结果一起保存在缓存中
+LIGHT_FIELDS = {
+    "title": "title",
+    "thumbnail_url": "thumbnail",
+    "format": "format",
+    "format_id": "format_id",
+    "ext": "ext",
+    "resolution": "resolution",
+    "width": "width",
+    "height": "height",
+    "fps": "fps",
+    "vcodec": "vcodec",
+    "acodec": "acodec",
+    "tbr": "tbr",
+    "protocol": "protocol",
+    "uploader": "uploader",
+    "uploader_id": "uploader_id",
+    "uploader_url": "uploader_url",
+    "channel": "channel",
+    "channel_id": "channel_id",
+    "upload_date": "upload_date",
+    "timestamp": "timestamp",
+    "view_count": "view_count",
+    "like_count": "like_count",
+    "comment_count": "comment_count",
+    "description": "description",
+    "tags": "tags",
+    "categories": "categories",
+    "age_limit": "age_limit",
+    "live_status": "live_status",
+    "availability": "availability",
+    "webpage_url": "webpage_url",
+    "extractor": "extractor",
+    "extractor_key": "extractor_key",
+    "id": "id",
+}
+
+# 重量字段：体积大（格式列表、字幕等），不随结果复制，需要时从 .info.json 旁路文件按需读取
+HEAVY_FIELDS = (
+    "formats",
+    "requested_formats",
+    "thumbnails",
+    "subtitles",
+    "automatic_captions",
+    "chapters",
+    "http_headers",
+)
+
+# 下载流程生成的字段（不来自yt-dlp信息）
+PIPELINE_FIELDS = ("video_url", "filename", "file_size", "duration", "platform",
+                   "cached", "processed", "remove_watermark")
+
+# 所有可请求的字段
+ALL_FIELDS = set(LIGHT_FIELDS) | set(HEAVY_FIELDS) | set(PIPELINE_FIELDS)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """
+    解析fields查询参数
+
+    参数:
+    - fields: 逗号分隔的字段列表
+
+    返回:
+    - 字段集合，未指定时返回None（使用默认字段）
+    """
+    if not fields:
+        return None
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - ALL_FIELDS
+    if unknown:
+        raise ValueError(f"不支持的字段: {', '.join(sorted(unknown))}")
+    return requested
+
+
+def project_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    从yt-dlp信息中提取轻量字段
+
+    参数:
+    - info: yt-dlp提取的视频信息
+
+    返回:
+    - 只包含轻量字段的字典
+    """
+    return {name: info.get(key) for name, key in LIGHT_FIELDS.items()}
+
+
+def info_json_path(file_path: str) -> str:
+    """
+    获取视频文件对应的 .info.json 旁路文件路径
+
+    参数:
+    - file_path: 视频文件路径
+
+    返回:
+    - 信息文件路径
+    """
+    return f"{os.path.splitext(file_path)[0]}.info.json"
+
+
+def load_heavy_fields(file_path: str, fields: Iterable[str]) -> Dict[str, Any]:
+    """
+    从 .info.json 旁路文件按需读取重量字段
+
+    参数:
+    - file_path: 视频文件路径
+    - fields: 需要的重量字段
+
+    返回:
+    - 字段字典，信息文件不存在时字段值为None
+    """
+    fields = [name for name in fields if name in HEAVY_FIELDS]
+    if not fields:
+        return {}
+
+    try:
+        with open(info_json_path(file_path), "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取视频信息文件失败: {str(e)}")
+        info = {}
+    return {name: info.get(name) for name in fields}
@@ -0,0 +1,521 @@
+# -*- coding: utf-8 -*-
+"""
+并行下载模块
+接管yt-dlp实例的下载调用：较大的单文件按字节范围分段、多个连接同时下载，预分配文件后用pwrite写入各自的偏移；
+HLS/DASH分片视频按可用连接数设置yt-dlp的并发分片数。所有下载共享一个全局连接预算，单个分段或分片失败只重试该部分
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 按分片下载的协议（由yt-dlp并发下载分片）
+FRAGMENT_PROTOCOLS = ("m3u8_native", "http_dash_segments", "http_dash_segments_generator")
+
+# 可以按字节范围分段下载的协议
+RANGE_PROTOCOLS = ("http", "https")
+
+# 每次从连接读取并写入文件的字节数
+READ_SIZE = 1024 * 1024
+
+# 进度上报间隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+# Content-Range响应头格式
+CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+# 分段下载进度文件的后缀（与 .part 文件并列，记录已完成的分段，重启后据此继续下载）
+STATE_SUFFIX = ".ranges"
+
+
+class RangeNotSupported(Exception):
+    """
+    源站不支持Range请求（改用单连接下载）
+    """
+
+
+class ConnectionBudget:
+    """
+    全局连接预算类
+    每个下载按需租用若干连接（至少1个），预算用完时等待其他下载归还
+    """
+
+    def __init__(self, limit: int):
+        """
+        初始化连接预算
+
+        参数:
+        - limit: 所有下载同时使用的连接数上限
+        """
+        self.limit = max(1, limit)
+        self.available = self.limit
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def lease(self, want: int) -> Iterator[int]:
+        """
+        租用连接
+
+        参数:
+        - want: 希望使用的连接数
+
+        返回:
+        - 实际分到的连接数（1 ~ want）
+        """
+        with self._condition:
+            while self.available < 1:
+                self._condition.wait()
+            granted = min(max(1, want), self.available)
+            self.available -= granted
+        try:
+            yield granted
+        finally:
+            with self._condition:
+                self.available += granted
+                self._condition.notify_all()
+
+
+class RangeDownload:
+    """
+    单个文件的分段下载
+    工作线程只写文件和累计字节数，进度由发起下载的线程统一上报（进度上报器绑定在该线程上）；
+    每完成一个分段写入进度文件，中断后（包括服务重启）只重新下载未完成的分段
+    """
+
+    def __init__(self, ydl, url: str, headers: Dict[str, str], path: str, total: int,
+                 chunk_size: int, retries: int):
+        """
+        初始化分段下载
+
+        参数:
+        - ydl: yt-dlp实例（发起请求，复用其代理、Cookie等网络配置）
+        - url: 媒体地址
+        - headers: 请求头
+        - path: 临时文件路径
+        - total: 文件大小（字节）
+        - chunk_size: 每个分段的字节数
+        - retries: 单个分段的重试次数
+        """
+        self.ydl = ydl
+        self.url = url
+        self.headers = headers
+        self.path = path
+        self.total = total
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.state_path = path + STATE_SUFFIX  # 进度文件路径
+        self.downloaded = 0  # 已写入的字节数
+        self._done: set = set()  # 已完成分段的起始字节
+        self._chunks: Iterator[Tuple[int, int]] = iter(())
+        self._lock = threading.Lock()
+        self._failed = threading.Event()
+        self._fd: Optional[int] = None
+
+    def _load_state(self) -> Optional[set]:
+        """
+        读取进度文件（文件大小和分段大小与本次一致、临时文件完整预分配时才有效）
+
+        返回:
+        - 已完成分段的起始字节，无法继续时返回None
+        """
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if (state.get('total') != self.total or state.get('chunk_size') != self.chunk_size
+                    or os.path.getsize(self.path) != self.total):
+                return None
+            return set(state.get('done') or [])
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self):
+        """写入进度文件（先写临时文件再重命名，调用方持有锁）"""
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'total': self.total, 'chunk_size': self.chunk_size, 'done': sorted(self._done)}, f)
+        os.replace(temp_path, self.state_path)
+
+    def open(self) -> bool:
+        """
+        打开临时文件：有有效的进度文件时继续下载未完成的分段，否则创建临时文件并预分配空间
+        （不支持预分配的文件系统上只设置文件大小）
+
+        返回:
+        - 是否从上次的进度继续
+        """
+        done = self._load_state()
+        if done is not None:
+            self._fd = os.open(self.path, os.O_RDWR)
+        else:
+            done = set()
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.posix_fallocate(self._fd, 0, self.total)
+            except (AttributeError, OSError):
+                os.ftruncate(self._fd, self.total)
+            self._save_state()
+        self._done = done
+
+        chunks = []
+        for start in range(0, self.total, self.chunk_size):
+            end = min(start + self.chunk_size, self.total) - 1
+            if start in done:
+                self.downloaded += end - start + 1
+            else:
+                chunks.append((start, end))
+        self._chunks = iter(chunks)
+        return bool(done)
+
+    def close(self):
+        """关闭临时文件"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def request(self, start: int, end: int):
+        """
+        请求一个字节范围
+
+        参数:
+        - start: 起始字节
+        - end: 结束字节（包含）
+
+        返回:
+        - 响应对象
+
+        异常:
+        - RangeNotSupported: 源站忽略了Range
+        """
+        from yt_dlp.networking import Request
+
+        headers = dict(self.headers, Range=f"bytes={start}-{end}")
+        response = self.ydl.urlopen(Request(self.url, headers=headers))
+        match = CONTENT_RANGE_RE.fullmatch(response.headers.get("Content-Range") or "")
+        if response.status != 206 or not match or int(match.group(1)) != start:
+            response.close()
+            raise RangeNotSupported(f"源站不支持Range请求: HTTP {response.status}")
+        return response
+
+    def fetch(self, start: int, end: int, response=None):
+        """
+        下载一个分段并写入对应偏移，连接中断时从已写入的位置继续（只重试该分段）
+
+        参数:
+        - start: 起始字节
+        - end: 结束字节（包含）
+        - response: 已打开的该范围的响应（探测请求复用）
+        """
+        position = start
+        attempt = 0
+        while position <= end:
+            if self._failed.is_set():
+                return
+            try:
+                if response is None:
+                    response = self.request(position, end)
+                while position <= end:
+                    if self._failed.is_set():
+                        return
+                    data = response.read(min(READ_SIZE, end - position + 1))
+                    if not data:
+                        raise IOError(f"连接提前关闭: {position}/{end}")
+                    os.pwrite(self._fd, data, position)
+                    position += len(data)
+                    with self._lock:
+                        self.downloaded += len(data)
+            except RangeNotSupported:
+                raise
+            except Exception as e:
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                logger.warning(f"分段下载中断，第 {attempt} 次重试: bytes={position}-{end} {str(e)}")
+                time.sleep(min(0.5 * attempt, 5))
+            finally:
+                if response is not None:
+                    response.close()
+                    response = None
+        with self._lock:
+            self._done.add(start)
+            self._save_state()
+
+    def worker(self, first: Optional[Tuple[int, int, Any]] = None):
+        """
+        下载线程：依次领取分段直到全部完成
+
+        参数:
+        - first: 探测请求对应的首个分段 (起始, 结束, 响应)
+        """
+        try:
+            if first is not None:
+                self.fetch(*first)
+            while not self._failed.is_set():
+                chunk = self.next_chunk()
+                if chunk is None:
+                    return
+                self.fetch(*chunk)
+        except BaseException:
+            self._failed.set()
+            raise
+
+    def cancel(self):
+        """通知所有下载线程停止（正在读取的线程在本次读取返回后退出，不再写入文件）"""
+        self._failed.set()
+
+    def next_chunk(self) -> Optional[Tuple[int, int]]:
+        """领取下一个分段"""
+        with self._lock:
+            return next(self._chunks, None)
+
+
+class ParallelDownloader:
+    """
+    并行下载类
+    包装yt-dlp实例的dl方法，按协议选择分段下载、并发分片下载或yt-dlp原有的单连接下载
+    """
+
+    def __init__(self, connections: int = 4, max_connections: int = 32, chunk_size: int = 8 * 1024 * 1024,
+                 min_size: int = 16 * 1024 * 1024, retries: int = 5):
+        """
+        初始化并行下载
+
+        参数:
+        - connections: 单个下载最多使用的连接数（分段数或并发分片数）
+        - max_connections: 所有下载同时使用的连接数上限（每个进程）
+        - chunk_size: 分段大小（字节）
+        - min_size: 小于该大小的文件使用单连接下载（字节）
+        - retries: 单个分段的重试次数
+        """
+        self.connections = max(1, connections)
+        self.max_connections = max(1, max_connections)
+        self.chunk_size = max(READ_SIZE, chunk_size)
+        self.min_size = min_size
+        self.retries = retries
+        self._init_runtime()
+
+    def _init_runtime(self):
+        """创建连接预算和分段下载线程池（线程池按需创建）"""
+        self.budget = ConnectionBudget(self.max_connections)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._range_downloads = 0  # 分段下载的文件数
+        self._fallbacks = 0  # 不支持Range而改用单连接的次数
+
+    def __getstate__(self):
+        """
+        序列化时只保留配置（进程池模式下每个子进程有自己的连接预算）
+        """
+        return {key: getattr(self, key) for key in
+                ("connections", "max_connections", "chunk_size", "min_size", "retries")}
+
+    def __setstate__(self, state):
+        """
+        反序列化时重新创建连接预算
+        """
+        self.__dict__.update(state)
+        self._init_runtime()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """分段下载线程池（线程数等于全局连接上限，租到连接的下载不会因线程不足而等待）"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_connections,
+                                                    thread_name_prefix="range")
+            return self._executor
+
+    def install(self, ydl, progress_hook: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        接管yt-dlp实例的下载调用
+
+        参数:
+        - ydl: yt-dlp实例（每个工作线程独立的实例）
+        - progress_hook: 分段下载的进度回调（格式与yt-dlp进度回调相同，在发起下载的线程中调用）
+        """
+        original = ydl.dl
+
+        def dl(name, info, subtitle=False, test=False):
+            return self.download(ydl, original, name, info, subtitle, test, progress_hook)
+
+        ydl.dl = dl
+
+    def download(self, ydl, original: Callable, name: str, info: Dict[str, Any], subtitle: bool, test: bool,
+                 progress_hook: Optional[Callable[[Dict[str, Any]], None]]):
+        """
+        执行一次下载（替代 YoutubeDL.dl）
+
+        参数:
+        - ydl: yt-dlp实例
+        - original: yt-dlp原有的dl方法
+        - name: 输出文件名
+        - info: 格式信息
+        - subtitle: 是否为字幕
+        - test: 是否为测试下载
+        - progress_hook: 进度回调
+
+        返回:
+        - (是否成功, 是否实际下载)，与 YoutubeDL.dl 相同
+        """
+        protocol = info.get("protocol") or ""
+        if subtitle or test or name == "-" or info.get("is_live") or os.path.exists(name):
+            # 文件已存在时由yt-dlp判断是否需要重新下载
+            return original(name, info, subtitle, test)
+
+        if protocol in FRAGMENT_PROTOCOLS:
+            # 分片视频：按分到的连接数设置yt-dlp的并发分片数（实例属于当前线程，可以直接修改参数）
+            with self.budget.lease(self.connections) as granted:
+                ydl.params["concurrent_fragment_downloads"] = granted
+                return original(name, info, subtitle, test)
+
+        temp_path = f"{name}.part"
+        filesize = info.get("filesize") or info.get("filesize_approx")
+        if (protocol not in RANGE_PROTOCOLS or info.get("requested_formats") or self.connections < 2
+                or (filesize and filesize < self.min_size)
+                or (os.path.exists(temp_path) and not os.path.exists(temp_path + STATE_SUFFIX))):
+            # 单连接下载（已有单连接下载留下的 .part 文件时，由yt-dlp从其末尾继续）
+            self._discard_ranges(temp_path)
+            with self.budget.lease(1):
+                return original(name, info, subtitle, test)
+
+        with self.budget.lease(self.connections) as granted:
+            if granted > 1:
+                try:
+                    return self._range_download(ydl, name, info, granted, progress_hook)
+                except RangeNotSupported as e:
+                    self._fallbacks += 1
+                    logger.info(f"{str(e)}，改用单连接下载")
+                    self._discard_ranges(temp_path)
+            return original(name, info, subtitle, test)
+
+    @staticmethod
+    def _discard_ranges(temp_path: str):
+        """
+        删除分段下载留下的临时文件和进度文件
+        预分配的临时文件已是完整大小，yt-dlp按文件大小续传时会误认为已下载完成，改用单连接下载前必须删除
+
+        参数:
+        - temp_path: 临时文件路径
+        """
+        if not os.path.exists(temp_path + STATE_SUFFIX):
+            return
+        for path in (temp_path, temp_path + STATE_SUFFIX):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _range_download(self, ydl, name: str, info: Dict[str, Any], connections: int,
+                        progress_hook: Optional[Callable[[Dict[str, Any]], None]]) -> Tuple[bool, bool]:
+        """
+        分段下载单个文件
+
+        参数:
+        - ydl: yt-dlp实例
+        - name: 输出文件名
+        - info: 格式信息
+        - connections: 使用的连接数
+        - progress_hook: 进度回调
+
+        返回:
+        - (True, True)
+
+        异常:
+        - RangeNotSupported: 源站不支持Range或文件小于分段下载的下限
+        """
+        headers = dict(info.get("http_headers") or {})
+        temp_path = f"{name}.part"
+
+        # 首个分段的请求同时用于探测文件大小和Range支持
+        probe = RangeDownload(ydl, info["url"], headers, temp_path, 0, self.chunk_size, self.retries)
+        response = probe.request(0, self.chunk_size - 1)
+        total = int(CONTENT_RANGE_RE.fullmatch(response.headers.get("Content-Range")).group(3))
+        if total < self.min_size:
+            response.close()
+            raise RangeNotSupported(f"文件较小（{total} 字节）")
+
+        job = RangeDownload(ydl, info["url"], headers, temp_path, total, self.chunk_size, self.retries)
+        if job.open():
+            logger.info(f"从已下载的 {job.downloaded} 字节继续分段下载: {os.path.basename(name)}")
+        first = job.next_chunk()
+        if first is not None and first[0] == 0:
+            first = (first[0], first[1], response)
+        else:
+            # 首个分段已下载过，探测请求只用于获取文件大小
+            response.close()
+            first = (first[0], first[1], None) if first is not None else None
+        started = time.monotonic()
+        futures = []
+        try:
+            futures.append(self.executor.submit(job.worker, first))
+            futures += [self.executor.submit(job.worker) for _ in range(connections - 1)]
+            pending = futures
+            while pending:
+                done, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    future.result()  # 任一分段重试耗尽时抛出
+                self._report(progress_hook, "downloading", name, temp_path, job.downloaded, total, started)
+        except BaseException:
+            # 失败或被中断（包括KeyboardInterrupt）：先通知其余线程停止并等待全部退出，
+            # 之后才能关闭文件描述符、归还连接（否则仍在读取的线程会写入已关闭或被其他下载复用的描述符）
+            job.cancel()
+            if first is not None and first[2] is not None and not futures:
+                first[2].close()
+            for future in wait(futures).done:
+                error = future.exception()
+                if error is not None:
+                    logger.debug(f"分段下载线程退出: {str(error)}")
+            job.close()
+            raise
+        job.close()
+
+        os.replace(temp_path, name)
+        os.remove(job.state_path)
+        self._range_downloads += 1
+        self._report(progress_hook, "finished", name, temp_path, total, total, started)
+        logger.info(f"分段下载完成: {os.path.basename(name)} {total} 字节，{connections} 个连接")
+        return True, True
+
+    @staticmethod
+    def _report(progress_hook: Optional[Callable[[Dict[str, Any]], None]], status: str, name: str,
+                temp_path: str, downloaded: int, total: int, started: float):
+        """上报进度（字段与yt-dlp的进度回调一致）"""
+        if progress_hook is None:
+            return
+        elapsed = max(time.monotonic() - started, 1e-6)
+        speed = downloaded / elapsed
+        progress_hook({
+            "status": status,
+            "filename": name,
+            "tmpfilename": temp_path,
+            "downloaded_bytes": downloaded,
+            "total_bytes": total,
+            "elapsed": elapsed,
+            "speed": speed,
+            "eta": int((total - downloaded) / speed) if speed else None,
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取并行下载统计信息
+
+        返回:
+        - 配置、可用连接数和分段下载次数（当前进程）
+        """
+        return {
+            "connections": self.connections,
+            "max_connections": self.max_connections,
+            "available_connections": self.budget.available,
+            "chunk_size": self.chunk_size,
+            "min_size": self.min_size,
+            "range_downloads": self._range_downloads,
+            "range_fallbacks": self._fallbacks,
+        }
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+就绪检查模块
+区分存活（进程能响应请求）和就绪（预热完成、可以接收流量）：启动后在后台执行预热任务，
+全部完成前就绪检查返回未就绪，负载均衡器不会把请求转发到尚未预热的进程；关闭时先切换为未就绪再停止服务
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """
+    就绪状态类
+    记录每个预热任务的状态和耗时，所有任务成功且未进入关闭流程时为就绪
+    """
+
+    def __init__(self):
+        """
+        初始化就绪状态
+        """
+        self._started = time.monotonic()  # 进程启动时间（创建实例的时间）
+        self._tasks: Dict[str, Dict[str, Any]] = {}  # 预热任务名称 -> 状态
+        self._ready_after: Optional[float] = None  # 从启动到就绪的耗时（秒）
+        self._draining = False  # 是否已进入关闭流程
+
+    async def run(self, name: str, func: Callable[[], Any]):
+        """
+        在线程池中执行一个预热任务（任务失败时保持未就绪）
+
+        参数:
+        - name: 任务名称
+        - func: 同步的预热函数，返回值记录在任务状态中
+        """
+        task = self._tasks[name] = {"status": "running", "seconds": None, "result": None, "error": None}
+        started = time.monotonic()
+        try:
+            task["result"] = await asyncio.get_running_loop().run_in_executor(None, func)
+            task["status"] = "done"
+        except Exception as e:
+            task["status"] = "failed"
+            task["error"] = str(e)
+            logger.error(f"预热失败: {name}, {str(e)}")
+        task["seconds"] = round(time.monotonic() - started, 3)
+        if self.ready and self._ready_after is None:
+            self._ready_after = round(time.monotonic() - self._started, 3)
+            logger.info(f"服务已就绪，启动耗时 {self._ready_after} 秒")
+
+    def start(self, name: str, func: Callable[[], Any]) -> asyncio.Task:
+        """
+        在后台开始一个预热任务（必须在事件循环中调用）
+
+        参数:
+        - name: 任务名称
+        - func: 同步的预热函数
+
+        返回:
+        - 后台任务
+        """
+        self._tasks[name] = {"status": "pending", "seconds": None, "result": None, "error": None}
+        return asyncio.ensure_future(self.run(name, func))
+
+    def drain(self):
+        """
+        进入关闭流程（之后就绪检查返回未就绪）
+        """
+        self._draining = True
+
+    @property
+    def ready(self) -> bool:
+        """是否就绪"""
+        return not self._draining and all(task["status"] == "done" for task in self._tasks.values())
+
+    def status(self) -> Dict[str, Any]:
+        """
+        获取就绪状态
+
+        返回:
+        - 状态（ready、starting、failed、draining）、启动到就绪的耗时和各预热任务的状态
+        """
+        if self._draining:
+            status = "draining"
+        elif self.ready:
+            status = "ready"
+        elif any(task["status"] == "failed" for task in self._tasks.values()):
+            status = "failed"
+        else:
+            status = "starting"
+        return {
+            "status": status,
+            "uptime": round(time.monotonic() - self._started, 3),
+            "ready_after": self._ready_after,
+            "warmup": self._tasks,
+        }
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+平台保护模块
+为每个平台提供令牌桶限速、熔断器和AIMD自适应并发控制：
+平台限流或出错时快速失败，不再占用可以服务其他平台的工作线程
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 熔断器状态
+CIRCUIT_CLOSED = "closed"  # 正常
+CIRCUIT_OPEN = "open"  # 熔断中，直接拒绝
+CIRCUIT_HALF_OPEN = "half_open"  # 试探中，只放行少量请求
+
+
+class UpstreamError(Exception):
+    """
+    上游平台错误（限流、服务端错误、网络错误、提取器失效），计入熔断统计
+    视频不存在、链接无效等与平台状态无关的错误不使用该异常
+    """
+
+
+class CircuitOpenError(Exception):
+    """
+    平台熔断异常（快速失败）
+    """
+
+    def __init__(self, platform: str, retry_after: float):
+        """
+        初始化熔断异常
+
+        参数:
+        - platform: 平台名称
+        - retry_after: 建议的重试等待时间（秒）
+        """
+        super().__init__(f"{platform}暂时不可用，请{int(retry_after) + 1}秒后重试")
+        self.platform = platform
+        self.retry_after = retry_after
+
+    def __reduce__(self):
+        return (CircuitOpenError, (self.platform, self.retry_after))
+
+
+class TokenBucket:
+    """
+    令牌桶限速类
+    每秒补充rate个令牌，最多积累burst个；没有令牌时等待
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+        初始化令牌桶
+
+        参数:
+        - rate: 每秒补充的令牌数（0表示不限速）
+        - burst: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._waiting = 0  # 正在等待令牌的请求数
+
+    def _refill(self):
+        """按经过的时间补充令牌"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """
+        获取一个令牌，没有令牌时等待
+        """
+        if self.rate <= 0:
+            return
+        self._waiting += 1
+        try:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+        finally:
+            self._waiting -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """获取令牌桶状态"""
+        if self.rate > 0:
+            self._refill()
+        return {"rate": self.rate, "burst": self.burst, "tokens": round(self._tokens, 2), "waiting": self._waiting}
+
+
+class CircuitBreaker:
+    """
+    熔断器类
+    连续失败达到阈值后熔断，经过冷却时间后放行一个试探请求，成功则恢复，失败则继续熔断
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        初始化熔断器
+
+        参数:
+        - failure_threshold: 触发熔断的连续失败次数
+        - reset_timeout: 熔断后到放行试探请求的冷却时间（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self._failures = 0  # 连续失败次数
+        self._opened_at = 0.0  # 熔断开始时间
+        self._probing = False  # 是否有试探请求正在执行
+        self._trips = 0  # 熔断次数
+
+    def retry_after(self) -> float:
+        """距离放行试探请求的剩余时间（秒）"""
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        判断是否放行请求
+
+        返回:
+        - 是否放行
+        """
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        if self.state == CIRCUIT_OPEN and self.retry_after() <= 0:
+            self.state = CIRCUIT_HALF_OPEN
+        if self.state == CIRCUIT_HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        """记录成功，试探成功时恢复正常"""
+        if self.state != CIRCUIT_CLOSED:
+            logger.info("熔断器恢复正常")
+        self.state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        """记录失败，达到阈值或试探失败时熔断"""
+        self._failures += 1
+        self._probing = False
+        if self.state == CIRCUIT_HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != CIRCUIT_OPEN:
+                self._trips += 1
+            self.state = CIRCUIT_OPEN
+            self._opened_at = time.monotonic()
+
+    def record_ignored(self):
+        """请求以与平台无关的原因结束，不改变状态"""
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        """获取熔断器状态"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "trips": self._trips,
+            "retry_after": round(self.retry_after(), 1) if self.state == CIRCUIT_OPEN else 0,
+        }
+
+
+class AdaptiveLimiter:
+    """
+    AIMD自适应并发控制类
+    请求成功且延迟正常时并发上限缓慢增加（每个窗口+1），出错或延迟超过目标值时成倍减少
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, target_latency: float = 15.0,
+                 decrease_factor: float = 0.5, cooldown: float = 5.0):
+        """
+        初始化自适应并发控制
+
+        参数:
+        - max_limit: 并发上限的最大值（平台配置的并发数）
+        - min_limit: 并发上限的最小值
+        - target_latency: 目标延迟（秒），超过视为平台过载
+        - decrease_factor: 减少时的乘数
+        - cooldown: 两次减少之间的最短间隔（秒），避免同一批慢请求连续减半
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.limit = float(self.max_limit)  # 当前并发上限
+        self.inflight = 0  # 正在执行的请求数
+        self._condition: Optional[asyncio.Condition] = None
+        self._last_decrease = 0.0
+
+    def _get_condition(self) -> asyncio.Condition:
+        """获取条件变量（首次使用时在当前事件循环中创建）"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        """
+        获取并发名额，达到当前上限时等待
+        """
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.inflight < int(self.limit))
+            self.inflight += 1
+
+    async def release(self, latency: Optional[float], overloaded: bool):
+        """
+        释放并发名额并调整上限
+
+        参数:
+        - latency: 请求延迟（秒），未知时为None
+        - overloaded: 是否观察到平台过载（限流或服务端错误）
+        """
+        if overloaded or (latency is not None and latency > self.target_latency):
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self._last_decrease = now
+                old = self.limit
+                self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+                logger.info(f"降低并发上限: {old:.1f} -> {self.limit:.1f}")
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+        condition = self._get_condition()
+        async with condition:
+            self.inflight -= 1
+            condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取并发控制状态"""
+        return {
+            "limit": round(self.limit, 2),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "inflight": self.inflight,
+        }
+
+
+class PlatformGuard:
+    """
+    单个平台的保护类
+    依次检查熔断器、获取令牌、获取并发名额，结束后根据结果更新熔断器和并发上限
+    """
+
+    def __init__(self, name: str, bucket: TokenBucket, breaker: CircuitBreaker, limiter: AdaptiveLimiter):
+        """
+        初始化平台保护
+
+        参数:
+        - name: 平台名称
+        - bucket: 令牌桶
+        - breaker: 熔断器
+        - limiter: 自适应并发控制
+        """
+        self.name = name
+        self.bucket = bucket
+        self.breaker = breaker
+        self.limiter = limiter
+        self._rejected = 0  # 熔断拒绝的请求数
+
+    def check(self):
+        """
+        检查熔断状态（不占用名额）
+
+        异常:
+        - CircuitOpenError: 平台熔断中
+        """
+        if self.breaker.state == CIRCUIT_OPEN and self.breaker.retry_after() > 0:
+            self._rejected += 1
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        获取平台执行名额
+
+        返回:
+        - 上下文字典，调用方可写入 latency（秒）作为延迟信号，未写入时使用总耗时
+
+        异常:
+        - CircuitOpenError: 平台熔断中
+        """
+        self.check()
+        await self.bucket.acquire()
+        await self.limiter.acquire()
+
+        # 等待期间可能已经熔断
+        if not self.breaker.allow():
+            await self.limiter.release(None, False)
+            self._rejected += 1
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+
+        context: Dict[str, Any] = {}
+        started = time.monotonic()
+        try:
+            yield context
+        except UpstreamError:
+            self.breaker.record_failure()
+            await self.limiter.release(None, True)
+            raise
+        except BaseException:
+            self.breaker.record_ignored()
+            await self.limiter.release(None, False)
+            raise
+        else:
+            self.breaker.record_success()
+            await self.limiter.release(context.get('latency', time.monotonic() - started), False)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取平台保护状态"""
+        return {
+            "rate_limit": self.bucket.stats(),
+            "circuit": self.breaker.stats(),
+            "concurrency": self.limiter.stats(),
+            "rejected": self._rejected,
+        }
+
+
+class PlatformGuards:
+    """
+    平台保护集合类
+    按平台配置（限速、并发数）在首次使用时创建
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, target_latency: float = 15.0):
+        """
+        初始化平台保护集合
+
+        参数:
+        - failure_threshold: 触发熔断的连续失败次数
+        - reset_timeout: 熔断冷却时间（秒）
+        - target_latency: 提取视频信息的目标延迟（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.target_latency = target_latency
+        self._guards: Dict[str, PlatformGuard] = {}
+
+    def __getstate__(self):
+        """
+        序列化时不保留运行状态（进程池模式下子进程不使用平台保护）
+        """
+        state = self.__dict__.copy()
+        state['_guards'] = {}
+        return state
+
+    def get(self, platform) -> PlatformGuard:
+        """
+        获取平台保护
+
+        参数:
+        - platform: 平台配置
+
+        返回:
+        - 平台保护
+        """
+        guard = self._guards.get(platform.key)
+        if guard is None:
+            guard = self._guards[platform.key] = PlatformGuard(
+                platform.name,
+                TokenBucket(platform.rate_limit, platform.burst),
+                CircuitBreaker(self.failure_threshold, self.reset_timeout),
+                AdaptiveLimiter(platform.max_concurrency, target_latency=self.target_latency),
+            )
+        return guard
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取所有已使用平台的保护状态
+
+        返回:
+        - 平台名称 -> 状态
+        """
+        return {guard.name: guard.stats() for guard in self._guards.values()}
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """
+    判断yt-dlp异常是否由平台状态引起（计入熔断）
+
+    参数:
+    - error: yt-dlp抛出的异常
+
+    返回:
+    - 是否为平台侧错误
+    """
+    from yt_dlp.utils import DownloadError, ExtractorError
+
+    # DownloadError包装了原始异常
+    if isinstance(error, DownloadError) and error.exc_info and error.exc_info[1] is not None:
+        error = error.exc_info[1]
+
+    status = getattr(getattr(error, 'cause', None), 'status', None) or getattr(error, 'status', None)
+    if status in (403, 429) or (isinstance(status, int) and status >= 500):
+        # 限流、拒绝访问和服务端错误
+        return True
+    if status in (404, 410):
+        # 视频不存在或已删除
+        return False
+    if isinstance(error, ExtractorError):
+        # expected=True 表示视频不存在、需要登录等与平台状态无关的错误
+        return not error.expected
+    return isinstance(error, (OSError, TimeoutError))
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+请求合并模块
+相同键的并发调用只执行一次，所有调用方共享同一个结果
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    单飞（single-flight）请求合并类
+    同一时刻对同一个键只运行一个任务，后到的调用方等待该任务完成
+    """
+
+    def __init__(self):
+        """
+        初始化请求合并器
+        """
+        self._inflight: Dict[Hashable, asyncio.Future] = {}  # 正在执行的任务
+        self._executed = 0  # 实际执行的任务数
+        self._coalesced = 0  # 被合并（共享结果）的调用数
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行或加入同键的任务
+
+        参数:
+        - key: 任务键
+        - func: 返回协程的可调用对象，仅在没有同键任务时调用
+
+        返回:
+        - 任务结果（所有调用方共享同一个对象）
+        """
+        task, _ = self.start(key, func)
+
+        # 使用shield防止单个调用方取消时中断共享任务
+        return await asyncio.shield(task)
+
+    def start(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Tuple[asyncio.Future, bool]:
+        """
+        开始或加入同键的任务，不等待结果（调用方自行决定何时等待）
+
+        参数:
+        - key: 任务键
+        - func: 返回协程或Future的可调用对象，仅在没有同键任务时调用
+
+        返回:
+        - (任务, 是否由本次调用创建)
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self._coalesced += 1
+            logger.info(f"合并重复请求: {key}")
+            return task, False
+        self._executed += 1
+        task = asyncio.ensure_future(func())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._finish(key, t))
+        return task, True
+
+    def running(self, key: Hashable) -> bool:
+        """
+        是否有同键的任务正在执行
+
+        参数:
+        - key: 任务键
+
+        返回:
+        - 是否正在执行
+        """
+        return key in self._inflight
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        """
+        任务结束时移除记录
+
+        参数:
+        - key: 任务键
+        - task: 已结束的任务
+        """
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 标记异常已被读取，避免所有调用方都已取消时出现未处理异常警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取请求合并统计信息
+
+        返回:
+        - 正在执行、已执行和被合并的调用数
+        """
+        return {
+            "inflight": len(self._inflight),
+            "executed": self._executed,
+            "coalesced": self._coalesced,
+        }
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+下载文件存储模块
+按文件名（内容哈希）前缀分两级子目录存放（ab/cd/<hash>.<ext>），避免单个目录中文件过多；
+写入先落到临时文件，按fsync策略刷盘后再原子重命名，读取方不会看到写了一半的文件
+"""
+
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# fsync策略
+FSYNC_NONE = "none"  # 不主动刷盘（由操作系统决定）
+FSYNC_FILE = "file"  # 提交前刷写文件内容
+FSYNC_FULL = "full"  # 刷写文件内容，并在重命名后刷写所在目录（掉电后目录项也不丢失）
+
+FSYNC_POLICIES = (FSYNC_NONE, FSYNC_FILE, FSYNC_FULL)
+
+
+class ShardedStorage:
+    """
+    分片存储类
+    文件名到路径的映射只依赖文件名本身，接口仍只使用文件名（不含目录）
+    """
+
+    def __init__(self, root: str = "downloads", depth: int = 2, width: int = 2, fsync: str = FSYNC_FILE):
+        """
+        初始化分片存储
+
+        参数:
+        - root: 存储根目录
+        - depth: 子目录层数
+        - width: 每层子目录名取文件名的字符数
+        - fsync: fsync策略：none、file、full
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"不支持的fsync策略: {fsync}")
+        self.root = root  # 存储根目录
+        self.depth = depth  # 子目录层数
+        self.width = width  # 每层字符数
+        self.fsync = fsync  # fsync策略
+        os.makedirs(self.root, exist_ok=True)
+
+    def relative(self, filename: str) -> str:
+        """
+        获取文件相对存储根目录的路径
+
+        参数:
+        - filename: 文件名（如 7c4b3521....mp4）
+
+        返回:
+        - 相对路径（如 7c/4b/7c4b3521....mp4）
+        """
+        name = os.path.basename(filename)
+        shards = [name[i * self.width:(i + 1) * self.width] for i in range(self.depth)]
+        return os.path.join(*shards, name)
+
+    def path(self, filename: str, create: bool = False) -> str:
+        """
+        获取文件的完整路径
+
+        参数:
+        - filename: 文件名
+        - create: 是否创建所在的子目录
+
+        返回:
+        - 文件路径
+        """
+        path = os.path.join(self.root, self.relative(filename))
+        if create:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def sync(self, path: str):
+        """
+        按fsync策略刷写已完成的文件（登记到缓存索引之前调用）
+
+        参数:
+        - path: 文件路径
+        """
+        if self.fsync == FSYNC_NONE:
+            return
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        if self.fsync == FSYNC_FULL:
+            self._sync_dir(os.path.dirname(path))
+
+    @staticmethod
+    def _sync_dir(directory: str):
+        """刷写目录项（不支持打开目录的平台上跳过）"""
+        try:
+            fd = os.open(directory or ".", os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def commit(self, temp_path: str, final_path: str):
+        """
+        提交临时文件：按策略刷盘后原子重命名为最终路径
+
+        参数:
+        - temp_path: 已写完并关闭的临时文件路径（必须与最终路径在同一文件系统）
+        - final_path: 最终路径
+        """
+        if self.fsync != FSYNC_NONE:
+            fd = os.open(temp_path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        os.replace(temp_path, final_path)
+        if self.fsync == FSYNC_FULL:
+            self._sync_dir(os.path.dirname(final_path))
+
+    @contextmanager
+    def atomic_write(self, final_path: str, mode: str = "w", **kwargs) -> Iterator[IO]:
+        """
+        原子写入文件：写入同目录下的临时文件，成功后提交，失败时删除临时文件
+
+        参数:
+        - final_path: 最终路径
+        - mode: 打开模式（w 或 wb）
+        - kwargs: 传给open的其他参数（如encoding）
+
+        返回:
+        - 临时文件对象
+        """
+        # 临时文件名对每次写入唯一（同一进程的多个线程可能同时写同一个文件，如流式下载和普通下载补写 .info.json）
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(final_path) or ".",
+                                         prefix=f"{os.path.basename(final_path)}.tmp-")
+        try:
+            os.chmod(temp_path, 0o644)  # mkstemp创建的文件只有属主可读写，与直接open创建的文件保持一致（os.fchmod在Windows上不存在）
+            with os.fdopen(fd, mode, **kwargs) as f:
+                yield f
+            self.commit(temp_path, final_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def stats(self) -> dict:
+        """
+        获取存储配置
+
+        返回:
+        - 根目录、分片方式和fsync策略
+        """
+        return {"root": self.root, "depth": self.depth, "width": self.width, "fsync": self.fsync}
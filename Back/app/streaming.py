@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+流式透传下载模块
+直接从上游媒体地址读取数据并转发给客户端，同时写入下载缓存，客户端无需等待整个文件下载完成
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app import metrics
+from app.platforms import Platform
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 每次读取和转发的块大小（字节），决定单个流占用的内存上限
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# 可以直接透传的协议（分片协议需要yt-dlp下载后合并）
+STREAMABLE_PROTOCOLS = ("http", "https")
+
+
+class StreamingError(Exception):
+    """
+    流式下载异常
+    """
+
+
+class StreamIncomplete(StreamingError):
+    """
+    流式下载结束但没有写入缓存（客户端断开或无法确认文件完整），合并到该流的下载需要自行下载
+    """
+
+
+def is_streamable(info: Dict[str, Any]) -> bool:
+    """
+    判断视频是否可以直接透传（单个HTTP文件，无需合并音视频）
+
+    参数:
+    - info: yt-dlp提取的视频信息
+
+    返回:
+    - 是否可以透传
+    """
+    return bool(
+        info.get('url')
+        and not info.get('requested_formats')
+        and (info.get('protocol') or 'https') in STREAMABLE_PROTOCOLS
+    )
+
+
+class StreamingDownload:
+    """
+    流式透传下载类
+    按固定大小的块读取上游数据，逐块发送给客户端并写入临时文件，完整结束后提交到下载缓存
+    """
+
+    def __init__(self, downloader, url: str, info: Dict[str, Any], quality: str = "best",
+                 platform: Optional[Platform] = None):
+        """
+        初始化流式下载
+
+        参数:
+        - downloader: 视频下载器（提供共享HTTP客户端和缓存）
+        - url: 视频链接
+        - info: yt-dlp提取的视频信息
+        - quality: 视频质量
+        - platform: 平台配置
+        """
+        self.downloader = downloader
+        self.url = url
+        self.info = info
+        self.platform = platform
+        self.options, self.url_key, self.cache_key = downloader.cache_keys(url, info, False, quality)
+        self.file_path = downloader.cache_file_path(self.cache_key, info.get('ext') or 'mp4')
+        self.temp_path = f"{self.file_path}.stream-{os.getpid()}-{id(self):x}.part"
+        self.completion: Optional[asyncio.Future] = None  # 写入缓存后的下载结果（供合并到该流的下载等待）
+        self._response: Optional[aiohttp.ClientResponse] = None
+
+    async def open(self):
+        """
+        向上游发起请求（在返回响应头之前调用，上游失败时可以返回错误状态码）
+        """
+        session = self.downloader.http_client.session()
+        headers = dict(self.info.get('http_headers') or {})
+        response = await session.get(self.info['url'], headers=headers)
+        if response.status >= 400:
+            response.release()
+            raise StreamingError(f"上游返回错误状态: {response.status}")
+        self._response = response
+        self.completion = asyncio.get_running_loop().create_future()
+
+    @property
+    def content_type(self) -> str:
+        """媒体类型"""
+        return self._response.headers.get('Content-Type') or 'video/mp4'
+
+    @property
+    def content_length(self) -> Optional[int]:
+        """内容长度（上游未提供时为None）"""
+        length = self._response.headers.get('Content-Length')
+        return int(length) if length and length.isdigit() else None
+
+    @property
+    def expected_size(self) -> Optional[int]:
+        """
+        完整文件的大小：优先使用上游的Content-Length，其次是提取信息中的文件大小（不使用估算值）
+        都没有时为None，此时无法判断连接是否中途断开，接收到的数据不写入缓存
+        """
+        return self.content_length or self.info.get('filesize')
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """
+        逐块读取上游数据，转发给客户端的同时写入缓存（只有确认接收完整时才写入）
+
+        返回:
+        - 数据块异步迭代器
+        """
+        digest = hashlib.sha256()
+        received = 0
+        completed = False
+        expected = self.expected_size
+        file = await run_in_threadpool(open, self.temp_path, 'wb')
+        try:
+            async for chunk in self._response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                received += len(chunk)
+                digest.update(chunk)
+                await run_in_threadpool(file.write, chunk)
+                yield chunk
+                metrics.record_bytes_served(len(chunk), "stream")
+            completed = expected is not None and received == expected
+            if expected is None:
+                logger.info(f"上游未提供文件大小，流式下载不写入缓存: {self.url} ({received} 字节)")
+        finally:
+            # 客户端断开时任务已被取消，清理步骤必须同步完成
+            self._response.release()
+            file.close()
+            if not completed:
+                if expected is not None:
+                    logger.warning(f"流式下载未完成: {self.url} ({received}/{expected} 字节)")
+                self._discard()
+
+        # 完整接收后提交到缓存
+        if completed:
+            try:
+                result = await run_in_threadpool(self._commit, digest.hexdigest())
+            except Exception as e:
+                self._settle(None, e)
+                raise
+            self._settle(result)
+
+    def _commit(self, content_hash: str) -> Dict[str, Any]:
+        """
+        将完整的临时文件移动到缓存路径并登记
+
+        参数:
+        - content_hash: 文件内容SHA-256
+
+        返回:
+        - 下载结果（同 commit_file）
+        """
+        self.downloader.storage.commit(self.temp_path, self.file_path)
+        result = self.downloader.commit_file(self.url, self.info, self.options, self.url_key, self.cache_key,
+                                             self.file_path, content_hash, self.platform)
+        logger.info(f"流式下载已写入缓存: {self.cache_key}")
+        return result
+
+    def _settle(self, result: Optional[Dict[str, Any]], error: Optional[BaseException] = None):
+        """
+        结束 completion（只生效一次）：写入缓存时给出下载结果，否则给出异常
+
+        参数:
+        - result: 下载结果，没有写入缓存时为None
+        - error: 写入缓存失败的异常
+        """
+        if self.completion is None or self.completion.done():
+            return
+        if result is not None:
+            self.completion.set_result(result)
+        else:
+            self.completion.set_exception(error or StreamIncomplete(f"流式下载没有写入缓存: {self.url}"))
+
+    def close(self):
+        """
+        结束流式下载（响应发送完成、客户端断开或发送失败后调用，可重复调用）：
+        释放上游连接，没有写入缓存时通知合并到该流的下载自行下载
+        """
+        if self._response is not None:
+            self._response.release()
+        self._settle(None)
+
+    def abandon(self):
+        """
+        放弃透传（尚未开始读取时）：释放上游连接，completion 不再使用
+        """
+        if self._response is not None:
+            self._response.release()
+        if self.completion is not None:
+            self.completion.cancel()
+
+    def _discard(self):
+        """
+        删除不完整的临时文件
+        """
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+class StreamResponse(StreamingResponse):
+    """
+    流式透传响应
+    无论正常结束、客户端断开还是发送失败（包括数据迭代器从未开始的情况），结束后都调用 on_close
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], on_close: Callable[[], Awaitable[None]], **kwargs):
+        """
+        初始化流式透传响应
+
+        参数:
+        - content: 数据块异步迭代器
+        - on_close: 响应结束后调用的协程函数（归还准入名额、结束下载合并）
+        - kwargs: 传给StreamingResponse的其他参数
+        """
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+LRU+TTL缓存模块
+容量有限的内存缓存，超过容量时淘汰最久未使用的条目，条目超过有效期后自动失效
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    LRU+TTL内存缓存类
+    所有操作都是O(1)，可在多个线程中同时使用
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 3600):
+        """
+        初始化缓存
+
+        参数:
+        - max_size: 最多保存的条目数
+        - ttl_seconds: 条目有效期（秒）
+        """
+        self.max_size = max_size  # 容量上限
+        self.ttl_seconds = ttl_seconds  # 有效期
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()  # 键 -> (过期时间, 值)，按访问顺序排列
+        self._lock = threading.Lock()
+        self._hits = 0  # 命中次数
+        self._misses = 0  # 未命中次数
+        self._evictions = 0  # 因容量淘汰的条目数
+
+    def __getstate__(self):
+        """
+        序列化时只保留配置（进程池模式下子进程使用空缓存）
+        """
+        return {'max_size': self.max_size, 'ttl_seconds': self.ttl_seconds}
+
+    def __setstate__(self, state):
+        """
+        反序列化时重新创建空缓存
+        """
+        self.__init__(state['max_size'], state['ttl_seconds'])
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        读取条目
+
+        参数:
+        - key: 缓存键
+
+        返回:
+        - 缓存值，不存在或已过期时返回None
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._misses += 1
+                return None
+
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self._misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """
+        写入条目，超过容量时淘汰最久未使用的条目
+
+        参数:
+        - key: 缓存键
+        - value: 缓存值
+        - ttl_seconds: 该条目的有效期，默认使用缓存的有效期
+        """
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def pop(self, key: Hashable):
+        """
+        删除条目
+
+        参数:
+        - key: 缓存键
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取缓存统计信息
+
+        返回:
+        - 条目数量、命中和淘汰统计
+        """
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+        }
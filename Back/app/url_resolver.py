@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+短链接解析模块
+通过共享的aiohttp会话异步跟随分享短链接的跳转，得到视频页面的真实链接并缓存
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+from urllib.parse import urljoin
+
+import aiohttp
+
+from app.http_client import SharedHttpClient
+from app.platforms import PlatformRegistry
+from app.singleflight import SingleFlight
+from app.ttl_cache import TTLCache
+from app.url_utils import normalize_url
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 表示跳转的状态码
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class ShortLinkResolver:
+    """
+    短链接解析类
+    只请求跳转响应头，不下载页面内容；跳转到已知平台的非短链接域名时立即停止
+    """
+
+    def __init__(self, http_client: SharedHttpClient, platforms: PlatformRegistry,
+                 cache: Optional[TTLCache] = None, max_redirects: int = 5, timeout: float = 10.0):
+        """
+        初始化短链接解析器
+
+        参数:
+        - http_client: 共享的异步HTTP客户端
+        - platforms: 平台注册表（判断链接是否为短链接）
+        - cache: 解析结果缓存，默认保存10000条、有效期1小时
+        - max_redirects: 最多跟随的跳转次数
+        - timeout: 单个短链接的解析超时（秒）
+        """
+        self.http_client = http_client
+        self.platforms = platforms
+        self.cache = cache if cache is not None else TTLCache(max_size=10000, ttl_seconds=3600)
+        self.max_redirects = max_redirects
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.singleflight = SingleFlight()  # 合并同一短链接的并发解析
+        self._resolved = 0  # 实际发起网络解析的次数
+        self._failed = 0  # 解析失败次数
+
+    def __getstate__(self):
+        """
+        序列化时排除请求合并器（进程池模式下子进程不解析短链接）
+        """
+        state = self.__dict__.copy()
+        state['singleflight'] = None
+        return state
+
+    async def resolve(self, url: str) -> str:
+        """
+        解析链接，非短链接原样返回
+
+        参数:
+        - url: 视频链接
+
+        返回:
+        - 跳转后的视频页面链接，解析失败时返回原链接（交给yt-dlp处理）
+        """
+        match = self.platforms.match(url)
+        if match is None or not match.is_short_link:
+            return url
+
+        key = normalize_url(url)
+        resolved = self.cache.get(key)
+        if resolved is not None:
+            return resolved
+
+        return await self.singleflight.do(key, lambda: self._resolve_and_cache(key, url))
+
+    async def _resolve_and_cache(self, key: str, url: str) -> str:
+        """
+        跟随跳转并写入缓存
+
+        参数:
+        - key: 规范化的短链接
+        - url: 原始短链接
+
+        返回:
+        - 解析后的链接
+        """
+        try:
+            resolved = await self._follow(url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # 失败结果不缓存，下次请求重新解析
+            self._failed += 1
+            logger.warning(f"短链接解析失败: {url} ({str(e) or type(e).__name__})")
+            return url
+
+        self._resolved += 1
+        self.cache.put(key, resolved)
+        logger.info(f"短链接解析完成: {url} -> {resolved}")
+        return resolved
+
+    async def _follow(self, url: str) -> str:
+        """
+        逐跳请求并读取Location响应头
+
+        参数:
+        - url: 短链接
+
+        返回:
+        - 最终链接
+        """
+        session = self.http_client.session()
+        current = url
+        for _ in range(self.max_redirects):
+            async with session.get(current, allow_redirects=False, timeout=self.timeout) as response:
+                location = response.headers.get('Location')
+                if response.status not in REDIRECT_STATUSES or not location:
+                    return current
+            current = urljoin(current, location)
+
+            # 已经跳转到平台的视频页面，无需继续请求
+            match = self.platforms.match(current)
+            if match is not None and not match.is_short_link:
+                return current
+        return current
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取短链接解析统计信息
+
+        返回:
+        - 解析次数、失败次数和缓存统计
+        """
+        return {
+            "resolved": self._resolved,
+            "failed": self._failed,
+            "inflight": self.singleflight.stats()["inflight"],
+            "cache": self.cache.stats(),
+        }
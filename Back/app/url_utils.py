@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+URL工具模块
+提供视频链接的规范化处理，用于去重和缓存键计算
+"""
+
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+# 分享链接中常见的跟踪参数，不影响视频内容，规范化时移除
+TRACKING_PARAMS = {
+    "from", "share_source", "share_medium", "share_plat", "share_tag", "share_from",
+    "share_session_id", "share_token", "share_app_id", "share_iid", "share_link_id",
+    "spm_id_from", "vd_source", "unique_k", "timestamp", "utm_source", "utm_medium",
+    "utm_campaign", "utm_term", "utm_content", "is_from_webapp", "sender_device",
+    "sec_uid", "u_code", "did", "iid", "app", "previous_page", "si", "feature",
+    "igshid", "xsec_source",
+}
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化视频链接
+    统一协议和域名大小写、去除www前缀、片段和跟踪参数，并对查询参数排序
+
+    参数:
+    - url: 原始视频链接
+
+    返回:
+    - 规范化后的链接
+    """
+    parsed = urlparse(url.strip())
+
+    # 统一域名格式
+    netloc = parsed.netloc.lower()
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+
+    # 移除跟踪参数并排序，保证参数顺序不同的链接得到相同结果
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    )
+
+    # 去除路径末尾的斜杠
+    path = parsed.path.rstrip("/") or "/"
+
+    return urlunparse(("https" if parsed.scheme in ("http", "https") else parsed.scheme,
+                       netloc, path, "", urlencode(query), ""))
@@ -4,16 +4,42 @@
 使用yt-dlp库实现视频下载和去水印功能
 """
 
-import yt_dlp
 import os
 import re
 import asyncio
-import aiohttp
 import logging
-from typing import Dict, Optional, Any
+from typing import TYPE_CHECKING, Dict, Optional, Any, Tuple
 from urllib.parse import urlparse
-import time
 import hashlib
+import json
+import threading
+
+from app import metrics, profiling
+from app.download_cache import DownloadCache
+from app.extractors import ExtractorSelector, load_ytdlp
+from app.format_policy import (choose_postprocessor, format_selector, format_sort,
+                               has_ffmpeg, normalize_quality)
+from app.http_client import SharedHttpClient
+from app.janitor import Janitor
+from app.jobs import current_job_id
+from app.journal import DownloadJournal
+from app.platforms import Platform, PlatformMatch, PlatformRegistry
+from app.postprocess import PostProcessStage
+from app.progress import (STAGE_DOWNLOAD, STAGE_EXTRACT, STAGE_POSTPROCESS, ProgressChannel, ProgressReporter,
+                          hook_fields)
+from app.projection import info_json_path, project_info
+from app.range_download import ParallelDownloader
+from app.resilience import CircuitOpenError, PlatformGuards, UpstreamError, is_upstream_failure
+from app.singleflight import SingleFlight
+from app.storage import ShardedStorage
+from app.streaming import StreamIncomplete
+from app.ttl_cache import TTLCache
+from app.url_resolver import ShortLinkResolver
+from app.url_utils import normalize_url
+from app.worker_pool import WorkerPool
+
+if TYPE_CHECKING:
+    import yt_dlp
 
 # 配置日志记录
 logger = logging.getLogger(__name__)
@@ -24,36 +50,95 @@ class VideoDownloader:
     负责处理各种平台的视频下载和去水印功能
     """
     
-    def __init__(self):
+    def __init__(self, worker_pool: Optional[WorkerPool] = None,
+                 http_client: Optional[SharedHttpClient] = None,
+                 link_cache: Optional[TTLCache] = None,
+                 postprocessor: Optional[PostProcessStage] = None,
+                 guards: Optional[PlatformGuards] = None,
+                 storage: Optional[ShardedStorage] = None,
+                 info_cache: Optional[TTLCache] = None,
+                 parallel: Optional[ParallelDownloader] = None,
+                 http_chunk_size: int = 10 * 1024 * 1024,
+                 fragment_retries: int = 10,
+                 journal: Optional[DownloadJournal] = None):
         """
         初始化视频下载器
         设置下载目录和配置参数
+        
+        参数:
+        - worker_pool: 执行yt-dlp阻塞调用的工作池，默认创建4线程的线程池
+        - http_client: 共享的异步HTTP客户端（流式下载和短链接解析使用）
+        - link_cache: 短链接解析结果缓存
+        - postprocessor: FFmpeg后处理阶段，默认按CPU核数创建进程池
+        - guards: 平台保护（限速、熔断、自适应并发），默认使用默认参数
+        - storage: 下载文件的分片存储，默认存放在 downloads 目录
+        - info_cache: 视频信息缓存（预览接口写入，之后的下载和流式下载复用，不再重复提取）
+        - parallel: 并行下载（大文件分段多连接下载、分片视频并发下载，共享全局连接上限）
+        - http_chunk_size: 单连接下载时每次请求的字节数（部分平台限制单次响应的大小和速度）
+        - fragment_retries: 单个分片下载失败的重试次数（只重试该分片）
+        - journal: 下载日志（记录正在执行的下载，重启后恢复），默认存放在下载目录
         """
-        # 设置下载目录
-        self.download_dir = "downloads"  # 下载文件存储目录
+        # 下载文件按文件名前缀分片存放（downloads/ab/cd/<hash>.<ext>）
+        self.storage = storage or ShardedStorage("downloads")
+        self.download_dir = self.storage.root  # 下载文件存储根目录
+        
+        # 执行阻塞下载任务的工作池
+        self.worker_pool = worker_pool or WorkerPool("download", max_workers=4)
+        
+        # FFmpeg后处理阶段（独立的进程池和队列）
+        self.postprocessor = postprocessor or PostProcessStage()
+        
+        # 每个工作线程复用的yt-dlp实例（按格式选项区分）
+        self._local = threading.local()
+        
+        # 合并同一链接的并发下载请求
+        self.singleflight = SingleFlight()
+        
+        # 视频信息缓存（按规范化链接，LRU+TTL；媒体地址会过期，有效期不宜过长）及其并发请求合并
+        self.info_cache = info_cache if info_cache is not None else TTLCache(max_size=1000, ttl_seconds=300)
+        self.info_flight = SingleFlight()
         
-        # 确保下载目录存在
-        if not os.path.exists(self.download_dir):
-            os.makedirs(self.download_dir)  # 创建下载目录
+        # 按平台限速、熔断和自适应并发（只作用于实际访问平台的提取和下载）
+        self.guards = guards or PlatformGuards()
+        
+        # 并行下载（分段多连接和并发分片，所有下载共享连接上限）
+        self.parallel = parallel or ParallelDownloader()
+        
+        # 正在执行的下载的进度上报器（与请求合并使用相同的键）
+        self._reporters: Dict[Any, ProgressReporter] = {}
+        self._progress_updates = 0  # 已结束下载收到的进度回调次数
+        self._progress_published = 0  # 已结束下载实际发布的进度次数
+        
+        # 共享的异步HTTP客户端
+        self.http_client = http_client or SharedHttpClient()
+        
+        # 下载结果缓存（SQLite索引，多个工作进程共享）
+        self.cache = DownloadCache(os.path.join(self.download_dir, "cache.db"))
+        
+        # 下载日志（SQLite，记录正在执行的下载及其部分文件，重启后由恢复任务继续下载）
+        self.journal = journal or DownloadJournal(os.path.join(self.download_dir, "journal.db"))
             
-        # 支持的平台配置
-        self.supported_platforms = {
-            "douyin.com": "抖音",
-            "kuaishou.com": "快手", 
-            "weibo.com": "微博",
-            "bilibili.com": "B站",
-            "youtube.com": "YouTube",
-            "instagram.com": "Instagram",
-            "tiktok.com": "TikTok",
-            "xiaohongshu.com": "小红书",
-            "ixigua.com": "西瓜视频"
-        }
+        # 支持的平台配置（后缀索引注册表），supported_platforms保留主域名到名称的映射
+        self.platforms = PlatformRegistry()
+        self.supported_platforms = self.platforms.domain_map()
+        
+        # 提取器预选（按平台直接选择yt-dlp提取器，不遍历全部提取器）
+        self.extractors = ExtractorSelector(self.platforms)
+        
+        # 短链接解析器（跟随分享短链接的跳转并缓存结果）
+        self.resolver = ShortLinkResolver(self.http_client, self.platforms, cache=link_cache)
+        
+        # 是否安装了ffmpeg（合并分离的音视频流和后处理都需要）
+        self.has_ffmpeg = has_ffmpeg()
         
         # yt-dlp配置选项
         self.ydl_opts = {
-            'format': 'best',  # 下载最佳质量
+            'format': format_selector('best', merge=self.has_ffmpeg),  # 默认最佳质量，排除带水印的格式
+            'format_sort': format_sort('best'),  # 分辨率相同时优先MP4，减少后处理
+            'merge_output_format': 'mp4/mkv',  # 合并时优先直接封装为MP4，编码不兼容时使用MKV
             'outtmpl': os.path.join(self.download_dir, '%(title)s.%(ext)s'),  # 输出模板
             'quiet': True,  # 静默模式
+            'noprogress': True,  # 不输出下载进度条
             'no_warnings': True,  # 不显示警告
             'extract_flat': False,  # 不提取平面信息
             'write_thumbnail': True,  # 下载缩略图
@@ -64,249 +149,716 @@ class VideoDownloader:
             'ignoreerrors': False,  # 不忽略错误
             'no_color': True,  # 无颜色输出
             'geo_bypass': True,  # 绕过地理限制
-            'geo_bypass_country': 'CN',  # 设置国家代码
-            'geo_bypass_ip_block': True,  # 绕过IP封锁
+            'geo_bypass_country': 'CN',  # 设置国家代码（按国家随机生成X-Forwarded-For）
+            'http_chunk_size': http_chunk_size or None,  # 单连接下载按块请求（0表示一次请求整个文件）
+            'fragment_retries': fragment_retries,  # 分片失败只重试该分片
+            'continuedl': True,  # 存在 .part 文件时从已下载的位置继续（重启后恢复下载依赖此项）
         }
         
         logger.info("视频下载器初始化完成")
     
-    def _detect_platform(self, url: str) -> Optional[str]:
+    def detect(self, url: str) -> Optional[PlatformMatch]:
         """
-        检测视频链接所属平台
+        识别视频链接所属平台（包括短链接域名）
         
         参数:
         - url: 视频链接
         
         返回:
-        - 平台名称，如果不支持则返回None
+        - 平台识别结果，如果不支持则返回None
         """
         try:
-            # 解析URL获取域名
-            parsed_url = urlparse(url)
-            domain = parsed_url.netloc.lower()  # 转换为小写
-            
-            # 移除www前缀
-            if domain.startswith('www.'):
-                domain = domain[4:]
-                
-            # 检查是否在支持的平台列表中
-            for platform_domain, platform_name in self.supported_platforms.items():
-                if platform_domain in domain:
-                    logger.info(f"检测到平台: {platform_name}")
-                    return platform_name
-                    
-            logger.warning(f"不支持的平台: {domain}")
-            return None
-            
+            with metrics.timed(metrics.STAGE_DETECT) as span:
+                match = self.platforms.match(url)
+                span['platform'] = match.platform.key if match else None
         except Exception as e:
             logger.error(f"平台检测失败: {str(e)}")
             return None
+        
+        if match is None:
+            logger.warning(f"不支持的平台: {urlparse(url).netloc}")
+        return match
     
-    def _generate_filename(self, url: str, title: str = None) -> str:
+    async def resolve(self, url: str) -> Tuple[str, Optional[PlatformMatch]]:
         """
-        生成唯一的文件名
+        识别平台，短链接先解析为视频页面链接
         
         参数:
         - url: 视频链接
-        - title: 视频标题
         
         返回:
-        - 唯一的文件名
+        - (解析后的链接, 平台识别结果)，不支持的平台识别结果为None
+        """
+        match = self.detect(url)
+        if match is not None and match.is_short_link:
+            with metrics.timed(metrics.STAGE_RESOLVE, match.platform.key):
+                resolved = await self.resolver.resolve(url)
+            resolved_match = self.platforms.match(resolved)
+            if resolved_match is not None:
+                return resolved, resolved_match
+        return url, match
+    
+    async def lookup_cached(self, url: str, remove_watermark: bool = False,
+                            quality: str = "best") -> Optional[Dict[str, Any]]:
+        """
+        按链接别名查询下载缓存（不提取视频信息）
+        查询结果可以连同 resolve() 的结果一起传给 download_video()，下载时不再重复识别平台和查询缓存
+        
+        参数:
+        - url: 视频链接（短链接需先解析）
+        - remove_watermark: 是否去除水印
+        - quality: 视频质量
+        
+        返回:
+        - 缓存条目，未命中（或视频质量无效）时返回None
         """
         try:
-            # 使用URL和时间戳生成唯一标识
-            timestamp = str(int(time.time()))  # 当前时间戳
-            url_hash = hashlib.md5(url.encode()).hexdigest()[:8]  # URL的MD5哈希前8位
-            
-            # 清理标题中的非法字符
-            if title:
-                # 移除或替换文件名中的非法字符
-                title = re.sub(r'[<>:"/\\|?*]', '_', title)  # 替换非法字符为下划线
-                title = re.sub(r'\s+', '_', title)  # 替换空格为下划线
-                filename = f"{title}_{url_hash}_{timestamp}"
+            quality = normalize_quality(quality)
+        except ValueError:
+            return None  # 由下载流程报告无效的视频质量
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.cache.get_by_url, self.url_key(url, remove_watermark, quality))
+    
+    def known_duration(self, url: str) -> Optional[float]:
+        """
+        从信息缓存获取视频时长（不访问平台，用于准入优先级）
+        
+        参数:
+        - url: 视频链接（短链接需先解析）
+        
+        返回:
+        - 视频时长（秒），信息缓存中没有该链接或时长未知时返回None
+        """
+        info = self.info_cache.get(normalize_url(url))
+        return info.get('duration') if info else None
+    
+    def _detect_platform(self, url: str) -> Optional[str]:
+        """
+        检测视频链接所属平台
+        
+        参数:
+        - url: 视频链接
+        
+        返回:
+        - 平台名称，如果不支持则返回None
+        """
+        match = self.detect(url)
+        return match.name if match else None
+    
+    def _generate_filename(self, cache_key: str) -> str:
+        """
+        根据缓存键生成文件名
+        同一视频、相同下载选项总是得到相同的文件名，避免重复存储
+        
+        参数:
+        - cache_key: 缓存键（提取器 + 视频ID + 下载选项）
+        
+        返回:
+        - 不含扩展名的文件名
+        """
+        return hashlib.sha256(cache_key.encode('utf-8')).hexdigest()[:32]
+    
+    @staticmethod
+    def _options_key(remove_watermark: bool, quality: str) -> str:
+        """
+        生成下载选项签名（用于缓存键）
+        
+        参数:
+        - remove_watermark: 是否去除水印
+        - quality: 视频质量
+        
+        返回:
+        - 下载选项签名
+        """
+        return f"wm={int(bool(remove_watermark))};q={quality or 'best'}"
+    
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
+        """
+        计算文件内容的SHA-256（用作文件服务的ETag）
+        
+        参数:
+        - file_path: 文件路径
+        
+        返回:
+        - 十六进制哈希值
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def url_key(self, url: str, remove_watermark: bool = False, quality: str = "best") -> str:
+        """
+        生成链接别名键（下载缓存的链接别名和下载日志都以此为键）
+        
+        参数:
+        - url: 视频链接（短链接需先解析）
+        - remove_watermark: 是否去除水印
+        - quality: 视频质量（已规范化）
+        
+        返回:
+        - 规范化链接 + 下载选项签名
+        """
+        return f"{normalize_url(url)}|{self._options_key(remove_watermark, quality)}"
+    
+    @staticmethod
+    def flight_key(url: str, remove_watermark: bool = False, quality: str = "best") -> Tuple[str, bool, str]:
+        """
+        生成下载合并键（普通下载和流式下载共用，同一视频、相同选项同时只有一个下载）
+        
+        参数:
+        - url: 视频链接（短链接需先解析）
+        - remove_watermark: 是否去除水印
+        - quality: 视频质量（已规范化）
+        
+        返回:
+        - 合并键
+        """
+        return (normalize_url(url), bool(remove_watermark), quality or "best")
+    
+    def _result_from_cache(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        根据缓存条目构建下载结果
+        
+        参数:
+        - entry: 缓存条目
+        
+        返回:
+        - 包含下载信息的字典
+        """
+        result = dict(entry['metadata'])
+        result['filename'] = os.path.basename(entry['file_path'])
+        result['file_size'] = entry['file_size']
+        result['duration'] = entry['duration']
+        result['cached'] = True
+        return result
+    
+    def cache_keys(self, url: str, info: Dict[str, Any], remove_watermark: bool = False,
+                   quality: str = "best") -> Tuple[str, str, str]:
+        """
+        计算下载选项签名、链接别名键和缓存键
+        
+        参数:
+        - url: 视频链接
+        - info: yt-dlp提取的视频信息
+        - remove_watermark: 是否去除水印
+        - quality: 视频质量
+        
+        返回:
+        - (下载选项签名, 链接别名键, 缓存键)
+        """
+        options = self._options_key(remove_watermark, quality)
+        url_key = self.url_key(url, remove_watermark, quality)
+        cache_key = DownloadCache.make_key(info.get('extractor_key') or 'generic',
+                                           str(info.get('id') or normalize_url(url)), options)
+        return options, url_key, cache_key
+    
+    def cache_file_path(self, cache_key: str, ext: str) -> str:
+        """
+        获取缓存键对应的文件路径（所在的分片目录会被创建）
+        
+        参数:
+        - cache_key: 缓存键
+        - ext: 文件扩展名
+        
+        返回:
+        - 文件路径
+        """
+        return self.storage.path(f"{self._generate_filename(cache_key)}.{ext}", create=True)
+    
+    def file_path(self, filename: str) -> str:
+        """
+        获取下载结果中文件名对应的文件路径
+        
+        参数:
+        - filename: 文件名（下载结果的filename）
+        
+        返回:
+        - 文件路径
+        """
+        return self.storage.path(filename)
+    
+    def _build_result(self, url: str, info: Dict[str, Any], file_path: str,
+                      file_size: Optional[int], platform: Optional[Platform] = None) -> Dict[str, Any]:
+        """
+        根据视频信息构建下载结果（轻量字段投影）
+        
+        参数:
+        - url: 视频链接
+        - info: yt-dlp提取的视频信息
+        - file_path: 视频文件路径
+        - file_size: 文件大小（字节）
+        - platform: 平台配置（由调用方传入，不再重复检测）
+        
+        返回:
+        - 包含下载信息的字典
+        """
+        # 只保留声明的轻量字段，格式列表、字幕等重量字段留在 .info.json 中按需读取
+        result = project_info(info)
+        result.update({
+            'video_url': url,  # 原始URL
+            'filename': os.path.basename(file_path),
+            'file_size': file_size,
+            'duration': info.get('duration'),
+            'platform': platform.name if platform else None,
+        })
+        return result
+    
+    def commit_file(self, url: str, info: Dict[str, Any], options: str, url_key: str, cache_key: str,
+                    file_path: str, content_hash: Optional[str] = None,
+                    platform: Optional[Platform] = None) -> Dict[str, Any]:
+        """
+        将已完成的视频文件登记到下载缓存
+        
+        参数:
+        - url: 视频链接
+        - info: yt-dlp提取的视频信息
+        - options: 下载选项签名
+        - url_key: 链接别名键
+        - cache_key: 缓存键
+        - file_path: 视频文件路径
+        - content_hash: 文件内容SHA-256，未提供时读取文件计算
+        - platform: 平台配置
+        
+        返回:
+        - 包含下载信息的字典
+        """
+        exists = os.path.exists(file_path)
+        file_size = os.path.getsize(file_path) if exists else info.get('filesize')
+        if content_hash is None and exists:
+            content_hash = self._hash_file(file_path)
+        if exists:
+            # 按fsync策略刷盘后再登记，索引不会指向掉电后内容不完整的文件
+            self.storage.sync(file_path)
+        
+        # 完整信息写入 .info.json 旁路文件（yt-dlp下载时已写入，流式下载时在此补写）
+        sidecar = info_json_path(file_path)
+        if not os.path.exists(sidecar):
+            with self.storage.atomic_write(sidecar, 'w', encoding='utf-8') as f:
+                json.dump(info, f, ensure_ascii=False, default=str)
+        
+        result = self._build_result(url, info, file_path, file_size, platform)
+        self.cache.put(cache_key, info.get('extractor_key') or 'generic', str(info.get('id')),
+                       options, file_path, file_size, info.get('duration'),
+                       result, content_hash)
+        self.cache.add_alias(url_key, cache_key)
+        return result
+    
+    def __getstate__(self):
+        """
+        序列化时排除工作池和后处理阶段（进程池模式下需要将下载器传递给子进程）
+        """
+        state = self.__dict__.copy()
+        state['worker_pool'] = None
+        state['singleflight'] = None
+        state['info_flight'] = None
+        state['postprocessor'] = None
+        state['_reporters'] = {}
+        del state['_local']
+        return state
+    
+    def __setstate__(self, state):
+        """
+        反序列化时重新创建线程本地存储
+        """
+        self.__dict__.update(state)
+        self._local = threading.local()
+    
+    def _get_ydl(self, quality: str = "best", remove_watermark: bool = False) -> "yt_dlp.YoutubeDL":
+        """
+        获取当前线程复用的yt-dlp实例
+        实例只在创建它的线程中顺序使用，不会被并发访问；复用可以省去每次构建实例和初始化提取器的开销，
+        并保留提取器内部的缓存（如播放器脚本）和HTTP连接；
+        yt-dlp在首次创建实例时才导入，实例不预先注册全部提取器，按平台选择提取器
+        
+        参数:
+        - quality: 视频质量
+        - remove_watermark: 是否去除水印
+        
+        返回:
+        - yt-dlp实例
+        """
+        instances = getattr(self._local, 'ydls', None)
+        if instances is None:
+            instances = self._local.ydls = {}
+        
+        key = (quality or "best", bool(remove_watermark))
+        ydl = instances.get(key)
+        if ydl is None:
+            opts = self.ydl_opts.copy()
+            opts['format'] = format_selector(quality, remove_watermark, merge=self.has_ffmpeg)
+            opts['format_sort'] = format_sort(quality)
+            ydl = instances[key] = load_ytdlp().YoutubeDL(opts, auto_init=False)
+            self.extractors.install(ydl)
+            # 进度回调转发给当前线程正在执行的下载
+            ydl.add_progress_hook(self._progress_hook)
+            ydl.add_postprocessor_hook(self._postprocessor_hook)
+            # 大文件分段多连接下载、分片视频并发下载（进度同样转发给当前线程的下载）
+            self.parallel.install(ydl, self._progress_hook)
+        return ydl
+    
+    def _progress_hook(self, status: Dict[str, Any]):
+        """
+        yt-dlp下载进度回调（在工作线程中调用，频率很高，只更新进度不做其他处理）
+        
+        参数:
+        - status: yt-dlp进度信息
+        """
+        reporter = getattr(self._local, 'reporter', None)
+        if reporter is not None and status.get('status') in ('downloading', 'finished'):
+            reporter.update(immediate=status.get('status') == 'finished', **hook_fields(status))
+    
+    def _postprocessor_hook(self, status: Dict[str, Any]):
+        """
+        yt-dlp后处理回调（合并音视频流等）
+        
+        参数:
+        - status: yt-dlp后处理状态
+        """
+        reporter = getattr(self._local, 'reporter', None)
+        # MoveFiles只是移动文件，不作为后处理阶段
+        if reporter is not None and status.get('status') == 'started' and status.get('postprocessor') != 'MoveFiles':
+            reporter.update(stage=STAGE_POSTPROCESS, postprocessor=status.get('postprocessor'))
+    
+    async def extract_info(self, url: str, quality: str = "best",
+                           platform: Optional[Platform] = None) -> Dict[str, Any]:
+        """
+        只提取视频信息，不下载
+        信息缓存中有该链接时只按质量重新选择格式，不访问平台；否则提取后写入信息缓存（同一链接的并发提取只执行一次）
+        
+        参数:
+        - url: 视频链接
+        - quality: 视频质量
+        - platform: 平台配置（指定时受该平台的限速、熔断和并发控制）
+        
+        返回:
+        - yt-dlp提取的视频信息（已完成格式选择）
+        """
+        key = normalize_url(url)
+        cached = self.info_cache.get(key)
+        if cached is not None:
+            return await self.worker_pool.run(self._extract_sync, url, quality, None, cached)
+        
+        async def extract() -> Dict[str, Any]:
+            if platform is None:
+                info = await self.worker_pool.run(self._extract_sync, url, "best")
             else:
-                filename = f"video_{url_hash}_{timestamp}"
-                
-            return filename
-            
+                async with self.guards.get(platform).slot():
+                    info = await self.worker_pool.run(self._extract_sync, url, "best", platform.key)
+            self.info_cache.put(key, info)
+            return info
+        
+        info = await self.info_flight.do(key, extract)
+        if normalize_quality(quality) == "best":
+            return info
+        return await self.worker_pool.run(self._extract_sync, url, quality, None, info)
+    
+    async def preview(self, url: str) -> Dict[str, Any]:
+        """
+        获取视频预览信息（标题、缩略图、时长等），只提取信息不下载
+        
+        参数:
+        - url: 视频链接
+        
+        返回:
+        - 轻量字段和平台名称，cached 表示是否来自信息缓存
+        """
+        if not url or not url.startswith(('http://', 'https://')):
+            raise ValueError("无效的视频链接")
+        
+        url, match = await self.resolve(url)
+        if not match:
+            raise ValueError("不支持的视频平台")
+        
+        cached = self.info_cache.get(normalize_url(url)) is not None
+        if not cached:
+            # 平台熔断中直接失败
+            self.guards.get(match.platform).check()
+        info = await self.extract_info(url, platform=match.platform)
+        
+        result = project_info(info)
+        result.update({'duration': info.get('duration'), 'platform': match.name, 'cached': cached})
+        return result
+    
+    def _extract_sync(self, url: str, quality: str = "best", platform_key: Optional[str] = None,
+                      info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        同步提取视频信息（在工作池线程/进程中运行）
+        
+        参数:
+        - url: 视频链接
+        - quality: 视频质量
+        - platform_key: 平台标识（用于监控指标）
+        - info: 已缓存的视频信息，提供时只按质量重新选择格式，不访问平台
+        
+        返回:
+        - yt-dlp提取的视频信息
+        """
+        try:
+            ydl = self._get_ydl(quality)
+            if info is not None:
+                # 复制后处理（格式选择会修改信息字典，缓存中的信息可能被多个线程同时使用）
+                return ydl.sanitize_info(ydl.process_ie_result(ydl.sanitize_info(info, True), download=False))
+            logger.info(f"开始提取视频信息: {url}")
+            with metrics.timed(metrics.STAGE_EXTRACT, platform_key):
+                info = ydl.extract_info(url, download=False)
+            return ydl.sanitize_info(info)
         except Exception as e:
-            logger.error(f"文件名生成失败: {str(e)}")
-            # 返回默认文件名
-            return f"video_{int(time.time())}"
+            logger.error(f"视频信息提取失败: {str(e)}")
+            if is_upstream_failure(e):
+                raise UpstreamError(f"视频信息提取失败: {str(e)}")
+            raise Exception(f"视频信息提取失败: {str(e)}")
     
-    async def _download_with_ytdlp(self, url: str, remove_watermark: bool = False) -> Dict[str, Any]:
+    async def _download_with_ytdlp(self, url: str, remove_watermark: bool = False,
+                                   quality: str = "best", platform: Optional[Platform] = None,
+                                   reporter: Optional[ProgressReporter] = None) -> Dict[str, Any]:
         """
         使用yt-dlp下载视频
+        阻塞的提取和下载过程在下载工作池中执行；需要FFmpeg处理时交给独立的后处理阶段，
+        下载名额在编码前释放，编码排队时其他下载可以继续进行；
+        访问平台的部分受平台保护控制，平台熔断时直接失败，不占用工作池；
+        信息缓存中有该链接（如已调用过预览接口）时复用缓存的信息，不再提取；
+        当前请求开启了剖析时，工作池中的提取和下载过程由cProfile记录
         
         参数:
         - url: 视频链接
         - remove_watermark: 是否去除水印
+        - quality: 视频质量
+        - platform: 平台配置
+        - reporter: 进度上报器
         
         返回:
         - 包含下载信息的字典
         """
+        # 进程池模式下回调无法跨进程上报，只发布阶段变化
+        sync_reporter = reporter if self.worker_pool.kind == "thread" else None
+        info_key = normalize_url(url)
+        info = self.info_cache.get(info_key)
+        call = (self._download_sync, url, remove_watermark, quality, platform, sync_reporter, info)
+        session = profiling.current()
+        if session is not None:
+            # 剖析模式：在工作线程/进程中用cProfile执行（上下文变量不会传到工作池）
+            call = (profiling.run_profiled, session.clock) + call
+        
+        async def fetch() -> Dict[str, Any]:
+            fetched = await self.worker_pool.run(*call)
+            if session is not None:
+                fetched, report = fetched
+                session.profiles.append(report)
+            return fetched
+        
+        with profiling.span("fetch") as span:
+            if platform is None:
+                fetched = await fetch()
+            else:
+                async with self.guards.get(platform).slot() as slot:
+                    fetched = await fetch()
+                    # 以提取耗时作为平台延迟（下载耗时取决于文件大小）
+                    slot['latency'] = fetched.get('extract_seconds')
+            span['extract_seconds'] = fetched.get('extract_seconds')
+            span['info_cached'] = info is not None
+            span['download_seconds'] = fetched.get('download_seconds')
+        if fetched.get('stale_info'):
+            # 缓存的信息已无法下载（媒体地址过期），之后的请求重新提取
+            self.info_cache.pop(info_key)
+        if 'result' in fetched:
+            return fetched['result']
+        
+        # 后处理阶段（CPU密集型，在独立的进程池中排队）
+        if reporter is not None:
+            reporter.update(stage=STAGE_POSTPROCESS, postprocessor=fetched['postprocess'])
+        options, url_key, cache_key = fetched['keys']
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.journal.update, url_key, STAGE_POSTPROCESS)
+        try:
+            with metrics.timed(metrics.STAGE_POSTPROCESS, platform.key if platform else None), \
+                    profiling.span("postprocess", postprocessor=fetched['postprocess']):
+                file_path = await self.postprocessor.process(fetched['file_path'], fetched['postprocess'])
+        except Exception as e:
+            logger.error(f"视频后处理失败: {str(e)}")
+            raise Exception(f"视频后处理失败: {str(e)}")
+        
+        # 写入缓存并记录链接别名
+        with profiling.span("commit"):
+            result = await loop.run_in_executor(
+                None, lambda: self.commit_file(url, fetched['info'], options, url_key, cache_key, file_path,
+                                               platform=platform)
+            )
+        logger.info(f"视频下载完成: {result['filename']}")
+        return result
+    
+    def _download_sync(self, url: str, remove_watermark: bool = False,
+                       quality: str = "best", platform: Optional[Platform] = None,
+                       reporter: Optional[ProgressReporter] = None,
+                       info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        同步执行yt-dlp下载（在工作池线程/进程中运行）
+        只提取一次视频信息：先按规范视频ID查询缓存，未命中则用同一个实例基于该信息下载
+        
+        参数:
+        - url: 视频链接
+        - remove_watermark: 是否去除水印
+        - quality: 视频质量
+        - platform: 平台配置
+        - reporter: 进度上报器（只在线程池模式下传入）
+        - info: 信息缓存中的视频信息，提供时不再提取；基于它下载失败时（媒体地址可能已过期）重新提取一次
+        
+        返回:
+        - 无需后处理时返回 {'result': 下载结果}；
+          需要后处理时返回 {'info', 'file_path', 'keys', 'postprocess'}，由后处理阶段继续处理；
+          两者都包含 extract_seconds（提取视频信息的耗时，复用缓存信息时为None），下载过的还包含 download_seconds，
+          缓存的信息已失效时包含 stale_info
+        """
+        if info is not None:
+            try:
+                return self._download_info_sync(url, remove_watermark, quality, platform, reporter, info)
+            except Exception as e:
+                logger.warning(f"复用缓存的视频信息下载失败，重新提取: {str(e)}")
+                fetched = self._download_info_sync(url, remove_watermark, quality, platform, reporter)
+                fetched['stale_info'] = True
+                return fetched
+        return self._download_info_sync(url, remove_watermark, quality, platform, reporter)
+    
+    def _download_info_sync(self, url: str, remove_watermark: bool = False,
+                            quality: str = "best", platform: Optional[Platform] = None,
+                            reporter: Optional[ProgressReporter] = None,
+                            cached_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        同步执行一次yt-dlp下载（参数和返回值同 _download_sync）
+        """
+        platform_key = platform.key if platform else None
         try:
-            # 创建临时配置
-            temp_opts = self.ydl_opts.copy()
+            # 获取当前线程复用的yt-dlp实例（按质量和去水印要求选择格式，分辨率相同时优先无需后处理的MP4格式）
+            ydl = self._get_ydl(quality, remove_watermark)
+            self._local.reporter = reporter
             
-            # 如果要去水印，添加相关配置
-            if remove_watermark:
-                temp_opts['postprocessors'] = [{
-                    'key': 'FFmpegVideoConvertor',  # 使用FFmpeg转换
-                    'preferedformat': 'mp4',  # 转换为MP4格式
-                }]
-                
-            # 创建yt-dlp下载器实例
-            with yt_dlp.YoutubeDL(temp_opts) as ydl:
-                # 提取视频信息
+            # 提取视频信息
+            if reporter is not None:
+                reporter.update(stage=STAGE_EXTRACT)
+            if cached_info is not None:
+                # 复用预览时提取的信息，只按本次的质量要求重新选择格式（复制后处理，缓存中的信息不被修改）
+                logger.info(f"复用缓存的视频信息: {url}")
+                info = ydl.process_ie_result(ydl.sanitize_info(cached_info, True), download=False)
+                extract_seconds = None
+            else:
                 logger.info(f"开始提取视频信息: {url}")
-                info = ydl.extract_info(url, download=False)  # 先不下载，只提取信息
-                
-                # 生成文件名
-                filename = self._generate_filename(url, info.get('title'))
-                temp_opts['outtmpl'] = os.path.join(self.download_dir, f"{filename}.%(ext)s")
-                
-                # 重新创建下载器并下载
-                with yt_dlp.YoutubeDL(temp_opts) as ydl_download:
-                    logger.info(f"开始下载视频: {url}")
-                    ydl_download.download([url])
-                
-                # 构建返回结果
-                result = {
-                    'video_url': url,  # 原始URL
-                    'filename': f"{filename}.{info.get('ext', 'mp4')}",
-                    'title': info.get('title', '未知标题'),
-                    'duration': info.get('duration'),
-                    'thumbnail_url': info.get('thumbnail'),
-                    'platform': self._detect_platform(url),
-                    'file_size': info.get('filesize'),
-                    'format': info.get('format'),
-                    'uploader': info.get('uploader'),
-                    'upload_date': info.get('upload_date'),
-                    'view_count': info.get('view_count'),
-                    'like_count': info.get('like_count'),
-                    'comment_count': info.get('comment_count'),
-                    'description': info.get('description'),
-                    'tags': info.get('tags', []),
-                    'categories': info.get('categories', []),
-                    'language': info.get('language'),
-                    'age_limit': info.get('age_limit'),
-                    'is_live': info.get('is_live', False),
-                    'was_live': info.get('was_live', False),
-                    'live_status': info.get('live_status'),
-                    'availability': info.get('availability'),
-                    'webpage_url': info.get('webpage_url'),
-                    'webpage_url_basename': info.get('webpage_url_basename'),
-                    'webpage_url_domain': info.get('webpage_url_domain'),
-                    'extractor': info.get('extractor'),
-                    'extractor_key': info.get('extractor_key'),
-                    'epoch': info.get('epoch'),
-                    'timestamp': info.get('timestamp'),
-                    'release_timestamp': info.get('release_timestamp'),
-                    'release_date': info.get('release_date'),
-                    'release_year': info.get('release_year'),
-                    'modified_timestamp': info.get('modified_timestamp'),
-                    'modified_date': info.get('modified_date'),
-                    'uploader_id': info.get('uploader_id'),
-                    'uploader_url': info.get('uploader_url'),
-                    'channel': info.get('channel'),
-                    'channel_id': info.get('channel_id'),
-                    'channel_url': info.get('channel_url'),
-                    'channel_follower_count': info.get('channel_follower_count'),
-                    'location': info.get('location'),
-                    'subtitles': info.get('subtitles'),
-                    'automatic_captions': info.get('automatic_captions'),
-                    'chapters': info.get('chapters'),
-                    'thumbnails': info.get('thumbnails'),
-                    'audio_streams': info.get('audio_streams'),
-                    'video_streams': info.get('video_streams'),
-                    'formats': info.get('formats'),
-                    'requested_formats': info.get('requested_formats'),
-                    'format_id': info.get('format_id'),
-                    'ext': info.get('ext'),
-                    'resolution': info.get('resolution'),
-                    'aspect_ratio': info.get('aspect_ratio'),
-                    'fps': info.get('fps'),
-                    'vcodec': info.get('vcodec'),
-                    'acodec': info.get('acodec'),
-                    'container': info.get('container'),
-                    'filesize_approx': info.get('filesize_approx'),
-                    'tbr': info.get('tbr'),
-                    'vbr': info.get('vbr'),
-                    'abr': info.get('abr'),
-                    'asr': info.get('asr'),
-                    'height': info.get('height'),
-                    'width': info.get('width'),
-                    'protocol': info.get('protocol'),
-                    'source_preference': info.get('source_preference'),
-                    'quality': info.get('quality'),
-                    'has_drm': info.get('has_drm'),
-                    'filesize': info.get('filesize'),
-                    'downloader_options': info.get('downloader_options'),
-                    'http_headers': info.get('http_headers'),
-                    'url': info.get('url'),
-                    'manifest_url': info.get('manifest_url'),
-                    'manifest_stream_number': info.get('manifest_stream_number'),
-                    'fragment_base_url': info.get('fragment_base_url'),
-                    'fragment_index': info.get('fragment_index'),
-                    'fragment_count': info.get('fragment_count'),
-                    'lazy': info.get('lazy'),
-                    'is_from_start': info.get('is_from_start'),
-                    'direct': info.get('direct'),
-                    'preference': info.get('preference'),
-                    'language_preference': info.get('language_preference'),
-                    'quality_preference': info.get('quality_preference'),
-                    'source_preference': info.get('source_preference'),
-                    'protocol_preference': info.get('protocol_preference'),
-                    'geo_preference': info.get('geo_preference'),
-                    'has_drm_preference': info.get('has_drm_preference'),
-                    'filesize_preference': info.get('filesize_preference'),
-                    'tbr_preference': info.get('tbr_preference'),
-                    'vbr_preference': info.get('vbr_preference'),
-                    'abr_preference': info.get('abr_preference'),
-                    'asr_preference': info.get('asr_preference'),
-                    'height_preference': info.get('height_preference'),
-                    'width_preference': info.get('width_preference'),
-                    'fps_preference': info.get('fps_preference'),
-                    'vcodec_preference': info.get('vcodec_preference'),
-                    'acodec_preference': info.get('acodec_preference'),
-                    'container_preference': info.get('container_preference'),
-                    'ext_preference': info.get('ext_preference'),
-                    'resolution_preference': info.get('resolution_preference'),
-                    'aspect_ratio_preference': info.get('aspect_ratio_preference'),
-                    'protocol_preference': info.get('protocol_preference'),
-                    'source_preference': info.get('source_preference'),
-                    'has_drm_preference': info.get('has_drm_preference'),
-                    'filesize_preference': info.get('filesize_preference'),
-                    'tbr_preference': info.get('tbr_preference'),
-                    'vbr_preference': info.get('vbr_preference'),
-                    'abr_preference': info.get('abr_preference'),
-                    'asr_preference': info.get('asr_preference'),
-                    'height_preference': info.get('height_preference'),
-                    'width_preference': info.get('width_preference'),
-                    'fps_preference': info.get('fps_preference'),
-                    'vcodec_preference': info.get('vcodec_preference'),
-                    'acodec_preference': info.get('acodec_preference'),
-                    'container_preference': info.get('container_preference'),
-                    'ext_preference': info.get('ext_preference'),
-                    'resolution_preference': info.get('resolution_preference'),
-                    'aspect_ratio_preference': info.get('aspect_ratio_preference'),
-                }
-                
-                logger.info(f"视频下载完成: {result['filename']}")
-                return result
-                
+                with metrics.timed(metrics.STAGE_EXTRACT, platform_key) as span:
+                    info = ydl.extract_info(url, download=False)  # 先不下载，只提取信息
+                extract_seconds = span['seconds']
+            
+            # 按提取器的规范视频ID查询缓存
+            options, url_key, cache_key = self.cache_keys(url, info, remove_watermark, quality)
+            entry = self.cache.get(cache_key)
+            if entry is not None:
+                logger.info(f"命中下载缓存: {cache_key}")
+                self.cache.add_alias(url_key, cache_key)
+                return {'result': self._result_from_cache(entry), 'extract_seconds': extract_seconds}
+            
+            # 生成文件名，直接修改当前实例的输出模板（yt-dlp先写入 .part 文件，完成后重命名）
+            filename = self._generate_filename(cache_key)
+            ydl.params['outtmpl']['default'] = self.storage.path(f"{filename}.%(ext)s", create=True)
+            # 记录部分文件位置（重启后从 .part 继续下载，无法恢复时按此前缀清理）
+            self.journal.update(url_key, STAGE_DOWNLOAD, partial_path=self.storage.path(filename),
+                                cache_key=cache_key)
+            
+            # 复用已提取的信息下载，避免再次运行提取器（页面请求、签名和API调用）
+            logger.info(f"开始下载视频: {url}")
+            with metrics.timed(metrics.STAGE_DOWNLOAD, platform_key) as span:
+                downloaded = ydl.process_ie_result(ydl.sanitize_info(info, True), download=True)
+            timings = {'extract_seconds': extract_seconds, 'download_seconds': span['seconds']}
+            
+            # 获取下载的文件路径
+            requested = downloaded.get('requested_downloads') or [{}]
+            final_name = os.path.basename(requested[0].get('filepath') or f"{filename}.{info.get('ext', 'mp4')}")
+            file_path = self.storage.path(final_name)
+            
+            # 根据已选格式决定后处理：已是MP4则不处理，编码兼容时只做封装转换，
+            # 重新编码是最后手段，只在请求去水印时进行（普通下载保留原始封装格式）
+            postprocess = choose_postprocessor(info, platform.transcode if platform else "remux",
+                                               allow_convert=remove_watermark)
+            if postprocess and self.has_ffmpeg:
+                logger.info(f"视频下载完成，等待后处理: {postprocess} {final_name}")
+                return {'info': ydl.sanitize_info(info), 'file_path': file_path,
+                        'keys': (options, url_key, cache_key), 'postprocess': postprocess, **timings}
+            
+            # 写入缓存并记录链接别名
+            result = self.commit_file(url, info, options, url_key, cache_key, file_path,
+                                      platform=platform)
+            
+            logger.info(f"视频下载完成: {result['filename']}")
+            return {'result': result, **timings}
+            
         except Exception as e:
             logger.error(f"yt-dlp下载失败: {str(e)}")
+            if is_upstream_failure(e):
+                # 平台侧错误计入熔断统计
+                raise UpstreamError(f"视频下载失败: {str(e)}")
             raise Exception(f"视频下载失败: {str(e)}")
+        finally:
+            self._local.reporter = None
+    
+    async def _download_tracked(self, key: Any, reporter: ProgressReporter, url: str, remove_watermark: bool,
+                                quality: str, platform: Optional[Platform]) -> Dict[str, Any]:
+        """
+        执行下载并在结束时移除进度上报器
+        下载过程记录在下载日志中：完成时删除记录，失败时保留部分文件供重试继续下载，进程退出时由其他进程接管
+        
+        参数:
+        - key: 请求合并键
+        - reporter: 进度上报器
+        - 其余参数同 _download_with_ytdlp
+        
+        返回:
+        - 包含下载信息的字典
+        """
+        loop = asyncio.get_running_loop()
+        url_key = self.url_key(url, remove_watermark, quality)
+        await loop.run_in_executor(None, self.journal.begin, url_key, url, remove_watermark, quality,
+                                   current_job_id.get())
+        try:
+            result = await self._download_with_ytdlp(url, remove_watermark, quality, platform, reporter)
+            await loop.run_in_executor(None, self.journal.finish, url_key)
+            return result
+        except Exception as e:
+            await loop.run_in_executor(None, self.journal.fail, url_key, str(e))
+            raise
+        finally:
+            if self._reporters.get(key) is reporter:
+                del self._reporters[key]
+            stats = reporter.stats()
+            self._progress_updates += stats['updates']
+            self._progress_published += stats['published']
+    
+    def progress_stats(self) -> Dict[str, int]:
+        """
+        获取进度上报统计信息
+        
+        返回:
+        - 正在上报的下载数、收到的回调次数和实际发布次数（体现节流合并效果）
+        """
+        return {
+            "active": len(self._reporters),
+            "updates": self._progress_updates + sum(r.stats()['updates'] for r in self._reporters.values()),
+            "published": self._progress_published + sum(r.stats()['published'] for r in self._reporters.values()),
+        }
     
-    async def download_video(self, url: str, remove_watermark: bool = False) -> Dict[str, Any]:
+    async def download_video(self, url: str, remove_watermark: bool = False,
+                             quality: str = "best", progress: Optional[ProgressChannel] = None,
+                             resolved: Optional[Tuple[str, Optional[PlatformMatch]]] = None,
+                             entry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         下载视频的主方法
+        同一链接、相同选项的并发请求只下载一次，所有调用方共享结果
         
         参数:
         - url: 视频链接
         - remove_watermark: 是否去除水印
+        - quality: 视频质量
+        - progress: 接收下载进度的通道（可选，合并的重复请求收到同一个下载的进度）
+        - resolved: 调用方已得到的 resolve() 结果，提供时不再识别平台、解析短链接和查询链接别名
+        - entry: 与 resolved 一起提供，调用方 lookup_cached() 的查询结果（None表示未命中）
         
         返回:
         - 包含下载信息的字典
@@ -315,24 +867,61 @@ class VideoDownloader:
             # 验证URL格式
             if not url or not url.startswith(('http://', 'https://')):
                 raise ValueError("无效的视频链接")
+            quality = normalize_quality(quality)
             
-            # 检测平台支持
-            platform = self._detect_platform(url)
-            if not platform:
+            # 检测平台支持并解析短链接（只检测一次，结果随下载流程传递）
+            if resolved is None:
+                url, match = await self.resolve(url)
+            else:
+                url, match = resolved
+            if not match:
                 raise ValueError("不支持的视频平台")
+            platform = match.platform
             
             logger.info(f"开始处理视频下载请求: {url}")
             
-            # 使用yt-dlp下载视频
-            result = await self._download_with_ytdlp(url, remove_watermark)
+            # 按链接查询缓存，命中则无需提取和下载（调用方已查询过时沿用其结果）
+            if resolved is None:
+                entry = await self.lookup_cached(url, remove_watermark, quality)
+            
+            if entry is not None:
+                logger.info(f"命中下载缓存: {url}")
+                shared = self._result_from_cache(entry)
+            else:
+                # 平台熔断中直接失败（缓存命中不受影响）
+                self.guards.get(match.platform).check()
+                
+                # 使用yt-dlp下载视频（按规范化链接和选项合并并发请求）
+                key = self.flight_key(url, remove_watermark, quality)
+                reporter = self._reporters.get(key)
+                if reporter is not None and progress is not None:
+                    # 加入正在执行的下载，共享其进度
+                    reporter.attach(progress)
+                
+                def start():
+                    # 没有同键的下载时才会调用：创建该下载的进度上报器
+                    created = self._reporters[key] = ProgressReporter(asyncio.get_running_loop())
+                    if progress is not None:
+                        created.attach(progress)
+                    return self._download_tracked(key, created, url, remove_watermark, quality, platform)
+                
+                try:
+                    shared = await self.singleflight.do(key, start)
+                except StreamIncomplete:
+                    # 合并到的是流式下载，且它没有写入缓存（客户端断开或无法确认完整），自行下载
+                    shared = await self.singleflight.do(key, start)
             
-            # 添加处理标记
+            # 复制共享结果后再添加处理标记
+            result = dict(shared)
             result['processed'] = True
             result['remove_watermark'] = remove_watermark
             
             logger.info(f"视频处理完成: {result['filename']}")
             return result
             
+        except CircuitOpenError:
+            # 保留异常类型，由接口返回503和重试时间
+            raise
         except Exception as e:
             logger.error(f"视频下载处理失败: {str(e)}")
             raise Exception(f"视频下载失败: {str(e)}")
@@ -346,29 +935,15 @@ class VideoDownloader:
         """
         return self.supported_platforms.copy()
     
-    def cleanup_downloads(self, max_age_hours: int = 24):
+    def cleanup_downloads(self, max_age_hours: int = 24, max_bytes: int = 0):
         """
-        清理过期的下载文件
+        清理过期的下载文件（按缓存索引的最后访问时间，连同 .info.json 和缩略图一起删除）
         
         参数:
-        - max_age_hours: 文件最大保留时间（小时）
+        - max_age_hours: 文件未被访问的最长保留时间（小时）
+        - max_bytes: 视频文件总大小预算（字节），超出时删除最久未访问的文件，0表示不限
         """
         try:
-            current_time = time.time()
-            max_age_seconds = max_age_hours * 3600  # 转换为秒
-            
-            # 遍历下载目录
-            for filename in os.listdir(self.download_dir):
-                file_path = os.path.join(self.download_dir, filename)
-                
-                # 检查文件修改时间
-                if os.path.isfile(file_path):
-                    file_age = current_time - os.path.getmtime(file_path)
-                    
-                    # 如果文件超过最大保留时间，删除它
-                    if file_age > max_age_seconds:
-                        os.remove(file_path)
-                        logger.info(f"删除过期文件: {filename}")
-                        
+            Janitor(self.cache, max_age_hours * 3600, max_bytes).run_once()
         except Exception as e:
-            logger.error(f"清理下载文件失败: {str(e)}") 
\ No newline at end of file
+            logger.error(f"清理下载文件失败: {str(e)}")
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+下载工作池模块
+将阻塞的yt-dlp调用放到线程池/进程池中执行，避免阻塞事件循环
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# 配置日志记录
+logger = logging.getLogger(__name__)
+
+# 支持的工作池类型
+POOL_KINDS = ("thread", "process")
+
+
+class WorkerPool:
+    """
+    有界工作池类
+    在线程池或进程池中执行阻塞任务，并限制同时执行的任务数量
+    """
+
+    def __init__(self, name: str, max_workers: int = 4, kind: str = "thread",
+                 max_concurrency: Optional[int] = None):
+        """
+        初始化工作池
+
+        参数:
+        - name: 工作池名称（用于日志和统计）
+        - max_workers: 线程/进程数量
+        - kind: 工作池类型，thread（网络密集型）或 process（CPU密集型）
+        - max_concurrency: 最大并发任务数，默认等于max_workers
+        """
+        if kind not in POOL_KINDS:
+            raise ValueError(f"不支持的工作池类型: {kind}")
+        if max_workers < 1:
+            raise ValueError("工作池线程/进程数量必须大于0")
+
+        self.name = name  # 工作池名称
+        self.kind = kind  # 工作池类型
+        self.max_workers = max_workers  # 线程/进程数量
+        self.max_concurrency = max_concurrency or max_workers  # 并发上限
+
+        # 创建底层执行器
+        if kind == "process":
+            self._executor: Executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+        # 并发控制信号量（首次使用时在当前事件循环中创建）
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # 统计信息
+        self._queued = 0  # 排队等待的任务数
+        self._active = 0  # 正在执行的任务数
+        self._completed = 0  # 已完成的任务数
+        self._failed = 0  # 失败的任务数
+        self._total_wait = 0.0  # 累计排队时间（秒）
+
+        logger.info(f"工作池初始化完成: {name} ({kind}, workers={max_workers}, concurrency={self.max_concurrency})")
+
+    def start(self):
+        """
+        预先创建全部工作进程（线程池无需预先创建）
+        进程池以fork方式在首次提交任务时创建全部进程，必须在其他线程开始导入模块之前调用，
+        否则子进程可能继承被其他线程持有的导入锁，首次导入时永久阻塞
+        """
+        if self.kind == "process":
+            self._executor.submit(int).result()
+            logger.info(f"工作池进程已创建: {self.name} ({self.max_workers} 个进程)")
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取并发控制信号量"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在工作池中执行阻塞函数
+
+        参数:
+        - func: 要执行的函数（进程池模式下必须可被pickle）
+        - args/kwargs: 函数参数
+
+        返回:
+        - 函数的返回值
+        """
+        semaphore = self._get_semaphore()
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+
+        # 进入队列，等待并发名额
+        self._queued += 1
+        enqueued_at = time.monotonic()
+        try:
+            await semaphore.acquire()
+        finally:
+            self._queued -= 1
+        self._total_wait += time.monotonic() - enqueued_at
+
+        # 在执行器中运行任务
+        self._active += 1
+        try:
+            result = await loop.run_in_executor(self._executor, call)
+            self._completed += 1
+            return result
+        except BaseException:
+            self._failed += 1
+            raise
+        finally:
+            self._active -= 1
+            semaphore.release()
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队等待的任务数"""
+        return self._queued
+
+    @property
+    def active(self) -> int:
+        """当前正在执行的任务数"""
+        return self._active
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取工作池统计信息
+
+        返回:
+        - 包含队列深度、活跃任务数等信息的字典
+        """
+        finished = self._completed + self._failed
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self._queued,
+            "active": self._active,
+            "completed": self._completed,
+            "failed": self._failed,
+            "avg_wait_seconds": round(self._total_wait / finished, 3) if finished else 0.0,
+        }
+
+    def shutdown(self, wait: bool = True):
+        """
+        关闭工作池
+
+        参数:
+        - wait: 是否等待正在执行的任务完成
+        """
+        self._executor.shutdown(wait=wait)
+        logger.info(f"工作池已关闭: {self.name}")
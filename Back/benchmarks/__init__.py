@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+性能基准测试包
+使用本地桩源站和桩提取器，无需访问外网即可测量下载流程的性能
+"""
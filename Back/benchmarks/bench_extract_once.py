@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+单次提取基准测试
+对比旧流程（extract_info后新建实例再download，提取两次）与新流程（复用信息字典下载）的每平台耗时
+
+运行方式（在Back目录下）:
+    python -m benchmarks.bench_extract_once --rounds 5
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import yt_dlp
+
+from app.video_downloader import VideoDownloader
+from benchmarks.stub_extractor import StubYoutubeDL
+from benchmarks.stub_origin import PLATFORM_LATENCY, StubOrigin
+
+
+def legacy_download(downloader: VideoDownloader, url: str):
+    """
+    旧流程：提取信息后重新创建实例调用download，提取器会再运行一次
+
+    参数:
+    - downloader: 视频下载器
+    - url: 视频链接
+    """
+    opts = downloader.ydl_opts.copy()
+    with StubYoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+        opts['outtmpl'] = os.path.join(downloader.download_dir, f"legacy_{info['id']}_{time.time_ns()}.%(ext)s")
+        with StubYoutubeDL(opts) as ydl_download:
+            ydl_download.download([url])
+
+
+def run(rounds: int):
+    """
+    运行基准测试并打印结果
+
+    参数:
+    - rounds: 每个平台的测试轮数
+    """
+    # 使用桩提取器替换yt-dlp入口
+    yt_dlp.YoutubeDL = StubYoutubeDL
+
+    with tempfile.TemporaryDirectory() as workdir, StubOrigin() as origin:
+        os.chdir(workdir)
+        downloader = VideoDownloader()
+
+        print(f"{'平台':<10}{'旧流程(ms)':>12}{'新流程(ms)':>12}{'节省(ms)':>10}{'节省比例':>10}")
+        for platform in PLATFORM_LATENCY:
+            legacy, single = [], []
+            for i in range(rounds):
+                url = f"{origin.base_url}/{platform}/legacy{i}"
+                start = time.perf_counter()
+                legacy_download(downloader, url)
+                legacy.append(time.perf_counter() - start)
+
+                # 每轮使用新的视频ID，避免命中下载缓存
+                url = f"{origin.base_url}/{platform}/single{i}"
+                start = time.perf_counter()
+                downloader._download_sync(url)
+                single.append(time.perf_counter() - start)
+
+            old_ms = statistics.median(legacy) * 1000
+            new_ms = statistics.median(single) * 1000
+            print(f"{platform:<10}{old_ms:>12.1f}{new_ms:>12.1f}{old_ms - new_ms:>10.1f}"
+                  f"{(old_ms - new_ms) / old_ms:>10.1%}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="单次提取基准测试")
+    parser.add_argument("--rounds", type=int, default=5, help="每个平台的测试轮数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    run(args.rounds)
+
+
+if __name__ == "__main__":
+    main()
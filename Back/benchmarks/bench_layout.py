@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+下载目录布局基准测试
+对比平铺目录与分片子目录（ab/cd/<hash>.<ext>）在大量文件下的创建、查找、列目录耗时，
+以及旧的全目录扫描清理与按缓存索引清理的耗时
+
+运行方式（在Back目录下）:
+    python -m benchmarks.bench_layout --files 100000
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Callable, List
+
+from app.download_cache import DownloadCache
+from app.janitor import Janitor
+from app.storage import FSYNC_NONE, ShardedStorage
+
+# 每个视频的文件（视频、信息JSON、缩略图）
+SUFFIXES = (".mp4", ".info.json", ".webp")
+
+
+def timed(func: Callable[[], object]) -> float:
+    """
+    执行函数并返回耗时（秒）
+    """
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def populate(paths: List[str]):
+    """
+    创建空文件
+
+    参数:
+    - paths: 文件路径列表
+    """
+    for path in paths:
+        with open(path, "wb") as f:
+            f.write(b"0")
+
+
+def legacy_cleanup(directory: str, max_age_seconds: float) -> int:
+    """
+    旧的清理方式：列出整个目录并逐个读取修改时间
+
+    参数:
+    - directory: 下载目录
+    - max_age_seconds: 最长保留时间
+
+    返回:
+    - 过期文件数（不实际删除，便于对比）
+    """
+    now = time.time()
+    expired = 0
+    for filename in os.listdir(directory):
+        file_path = os.path.join(directory, filename)
+        if os.path.isfile(file_path) and now - os.path.getmtime(file_path) > max_age_seconds:
+            expired += 1
+    return expired
+
+
+def run(files: int, lookups: int, expired_ratio: float):
+    """
+    运行基准测试并打印结果
+
+    参数:
+    - files: 视频数（每个视频3个文件）
+    - lookups: 随机查找次数
+    - expired_ratio: 按索引清理时过期视频的比例
+    """
+    names = [hashlib.sha256(str(i).encode()).hexdigest()[:32] for i in range(files)]
+    sample = random.sample(names, min(lookups, files))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        flat_dir = os.path.join(workdir, "flat")
+        os.makedirs(flat_dir)
+        storage = ShardedStorage(os.path.join(workdir, "sharded"), fsync=FSYNC_NONE)
+
+        flat_paths = [os.path.join(flat_dir, name + ext) for name in names for ext in SUFFIXES]
+        sharded_paths = [storage.path(name + ext, create=True) for name in names for ext in SUFFIXES]
+
+        results = []
+        results.append(("创建文件", timed(lambda: populate(flat_paths)), timed(lambda: populate(sharded_paths))))
+        results.append((
+            f"随机查找 {len(sample)} 次",
+            timed(lambda: [os.stat(os.path.join(flat_dir, name + ".mp4")) for name in sample]),
+            timed(lambda: [os.stat(storage.path(name + ".mp4")) for name in sample]),
+        ))
+        results.append((
+            f"创建并删除 {len(sample)} 个新文件",
+            timed(lambda: [(populate([p]), os.remove(p)) for p in
+                           (os.path.join(flat_dir, "n" + name + ".tmp") for name in sample)]),
+            timed(lambda: [(populate([p]), os.remove(p)) for p in
+                           (storage.path(name + ".tmp") for name in sample)]),
+        ))
+        results.append((
+            "列出目录（根目录）",
+            timed(lambda: os.listdir(flat_dir)),
+            timed(lambda: os.listdir(storage.root)),
+        ))
+
+        # 建立缓存索引，一部分视频的最后访问时间设为过期
+        cache = DownloadCache(os.path.join(workdir, "cache.db"))
+        now = time.time()
+        expired = set(random.sample(range(files), int(files * expired_ratio)))
+        rows = [(name, "bench", name, "o", storage.path(name + ".mp4"), 1, None, "{}", None, now,
+                 now - 7 * 86400 if i in expired else now) for i, name in enumerate(names)]
+        conn = cache._connect()
+        conn.execute("BEGIN")
+        conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("COMMIT")
+
+        janitor = Janitor(cache, max_age_seconds=86400, batch_size=200)
+        results.append((
+            f"清理（过期 {len(expired)} 个视频）",
+            timed(lambda: legacy_cleanup(flat_dir, 86400)),
+            timed(janitor.run_once),
+        ))
+
+    print(f"视频数: {files}（共 {files * len(SUFFIXES)} 个文件）")
+    print(f"{'操作':<28}{'平铺(ms)':>12}{'分片(ms)':>12}")
+    for label, flat, sharded in results:
+        print(f"{label:<28}{flat * 1000:>12.1f}{sharded * 1000:>12.1f}")
+    print("清理一行中，平铺为旧的全目录扫描（只统计不删除），分片为按索引清理（实际删除过期视频及旁路文件）")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="下载目录布局基准测试")
+    parser.add_argument("--files", type=int, default=100000, help="视频数（每个视频3个文件）")
+    parser.add_argument("--lookups", type=int, default=10000, help="随机查找次数")
+    parser.add_argument("--expired", type=float, default=0.01, help="过期视频的比例")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    run(args.files, args.lookups, args.expired)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+下载结果内存基准测试
+对比旧的120键结果字典（引用完整的formats/thumbnails/字幕列表）与字段投影后的结果，
+测量单个请求构建结果、序列化到缓存时的峰值内存，以及结果对象保留的内存
+
+运行方式（在Back目录下）:
+    python -m benchmarks.bench_result_memory --formats 300
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+
+from app.projection import project_info
+
+# 旧版 _download_with_ytdlp 结果字典读取的信息字段（去重后）
+LEGACY_KEYS = (
+    "title", "duration", "thumbnail", "format", "uploader", "upload_date", "view_count",
+    "like_count", "comment_count", "description", "tags", "categories", "language", "age_limit",
+    "is_live", "was_live", "live_status", "availability", "webpage_url", "webpage_url_basename",
+    "webpage_url_domain", "extractor", "extractor_key", "epoch", "timestamp", "release_timestamp",
+    "release_date", "release_year", "modified_timestamp", "modified_date", "uploader_id",
+    "uploader_url", "channel", "channel_id", "channel_url", "channel_follower_count", "location",
+    "subtitles", "automatic_captions", "chapters", "thumbnails", "audio_streams", "video_streams",
+    "formats", "requested_formats", "format_id", "ext", "resolution", "aspect_ratio", "fps",
+    "vcodec", "acodec", "container", "filesize_approx", "tbr", "vbr", "abr", "asr", "height",
+    "width", "protocol", "source_preference", "quality", "has_drm", "filesize",
+    "downloader_options", "http_headers", "url", "manifest_url", "manifest_stream_number",
+    "fragment_base_url", "fragment_index", "fragment_count", "lazy", "is_from_start", "direct",
+    "preference", "language_preference", "quality_preference", "protocol_preference",
+    "geo_preference", "has_drm_preference", "filesize_preference", "tbr_preference",
+    "vbr_preference", "abr_preference", "asr_preference", "height_preference", "width_preference",
+    "fps_preference", "vcodec_preference", "acodec_preference", "container_preference",
+    "ext_preference", "resolution_preference", "aspect_ratio_preference",
+)
+
+
+def make_info(format_count: int) -> dict:
+    """
+    生成与YouTube/B站规模相当的合成yt-dlp信息字典
+
+    参数:
+    - format_count: 格式数量
+
+    返回:
+    - 信息字典
+    """
+    headers = {"User-Agent": "Mozilla/5.0", "Accept": "*/*", "Accept-Language": "en-us,en;q=0.5"}
+    formats = [{
+        "format_id": f"{i}", "format_note": f"{144 + i}p", "ext": "mp4", "protocol": "https",
+        "url": f"https://cdn.example.com/videoplayback?id={i}&sig={'x' * 200}",
+        "width": 256 + i, "height": 144 + i, "fps": 30, "vcodec": "avc1.4d401e", "acodec": "mp4a.40.2",
+        "tbr": 100.0 + i, "vbr": 80.0 + i, "abr": 128.0, "asr": 44100, "filesize": 1000000 + i,
+        "quality": i, "source_preference": -1, "dynamic_range": "SDR", "container": "mp4_dash",
+        "http_headers": dict(headers), "downloader_options": {"http_chunk_size": 10485760},
+    } for i in range(format_count)]
+    thumbnails = [{"url": f"https://i.example.com/vi/{i}.jpg", "width": 120 * i, "height": 90 * i, "id": str(i)}
+                  for i in range(40)]
+    subtitles = {lang: [{"ext": ext, "url": f"https://sub.example.com/{lang}.{ext}?{'t' * 100}"}
+                        for ext in ("json3", "srv1", "srv2", "srv3", "ttml", "vtt")]
+                 for lang in (f"l{i}" for i in range(120))}
+
+    info = {
+        "id": "abc123", "title": "合成测试视频" * 5, "duration": 600, "thumbnail": thumbnails[-1]["url"],
+        "description": "描述" * 500, "tags": [f"tag{i}" for i in range(30)], "categories": ["Music"],
+        "uploader": "uploader", "upload_date": "20231201", "view_count": 123456, "like_count": 1234,
+        "webpage_url": "https://www.youtube.com/watch?v=abc123", "extractor": "youtube",
+        "extractor_key": "Youtube", "formats": formats, "thumbnails": thumbnails, "subtitles": subtitles,
+        "automatic_captions": dict(subtitles), "requested_formats": formats[-2:], "http_headers": headers,
+    }
+    info.update(formats[-1])
+    return info
+
+
+def legacy_result(info: dict) -> dict:
+    """旧流程：复制全部字段"""
+    return {key: info.get(key) for key in LEGACY_KEYS}
+
+
+def projected_result(info: dict) -> dict:
+    """新流程：只保留轻量字段"""
+    result = project_info(info)
+    result.update({"video_url": info["webpage_url"], "filename": "x.mp4", "file_size": 1, "duration": 600})
+    return result
+
+
+def measure(builder, format_count: int, requests: int) -> dict:
+    """
+    测量构建结果并序列化到缓存时的内存
+
+    参数:
+    - builder: 结果构建函数
+    - format_count: 格式数量
+    - requests: 同时保留结果的请求数
+
+    返回:
+    - 每个请求的峰值内存和保留内存（字节）
+    """
+    gc.collect()
+    tracemalloc.start()
+    retained = []
+    peak_total = 0
+    for _ in range(requests):
+        info = make_info(format_count)  # 模拟yt-dlp返回的信息
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = builder(info)
+        metadata = json.dumps(result, ensure_ascii=False, default=str)  # 写入缓存的元数据
+        peak_total += tracemalloc.get_traced_memory()[1] - baseline
+        retained.append((result, metadata))
+        del info, result, metadata  # 请求结束后信息字典不再被引用
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {"peak_per_request": peak_total // requests, "retained_per_result": current // requests}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="下载结果内存基准测试")
+    parser.add_argument("--formats", type=int, default=300, help="每个视频的格式数量")
+    parser.add_argument("--requests", type=int, default=20, help="同时保留结果的请求数")
+    args = parser.parse_args()
+
+    legacy = measure(legacy_result, args.formats, args.requests)
+    projected = measure(projected_result, args.formats, args.requests)
+
+    print(f"{'':<12}{'峰值/请求(KB)':>16}{'保留/结果(KB)':>16}")
+    for name, stats in (("旧结果字典", legacy), ("字段投影", projected)):
+        print(f"{name:<12}{stats['peak_per_request'] / 1024:>16.1f}{stats['retained_per_result'] / 1024:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+启动基准测试
+在全新的子进程中测量服务的冷启动：导入 main 的耗时和内存、uvicorn进程从启动到存活/就绪的耗时和内存，
+以及首次创建yt-dlp实例和首次查找提取器的耗时（每个支持平台一个示例链接）
+
+运行方式（在Back目录下）:
+    python -m benchmarks.bench_startup --runs 3
+    python -m benchmarks.bench_startup --root /path/to/old/Back  # 测量另一份代码（如修改前的版本）
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+# 每个支持平台的示例链接（只用于查找提取器，不访问网络）
+SAMPLE_URLS = [
+    "https://www.douyin.com/video/7300000000000000000",
+    "https://www.kuaishou.com/short-video/3xabcdefghijk",
+    "https://weibo.com/tv/show/1034:4900000000000000",
+    "https://www.bilibili.com/video/BV1xx411c7mD",
+    "https://www.youtube.com/watch?v=BaW_jenozKc",
+    "https://www.instagram.com/p/Bxxxxxxxxxx/",
+    "https://www.tiktok.com/@user/video/7300000000000000000",
+    "https://www.xiaohongshu.com/explore/650000000000000000000000",
+    "https://www.ixigua.com/7300000000000000000",
+]
+
+# 在子进程中执行的导入和提取器查找测量（兼容没有提取器预选的旧版本代码）
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter() - started
+loaded = "yt_dlp" in sys.modules
+
+def rss():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+import_rss = rss()
+downloader = main.video_downloader
+started = time.perf_counter()
+ydl = downloader._get_ydl()
+first_ydl = time.perf_counter() - started
+
+lookups = []
+selector = getattr(downloader, "extractors", None)
+defaults = selector is None  # 旧版本的实例已注册全部提取器
+for url in json.loads(sys.argv[1]):
+    started = time.perf_counter()
+    key = selector.select(ydl, url) if selector is not None else None
+    if key is None:
+        if not defaults:
+            ydl.add_default_info_extractors()
+            defaults = True
+        key = next(ie.ie_key() for ie in ydl._ies.values() if ie.suitable(url))
+    lookups.append(time.perf_counter() - started)
+
+print(json.dumps({"import_seconds": imported, "import_rss_mb": import_rss, "ytdlp_at_import": loaded,
+                  "first_ydl_seconds": first_ydl, "first_lookup_seconds": lookups[0],
+                  "all_lookups_seconds": sum(lookups), "after_lookup_rss_mb": rss()}))
+"""
+
+
+def free_port() -> int:
+    """获取一个空闲端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_rss(pid: int) -> float:
+    """
+    读取进程的常驻内存
+
+    参数:
+    - pid: 进程ID
+
+    返回:
+    - 常驻内存（MB）
+    """
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def wait_status(url: str, deadline: float) -> Optional[int]:
+    """
+    轮询接口直到返回200或404（旧版本没有就绪检查接口）
+
+    参数:
+    - url: 接口地址
+    - deadline: 截止时间（monotonic）
+
+    返回:
+    - 状态码，超时返回None
+    """
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return 404
+        except OSError:
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def measure_probe(root: str, env: Dict[str, str]) -> Dict[str, Any]:
+    """
+    测量导入耗时和首次提取器查找（全新子进程）
+
+    参数:
+    - root: 代码目录（Back）
+    - env: 环境变量
+
+    返回:
+    - 测量结果
+    """
+    output = subprocess.run([sys.executable, "-c", PROBE, json.dumps(SAMPLE_URLS)], cwd=root, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_server(root: str, env: Dict[str, str], timeout: float = 60.0) -> Dict[str, Any]:
+    """
+    测量uvicorn进程从启动到存活和就绪的耗时，以及就绪后的内存
+
+    参数:
+    - root: 代码目录（Back）
+    - env: 环境变量
+    - timeout: 最长等待时间（秒）
+
+    返回:
+    - 测量结果
+    """
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.monotonic()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                               "--log-level", "warning"], cwd=root, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = started + timeout
+        live = wait_status(f"{base}/health/live", deadline)
+        if live == 404:
+            live = wait_status(f"{base}/health", deadline)
+        live_seconds = time.monotonic() - started
+        ready = wait_status(f"{base}/health/ready", deadline)
+        ready_seconds = time.monotonic() - started if ready == 200 else live_seconds
+        if live is None:
+            raise RuntimeError("服务启动超时")
+        return {"live_seconds": live_seconds, "ready_seconds": ready_seconds, "ready_rss_mb": process_rss(server.pid)}
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def run(root: str, runs: int, preload: Optional[str]) -> Dict[str, float]:
+    """
+    运行基准测试并打印结果
+
+    参数:
+    - root: 代码目录（Back）
+    - runs: 测量次数（取中位数）
+    - preload: YTDLP_PRELOAD环境变量，None表示不设置
+
+    返回:
+    - 各指标的中位数
+    """
+    samples: List[Dict[str, Any]] = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as download_dir:
+            env = dict(os.environ, DOWNLOAD_DIR=download_dir, PYTHONDONTWRITEBYTECODE="1")
+            if preload is not None:
+                env["YTDLP_PRELOAD"] = preload
+            sample = measure_probe(root, env)
+            sample.update(measure_server(root, env))
+            samples.append(sample)
+
+    result = {key: statistics.median(s[key] for s in samples) for key in samples[0] if key != "ytdlp_at_import"}
+    print(f"代码目录: {os.path.abspath(root)}  YTDLP_PRELOAD={preload or '(默认)'}  运行 {runs} 次取中位数")
+    print(f"  导入时已加载yt-dlp: {samples[0]['ytdlp_at_import']}")
+    for key, label, unit in [
+        ("import_seconds", "导入 main", "s"),
+        ("import_rss_mb", "导入后内存", "MB"),
+        ("first_ydl_seconds", "首次创建yt-dlp实例", "s"),
+        ("first_lookup_seconds", "首次查找提取器", "s"),
+        ("all_lookups_seconds", f"查找{len(SAMPLE_URLS)}个平台的提取器", "s"),
+        ("after_lookup_rss_mb", "查找后内存", "MB"),
+        ("live_seconds", "启动到存活", "s"),
+        ("ready_seconds", "启动到就绪", "s"),
+        ("ready_rss_mb", "就绪后进程内存", "MB"),
+    ]:
+        print(f"  {label:<20}{result[key]:>10.3f} {unit}")
+    return result
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="启动基准测试")
+    parser.add_argument("--root", default=".", help="代码目录（包含 main.py 的 Back 目录）")
+    parser.add_argument("--runs", type=int, default=3, help="测量次数")
+    parser.add_argument("--preload", default=None, help="YTDLP_PRELOAD环境变量（lazy 或 import）")
+    args = parser.parse_args()
+    run(args.root, args.runs, args.preload)
+
+
+if __name__ == "__main__":
+    main()
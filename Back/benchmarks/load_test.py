@@ -0,0 +1,502 @@
+# -*- coding: utf-8 -*-
+"""
+下载接口压测
+启动本地桩源站和使用桩提取器的服务进程（uvicorn），按指定并发请求 /api/download，
+统计每个场景的延迟分位数、吞吐量，以及服务进程（含工作池子进程）的CPU和内存占用，结果保存为JSON便于对比
+
+场景:
+- cache_hit: 同一链接反复下载（命中下载缓存）
+- cold_download: 每个请求都是新视频（提取 + 下载MP4单文件）
+- hls: 每个请求都是新的HLS视频（按分片下载）
+- transcode: 每个请求都是需要重新编码的MKV视频（请求去水印，需要FFmpeg，没有时跳过）
+- batch: 批量下载接口，每批包含 --batch-size 个新视频
+
+运行方式（在Back目录下，不需要外网）:
+    python -m benchmarks.load_test --requests 200 --concurrency 16
+    python -m benchmarks.load_test --scenarios cache_hit,cold_download --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform as platform_module
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from benchmarks.stub_origin import PLATFORM_LATENCY, StubOrigin
+
+# 所有场景
+SCENARIOS = ("cache_hit", "cold_download", "hls", "transcode", "batch")
+
+# 对比时关注的指标：(名称, 越大越好)
+COMPARED = (("p50_ms", False), ("p95_ms", False), ("p99_ms", False), ("rps", True), ("bytes_per_second", True))
+
+# 服务进程资源采样间隔（秒）
+SAMPLE_INTERVAL = 0.2
+
+BACK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    计算分位数（最近秩法）
+
+    参数:
+    - values: 已排序的数值
+    - q: 分位（0~100）
+
+    返回:
+    - 分位数，没有数据时为0
+    """
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, math.ceil(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+def free_port() -> int:
+    """获取一个空闲端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ProcessTreeMonitor:
+    """
+    进程树资源采样类
+    通过 /proc 统计服务进程及其所有子进程（工作池、FFmpeg）的CPU时间和常驻内存，不支持 /proc 的平台上不统计
+    """
+
+    def __init__(self, pid: int):
+        """
+        初始化采样
+
+        参数:
+        - pid: 服务进程ID
+        """
+        self.pid = pid
+        self.available = os.path.isdir(f"/proc/{pid}")
+        self._ticks = os.sysconf("SC_CLK_TCK") if self.available else 100
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if self.available else 4096
+
+    @staticmethod
+    def _stat(pid: int) -> Optional[List[str]]:
+        """读取 /proc/<pid>/stat（进程名之后的字段）"""
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                data = f.read()
+        except OSError:
+            return None
+        return data[data.rindex(")") + 2:].split()
+
+    def _tree(self) -> List[List[str]]:
+        """服务进程及其所有子孙进程的stat字段"""
+        parents: Dict[int, List[Tuple[int, List[str]]]] = {}
+        for name in os.listdir("/proc"):
+            if name.isdigit():
+                fields = self._stat(int(name))
+                if fields:
+                    parents.setdefault(int(fields[1]), []).append((int(name), fields))
+        root = self._stat(self.pid)
+        if root is None:
+            return []
+        tree, pending = [root], [self.pid]
+        while pending:
+            for pid, fields in parents.get(pending.pop(), []):
+                tree.append(fields)
+                pending.append(pid)
+        return tree
+
+    def sample(self) -> Tuple[Optional[float], Optional[int]]:
+        """
+        采样一次
+
+        返回:
+        - (累计CPU秒数（含已回收的子进程）, 常驻内存字节数)
+        """
+        if not self.available:
+            return None, None
+        cpu, rss = 0.0, 0
+        for fields in self._tree():
+            # 字段序号（从state开始计为0）：utime=11 stime=12 cutime=13 cstime=14 rss=21
+            cpu += sum(int(fields[i]) for i in (11, 12, 13, 14)) / self._ticks
+            rss += int(fields[21]) * self._page_size
+        return cpu, rss
+
+
+class LoadTest:
+    """
+    压测类
+    """
+
+    def __init__(self, server_url: str, origin_url: str, monitor: ProcessTreeMonitor, concurrency: int,
+                 platform: str, fetch: bool, batch_size: int, run_id: str):
+        """
+        初始化压测
+
+        参数:
+        - server_url: 服务地址
+        - origin_url: 桩源站地址
+        - monitor: 服务进程资源采样
+        - concurrency: 并发请求数
+        - platform: 模拟的平台（决定源站延迟）
+        - fetch: 是否同时下载返回的视频文件
+        - batch_size: 批量场景每批的视频数
+        - run_id: 本次运行的标识（保证视频ID不与其他运行重复）
+        """
+        self.server_url = server_url
+        self.origin_url = origin_url
+        self.monitor = monitor
+        self.concurrency = concurrency
+        self.platform = platform
+        self.fetch = fetch
+        self.batch_size = batch_size
+        self.run_id = run_id
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def video_url(self, video_id: str) -> str:
+        """桩源站视频页面地址"""
+        return f"{self.origin_url}/{self.platform}/{video_id}"
+
+    async def download(self, video_id: str, remove_watermark: bool = False) -> int:
+        """
+        请求下载接口，按需下载返回的视频文件
+
+        参数:
+        - video_id: 视频ID
+        - remove_watermark: 是否去除水印（只有去水印的请求才会重新编码）
+
+        返回:
+        - 视频字节数
+        """
+        async with self.session.post(f"{self.server_url}/api/download",
+                                     json={"url": self.video_url(video_id),
+                                           "remove_watermark": remove_watermark}) as response:
+            body = await response.json()
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}: {body.get('detail')}")
+        if not self.fetch:
+            return body.get("file_size") or 0
+        received = 0
+        async with self.session.get(body["video_url"]) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(256 * 1024):
+                received += len(chunk)
+        return received
+
+    async def batch(self, index: int) -> int:
+        """
+        请求批量下载接口
+
+        参数:
+        - index: 批次序号
+
+        返回:
+        - 所有项的视频字节数
+        """
+        items = [{"url": self.video_url(f"batch-{self.run_id}-{index}-{i}")} for i in range(self.batch_size)]
+        total, failed = 0, 0
+        async with self.session.post(f"{self.server_url}/api/download/batch", json={"items": items}) as response:
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                if result["success"]:
+                    total += result["result"].get("file_size") or 0
+                else:
+                    failed += 1
+        if failed:
+            raise RuntimeError(f"{failed} 项失败")
+        return total
+
+    async def drive(self, requests: int, call: Callable[[int], Awaitable[int]]) -> Dict[str, Any]:
+        """
+        按并发上限执行请求并统计结果
+
+        参数:
+        - requests: 请求数
+        - call: 执行第i个请求，返回字节数
+
+        返回:
+        - 场景结果
+        """
+        latencies: List[float] = []
+        errors: Dict[str, int] = {}
+        total_bytes = 0
+        counter = iter(range(requests))
+
+        async def worker():
+            nonlocal total_bytes
+            for index in counter:
+                started = time.perf_counter()
+                try:
+                    received = await call(index)
+                    latencies.append(time.perf_counter() - started)
+                    total_bytes += received
+                except Exception as e:
+                    key = str(e)[:80]
+                    errors[key] = errors.get(key, 0) + 1
+
+        peak_rss = 0
+
+        async def sampler():
+            nonlocal peak_rss
+            while True:
+                _, rss = self.monitor.sample()
+                peak_rss = max(peak_rss, rss or 0)
+                await asyncio.sleep(SAMPLE_INTERVAL)
+
+        sampling = asyncio.create_task(sampler())
+        cpu_before, _ = self.monitor.sample()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        wall = time.perf_counter() - started
+        cpu_after, rss = self.monitor.sample()
+        sampling.cancel()
+
+        latencies.sort()
+        result = {
+            "requests": requests,
+            "succeeded": len(latencies),
+            "errors": errors,
+            "concurrency": self.concurrency,
+            "wall_seconds": round(wall, 3),
+            "rps": round(len(latencies) / wall, 2) if wall else 0.0,
+            "bytes": total_bytes,
+            "bytes_per_second": round(total_bytes / wall) if wall else 0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+        }
+        if cpu_before is not None:
+            cpu = cpu_after - cpu_before
+            result.update({
+                "server_cpu_seconds": round(cpu, 2),
+                "server_cpu_percent": round(cpu / wall * 100, 1) if wall else 0.0,
+                "server_rss_mb": round(rss / 1048576, 1),
+                "server_rss_peak_mb": round(max(peak_rss, rss) / 1048576, 1),
+            })
+        return result
+
+    async def run(self, scenario: str, requests: int) -> Dict[str, Any]:
+        """
+        执行一个场景
+
+        参数:
+        - scenario: 场景名称
+        - requests: 请求数（批量场景为批次数）
+
+        返回:
+        - 场景结果
+        """
+        if scenario == "cache_hit":
+            # 预热：先下载一次，之后的请求都命中缓存
+            await self.download(f"hit-{self.run_id}")
+            return await self.drive(requests, lambda i: self.download(f"hit-{self.run_id}"))
+        if scenario == "cold_download":
+            return await self.drive(requests, lambda i: self.download(f"cold-{self.run_id}-{i}"))
+        if scenario == "hls":
+            return await self.drive(requests, lambda i: self.download(f"hls-{self.run_id}-{i}"))
+        if scenario == "transcode":
+            return await self.drive(requests, lambda i: self.download(f"tc-{self.run_id}-{i}", remove_watermark=True))
+        if scenario == "batch":
+            result = await self.drive(requests, self.batch)
+            result["batch_size"] = self.batch_size
+            result["items_per_second"] = round(result["rps"] * self.batch_size, 2)
+            return result
+        raise ValueError(f"未知场景: {scenario}")
+
+
+def start_server(port: int, workers: int, download_dir: str, log_file) -> subprocess.Popen:
+    """
+    启动使用桩提取器的服务进程
+
+    参数:
+    - port: 监听端口
+    - workers: uvicorn工作进程数
+    - download_dir: 下载目录
+    - log_file: 服务日志文件（服务的INFO日志不打印到终端）
+
+    返回:
+    - 服务进程
+    """
+    env = dict(os.environ, DOWNLOAD_DIR=download_dir)
+    command = [sys.executable, "-m", "uvicorn", "benchmarks.stub_app:app", "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning", "--no-access-log"]
+    if workers > 1:
+        command += ["--workers", str(workers)]
+    return subprocess.Popen(command, cwd=BACK_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60):
+    """
+    等待服务就绪（预热完成）
+
+    参数:
+    - url: 服务地址
+    - process: 服务进程
+    - timeout: 最长等待时间（秒）
+    """
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"服务进程已退出: {process.returncode}")
+            try:
+                async with session.get(f"{url}/health/ready") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("等待服务启动超时")
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]):
+    """
+    打印与基线结果的对比
+
+    参数:
+    - current: 本次结果
+    - baseline: 基线结果
+    """
+    print(f"\n与基线对比（{baseline['meta'].get('started_at')}）:")
+    print(f"{'场景':<16}{'指标':<20}{'基线':>14}{'本次':>14}{'变化':>10}")
+    for scenario, result in current["scenarios"].items():
+        base = baseline["scenarios"].get(scenario)
+        if not base or "skipped" in result or "skipped" in base:
+            continue
+        for name, higher_is_better in COMPARED:
+            old, new = base.get(name), result.get(name)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = change < 0 if higher_is_better else change > 0
+            flag = " !" if worse and abs(change) >= 10 else ""
+            print(f"{scenario:<16}{name:<20}{old:>14}{new:>14}{change:>+9.1f}%{flag}")
+
+
+def print_result(scenario: str, result: Dict[str, Any]):
+    """打印单个场景结果"""
+    if "skipped" in result:
+        print(f"{scenario:<16}跳过: {result['skipped']}")
+        return
+    cpu = f"{result['server_cpu_percent']:>7.0f}%" if "server_cpu_percent" in result else f"{'-':>8}"
+    rss = f"{result['server_rss_peak_mb']:>9.0f}" if "server_rss_peak_mb" in result else f"{'-':>9}"
+    print(f"{scenario:<16}{result['succeeded']:>6}/{result['requests']:<6}{result['p50_ms']:>9.0f}"
+          f"{result['p95_ms']:>9.0f}{result['p99_ms']:>9.0f}{result['rps']:>9.1f}"
+          f"{result['bytes_per_second'] / 1048576:>9.1f}{cpu}{rss}")
+    for error, count in result["errors"].items():
+        print(f"{'':<16}错误 x{count}: {error}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    启动源站和服务并依次执行场景
+
+    参数:
+    - args: 命令行参数
+
+    返回:
+    - 全部结果
+    """
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    for name in scenarios:
+        if name not in SCENARIOS:
+            raise SystemExit(f"未知场景: {name}（可选: {', '.join(SCENARIOS)}）")
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform_module.python_version(),
+            "machine": platform_module.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "env": {key: value for key, value in os.environ.items()
+                    if key.startswith(("DOWNLOAD_", "ADMISSION_", "POSTPROCESS_", "HTTP_POOL_", "PLATFORM_"))},
+        },
+        "scenarios": {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir, open(args.server_log, "wb") as log_file, \
+            StubOrigin(media_size=args.media_size, hls_segments=args.hls_segments) as origin:
+        port = free_port()
+        server_url = f"http://127.0.0.1:{port}"
+        process = start_server(port, args.workers, os.path.join(workdir, "downloads"), log_file)
+        try:
+            await wait_ready(server_url, process)
+            timeout = aiohttp.ClientTimeout(total=args.timeout)
+            connector = aiohttp.TCPConnector(limit=args.concurrency * 2)
+            async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                test = LoadTest(server_url, origin.base_url, ProcessTreeMonitor(process.pid), args.concurrency,
+                                args.platform, not args.no_fetch, args.batch_size, str(int(time.time())))
+                test.session = session
+
+                print(f"{'场景':<16}{'成功/请求':<13}{'p50(ms)':>9}{'p95(ms)':>9}{'p99(ms)':>9}{'req/s':>9}"
+                      f"{'MB/s':>9}{'CPU':>8}{'RSS(MB)':>9}")
+                for scenario in scenarios:
+                    if scenario == "transcode" and shutil.which("ffmpeg") is None:
+                        result = {"skipped": "未找到FFmpeg"}
+                    else:
+                        requests = args.batches if scenario == "batch" else args.requests
+                        result = await test.run(scenario, requests)
+                    report["scenarios"][scenario] = result
+                    print_result(scenario, result)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return report
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="下载接口压测（本地桩源站，不需要外网）")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="逗号分隔的场景")
+    parser.add_argument("--requests", type=int, default=100, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发请求数")
+    parser.add_argument("--batches", type=int, default=10, help="批量场景的批次数")
+    parser.add_argument("--batch-size", type=int, default=10, help="批量场景每批的视频数")
+    parser.add_argument("--platform", default="douyin", choices=sorted(PLATFORM_LATENCY), help="模拟的平台延迟")
+    parser.add_argument("--media-size", type=int, default=2 * 1024 * 1024, help="合成视频大小（字节）")
+    parser.add_argument("--hls-segments", type=int, default=8, help="HLS视频的分片数")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn工作进程数")
+    parser.add_argument("--timeout", type=float, default=300, help="单个请求的超时时间（秒）")
+    parser.add_argument("--no-fetch", action="store_true", help="不下载返回的视频文件（只测下载接口）")
+    parser.add_argument("--output", default="load_results.json", help="结果JSON文件")
+    parser.add_argument("--compare", help="与之前保存的结果JSON对比")
+    parser.add_argument("--server-log", default="load_server.log", help="服务进程的日志文件")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run(args))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
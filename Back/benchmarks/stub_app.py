@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试用服务入口
+用桩提取器替换yt-dlp入口并注册本地桩源站平台，其余配置与 main.py 相同（同样读取环境变量）
+
+运行方式（在Back目录下，通常由 benchmarks.load_test 启动）:
+    uvicorn benchmarks.stub_app:app --port 8100
+"""
+
+import yt_dlp
+
+from app.platforms import Platform
+from benchmarks.stub_extractor import StubYoutubeDL
+
+# 使用桩提取器替换yt-dlp入口（下载器在首次创建实例时才从yt_dlp模块读取）
+yt_dlp.YoutubeDL = StubYoutubeDL
+
+import main  # noqa: E402
+
+# 本地桩源站平台：不限速，允许重新编码（转码场景），并发上限足够大以免限制压测
+main.video_downloader.platforms.register(
+    Platform("stub", "本地桩源站", ["127.0.0.1", "localhost"], max_concurrency=64, transcode="convert", rate_limit=0)
+)
+
+app = main.app
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+桩提取器
+匹配本地桩源站的视频页面，行为与真实平台提取器相同：请求页面、调用元数据API、返回媒体地址。
+视频ID以 hls- 开头时返回HLS分片格式，以 tc- 开头时返回需要转码的MKV格式，其余返回MP4单文件
+"""
+
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class StubPlatformIE(InfoExtractor):
+    """
+    本地桩源站提取器
+    """
+
+    IE_NAME = "stub"
+    _VALID_URL = r"https?://(?:127\.0\.0\.1|localhost):\d+/(?P<platform>[a-z]+)/(?P<id>[\w-]+)$"
+
+    def _real_extract(self, url):
+        platform, video_id = self._match_valid_url(url).group("platform", "id")
+        origin = url.split(f"/{platform}/")[0]
+
+        # 请求视频页面，从页面中找到元数据API
+        webpage = self._download_webpage(url, video_id)
+        api_path = self._search_regex(r'data-api="([^"]+)"', webpage, "api path")
+
+        # 调用元数据API获取媒体地址
+        meta = self._download_json(origin + api_path, video_id)
+        info = {
+            "id": video_id,
+            "title": meta["title"],
+            "duration": meta.get("duration"),
+        }
+        if video_id.startswith("hls-"):
+            info.update(url=meta["hls_url"], ext="mp4", protocol="m3u8_native", vcodec="h264", acodec="aac")
+        elif video_id.startswith("tc-"):
+            info.update(url=meta["transcode_url"], ext="mkv", vcodec="mp4v", acodec="mp2")
+        else:
+            info.update(url=meta["media_url"], ext="mp4", vcodec="h264", acodec="aac")
+        return info
+
+
+class StubYoutubeDL(yt_dlp.YoutubeDL):
+    """
+    注册了桩提取器的YoutubeDL
+    桩提取器排在默认提取器之前，保证优先于通用提取器匹配
+    """
+
+    def __init__(self, params=None, auto_init=True):
+        super().__init__(params, auto_init=False)
+        self.add_info_extractor(StubPlatformIE())
+        if auto_init:
+            self.add_default_info_extractors()
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+本地桩源站
+模拟各平台的视频页面、元数据API和媒体文件（MP4单文件、HLS分片、需要转码的MKV），可配置每个平台的响应延迟
+"""
+
+import json
+import re
+import shutil
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+# 各平台模拟延迟（秒）：页面请求 + 元数据API请求，数值参考实际平台的典型提取耗时
+PLATFORM_LATENCY = {
+    "douyin": {"page": 0.25, "api": 0.20},
+    "kuaishou": {"page": 0.20, "api": 0.15},
+    "bilibili": {"page": 0.15, "api": 0.20},
+    "youtube": {"page": 0.30, "api": 0.35},
+    "weibo": {"page": 0.15, "api": 0.10},
+}
+
+# 默认媒体文件大小（字节）
+DEFAULT_MEDIA_SIZE = 2 * 1024 * 1024
+
+# 默认HLS分片数
+DEFAULT_HLS_SEGMENTS = 8
+
+# 需要转码的样例视频时长（秒）
+TRANSCODE_SAMPLE_SECONDS = 5
+
+
+def media_bytes(video_id: str, start: int, end: int) -> bytes:
+    """
+    生成确定性的合成媒体数据（相同视频ID的内容总是相同）
+
+    参数:
+    - video_id: 视频ID
+    - start: 起始字节（包含）
+    - end: 结束字节（不包含）
+
+    返回:
+    - 指定范围的字节数据
+    """
+    pattern = (video_id.encode("utf-8") + b"\x00") * 64
+    length = end - start
+    offset = start % len(pattern)
+    repeated = pattern * (length // len(pattern) + 2)
+    return repeated[offset:offset + length]
+
+
+def transcode_sample(seconds: int = TRANSCODE_SAMPLE_SECONDS) -> Optional[bytes]:
+    """
+    用FFmpeg生成一段无法直接封装为MP4的样例视频（MPEG-4 Part 2 + MP2音频的MKV）
+    合成数据无法被FFmpeg解码，转码场景需要真实的媒体文件
+
+    参数:
+    - seconds: 视频时长（秒）
+
+    返回:
+    - MKV文件内容，没有FFmpeg时返回None
+    """
+    if shutil.which("ffmpeg") is None:
+        return None
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin",
+        "-f", "lavfi", "-i", f"testsrc2=duration={seconds}:size=640x360:rate=25",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+        "-c:v", "mpeg4", "-q:v", "5", "-c:a", "mp2", "-shortest", "-f", "matroska", "pipe:1",
+    ]
+    result = subprocess.run(command, capture_output=True, check=True)
+    return result.stdout
+
+
+class StubOriginHandler(BaseHTTPRequestHandler):
+    """
+    桩源站请求处理类
+    路由：/<platform>/<id> 页面，/api/<platform>/<id> 元数据，/media/<id>.mp4 媒体文件，
+    /media/<id>.mkv 需要转码的样例视频，/hls/<id>/index.m3u8 HLS播放列表，/hls/<id>/<n>.ts HLS分片
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        """关闭访问日志"""
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+        """发送响应"""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        """处理HEAD请求"""
+        self.do_GET()
+
+    def do_GET(self):
+        """处理GET请求"""
+        origin = f"http://{self.headers.get('Host')}"
+
+        match = re.fullmatch(r"/media/([\w-]+)\.mp4", self.path)
+        if match:
+            self._serve_media(match.group(1))
+            return
+
+        match = re.fullmatch(r"/media/([\w-]+)\.mkv", self.path)
+        if match:
+            sample = self.server.transcode_sample()
+            if sample is None:
+                self._send(404, b"ffmpeg not available", "text/plain")
+            else:
+                self._serve_range(sample, "video/x-matroska")
+            return
+
+        match = re.fullmatch(r"/hls/([\w-]+)/index\.m3u8", self.path)
+        if match:
+            self._serve_playlist(match.group(1))
+            return
+
+        match = re.fullmatch(r"/hls/([\w-]+)/(\d+)\.ts", self.path)
+        if match:
+            video_id, index = match.group(1), int(match.group(2))
+            segment = self.server.media_size // self.server.hls_segments
+            if index >= self.server.hls_segments:
+                self._send(404, b"not found", "text/plain")
+            else:
+                self._send(200, media_bytes(video_id, index * segment, (index + 1) * segment), "video/mp2t")
+            return
+
+        match = re.fullmatch(r"/api/([a-z]+)/([\w-]+)", self.path)
+        if match and match.group(1) in PLATFORM_LATENCY:
+            platform, video_id = match.groups()
+            time.sleep(PLATFORM_LATENCY[platform]["api"])
+            body = json.dumps({
+                "id": video_id,
+                "title": f"{platform} stub video {video_id}",
+                "duration": 30.0,
+                "media_url": f"{origin}/media/{video_id}.mp4",
+                "hls_url": f"{origin}/hls/{video_id}/index.m3u8",
+                "transcode_url": f"{origin}/media/{video_id}.mkv",
+            }).encode("utf-8")
+            self._send(200, body, "application/json")
+            return
+
+        match = re.fullmatch(r"/([a-z]+)/([\w-]+)", self.path)
+        if match and match.group(1) in PLATFORM_LATENCY:
+            platform, video_id = match.groups()
+            time.sleep(PLATFORM_LATENCY[platform]["page"])
+            body = (f"<html><head><title>{platform} {video_id}</title></head>"
+                    f"<body data-api=\"/api/{platform}/{video_id}\"></body></html>").encode("utf-8")
+            self._send(200, body, "text/html; charset=utf-8")
+            return
+
+        self._send(404, b"not found", "text/plain")
+
+    def _serve_playlist(self, video_id: str):
+        """
+        返回HLS播放列表（每个分片时长相同）
+
+        参数:
+        - video_id: 视频ID
+        """
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for index in range(self.server.hls_segments):
+            lines += ["#EXTINF:4.0,", f"{index}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        self._send(200, ("\n".join(lines) + "\n").encode("utf-8"), "application/vnd.apple.mpegurl")
+
+    def _serve_media(self, video_id: str):
+        """
+        返回合成媒体数据，支持Range请求
+
+        参数:
+        - video_id: 视频ID
+        """
+        self._serve_range(None, "video/mp4", self.server.media_size, video_id)
+
+    def _serve_range(self, data: Optional[bytes], content_type: str, size: Optional[int] = None,
+                     video_id: Optional[str] = None):
+        """
+        按Range请求返回数据
+
+        参数:
+        - data: 完整数据，为None时按视频ID生成合成数据
+        - content_type: 内容类型
+        - size: 数据大小（data为None时使用）
+        - video_id: 视频ID（data为None时使用）
+        """
+        size = len(data) if data is not None else size
+        start, end = 0, size
+        status = 200
+        headers = {"Accept-Ranges": "bytes"}
+
+        range_header = self.headers.get("Range")
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header or "")
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)) + 1, size) if match.group(2) else size
+            else:
+                start = max(size - int(match.group(2)), 0)
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+
+        body = data[start:end] if data is not None else media_bytes(video_id, start, end)
+        self._send(status, body, content_type, headers)
+
+
+class StubOrigin:
+    """
+    桩源站类
+    在后台线程中运行本地HTTP服务器
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, media_size: int = DEFAULT_MEDIA_SIZE,
+                 hls_segments: int = DEFAULT_HLS_SEGMENTS):
+        """
+        初始化桩源站
+
+        参数:
+        - host: 监听地址
+        - port: 监听端口，0表示随机端口
+        - media_size: 媒体文件大小（字节），HLS视频的所有分片合计为该大小
+        - hls_segments: HLS分片数
+        """
+        self.server = ThreadingHTTPServer((host, port), StubOriginHandler)
+        self.server.daemon_threads = True
+        self.server.media_size = media_size
+        self.server.hls_segments = max(1, hls_segments)
+        self.server.transcode_sample = self._transcode_sample
+        self._sample: Optional[bytes] = None
+        self._sample_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _transcode_sample(self) -> Optional[bytes]:
+        """首次请求时生成转码样例视频，之后复用"""
+        with self._sample_lock:
+            if self._sample is None:
+                self._sample = transcode_sample()
+            return self._sample
+
+    @property
+    def base_url(self) -> str:
+        """源站地址"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubOrigin":
+        """启动源站"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止源站"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -4,13 +4,44 @@
 提供视频下载和去水印功能的API接口
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 from app.video_downloader import VideoDownloader
-from app.models import DownloadRequest, DownloadResponse
+from app import metrics, profiling
+from app.admission import (DEFAULT_TENANT, AdmissionController, AdmissionRejected, parse_tenant_limits,
+                           priority_of)
+from app.worker_pool import WorkerPool
+from app.jobs import JobStore
+from app.batch import BatchRunner
+from app.file_server import FileRangeResponse
+from app.format_policy import normalize_quality
+from app.http_client import SharedHttpClient
+from app.extractors import preload_extractors
+from app.janitor import Janitor
+from app.journal import JournalRecovery
+from app.postprocess import PostProcessStage
+from app.profiling import Profiler
+from app.progress import ProgressChannel
+from app.resilience import CircuitOpenError, PlatformGuards
+from app.ttl_cache import TTLCache
+from app.storage import ShardedStorage
+from app.platforms import PlatformMatch
+from app.streaming import StreamingDownload, StreamingError, StreamResponse, is_streamable
+from app.projection import load_heavy_fields, parse_fields
+from app.range_download import ParallelDownloader
+from app.readiness import Readiness
+from app.models import (BatchDownloadRequest, BatchItemResult, DownloadRequest, DownloadResponse,
+                        JobSubmitResponse, JobStatusResponse, VideoInfoResponse)
+import asyncio
+import hmac
+import json
 import logging
+import os
+from contextlib import AsyncExitStack
+from typing import Any, Dict, Optional, Set, Union
 
 # 配置日志记录
 logging.basicConfig(level=logging.INFO)
@@ -34,8 +65,185 @@ app.add_middleware(
     allow_headers=["*"],  # 允许所有请求头
 )
 
+# 创建下载工作池（可通过环境变量配置）
+download_pool = WorkerPool(
+    "download",
+    max_workers=int(os.getenv("DOWNLOAD_POOL_WORKERS", "8")),  # 线程/进程数量
+    kind=os.getenv("DOWNLOAD_POOL_KIND", "thread"),  # thread 或 process
+    max_concurrency=int(os.getenv("DOWNLOAD_POOL_CONCURRENCY", "0")) or None  # 并发上限
+)
+
+# 创建FFmpeg后处理阶段（CPU密集型，独立的进程池和队列，默认进程数等于CPU核数）
+postprocess_pool = WorkerPool(
+    "postprocess",
+    max_workers=int(os.getenv("POSTPROCESS_WORKERS", "0")) or os.cpu_count() or 1,  # 进程数量
+    kind="process"
+)
+postprocess_stage = PostProcessStage(
+    postprocess_pool,
+    threads=int(os.getenv("POSTPROCESS_THREADS", "0")),  # 每个编码任务的线程数（0为按核数平均分配）
+    nice=int(os.getenv("POSTPROCESS_NICE", "10"))  # ffmpeg进程优先级调整值
+)
+
+# 创建共享的异步HTTP客户端（长连接，限制每个主机的连接数）
+http_client = SharedHttpClient(
+    limit=int(os.getenv("HTTP_POOL_LIMIT", "200")),  # 总连接数上限
+    limit_per_host=int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "16"))  # 每个主机的连接数上限
+)
+
+# 创建短链接解析结果缓存（LRU+TTL）
+link_cache = TTLCache(
+    max_size=int(os.getenv("SHORT_LINK_CACHE_SIZE", "10000")),  # 最多缓存的短链接数
+    ttl_seconds=int(os.getenv("SHORT_LINK_CACHE_TTL", "3600"))  # 解析结果有效期（秒）
+)
+
+# 创建视频信息缓存（预览接口提取的信息供之后的下载复用，媒体地址会过期，有效期不宜过长）
+info_cache = TTLCache(
+    max_size=int(os.getenv("INFO_CACHE_SIZE", "1000")),  # 最多缓存的视频信息数
+    ttl_seconds=int(os.getenv("INFO_CACHE_TTL", "300"))  # 视频信息有效期（秒）
+)
+
+# 创建平台保护（每个平台的限速和并发上限见平台配置）
+platform_guards = PlatformGuards(
+    failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),  # 触发熔断的连续失败次数
+    reset_timeout=float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30")),  # 熔断冷却时间（秒）
+    target_latency=float(os.getenv("PLATFORM_TARGET_LATENCY", "15"))  # 提取信息的目标延迟（秒），超过时降低并发
+)
+
+# 创建下载文件存储（按文件名前缀分片，写入后按fsync策略刷盘）
+storage = ShardedStorage(
+    os.getenv("DOWNLOAD_DIR", "downloads"),  # 下载文件存储根目录
+    fsync=os.getenv("DOWNLOAD_FSYNC", "file")  # fsync策略：none、file、full
+)
+
+# 创建并行下载（大文件分段多连接下载、HLS/DASH分片并发下载；进程池模式下连接上限按进程计算）
+parallel_downloader = ParallelDownloader(
+    connections=int(os.getenv("DOWNLOAD_CONNECTIONS", "4")),  # 单个下载最多使用的连接数，1表示关闭并行下载
+    max_connections=int(os.getenv("DOWNLOAD_MAX_CONNECTIONS", "32")),  # 所有下载同时使用的连接数上限
+    chunk_size=int(os.getenv("DOWNLOAD_RANGE_CHUNK_SIZE", str(8 * 1024 * 1024))),  # 分段大小（字节）
+    min_size=int(os.getenv("DOWNLOAD_RANGE_MIN_SIZE", str(16 * 1024 * 1024))),  # 分段下载的最小文件大小（字节）
+    retries=int(os.getenv("DOWNLOAD_RANGE_RETRIES", "5"))  # 单个分段的重试次数
+)
+
 # 创建视频下载器实例
-video_downloader = VideoDownloader()
+video_downloader = VideoDownloader(worker_pool=download_pool, http_client=http_client, link_cache=link_cache,
+                                   postprocessor=postprocess_stage, guards=platform_guards, storage=storage,
+                                   info_cache=info_cache, parallel=parallel_downloader,
+                                   http_chunk_size=int(os.getenv("DOWNLOAD_HTTP_CHUNK_SIZE", str(10 * 1024 * 1024))),
+                                   fragment_retries=int(os.getenv("DOWNLOAD_FRAGMENT_RETRIES", "10")))
+
+# yt-dlp加载方式：lazy（首次使用时导入，启动后在后台预热，预热完成前就绪检查返回未就绪）、
+# import（导入本模块时加载，配合 gunicorn --preload 在fork工作进程之前加载，各进程以写时复制方式共享）
+YTDLP_PRELOAD = os.getenv("YTDLP_PRELOAD", "lazy")
+if YTDLP_PRELOAD == "import":
+    preload_extractors(video_downloader.extractors.ie_keys())
+
+# 就绪状态（存活检查只表示进程能响应，就绪检查在预热完成后才通过）
+readiness = Readiness()
+
+# 创建后台清理任务（按缓存索引清理过期文件并控制磁盘占用）
+janitor = Janitor(
+    video_downloader.cache,
+    max_age_seconds=float(os.getenv("JANITOR_MAX_AGE_HOURS", "24")) * 3600,  # 未被访问的最长保留时间
+    max_bytes=int(os.getenv("JANITOR_MAX_BYTES", "0")),  # 视频文件总大小预算（0为不限）
+    batch_size=int(os.getenv("JANITOR_BATCH_SIZE", "200")),  # 每批处理的条目数
+    interval=float(os.getenv("JANITOR_INTERVAL", "300"))  # 清理间隔（秒）
+)
+
+# 监控指标配置（队列深度和执行数的采样间隔）
+METRICS_SAMPLE_INTERVAL = float(os.getenv("METRICS_SAMPLE_INTERVAL", "2"))
+metrics_sampler: Optional[asyncio.Task] = None
+
+# 文件服务配置
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL")  # 对外访问地址，未设置时使用请求地址
+FILES_ACCEL_PREFIX = os.getenv("FILES_ACCEL_PREFIX")  # nginx内部location前缀，设置后由nginx发送文件
+
+# 创建准入控制（限制同时执行的下载数，超出的请求按优先级排队，队列满或超时时快速拒绝）
+admission = AdmissionController(
+    max_active=int(os.getenv("ADMISSION_MAX_ACTIVE", "16")),  # 同时执行的下载数上限
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),  # 排队的请求数上限
+    max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "20")),  # 同步请求的最长排队时间（秒）
+    tenant_limits=parse_tenant_limits(os.getenv("ADMISSION_TENANTS")),  # 租户配额，如 miniapp=32,partner=4
+    default_tenant_limit=int(os.getenv("ADMISSION_DEFAULT_TENANT_LIMIT", "0"))  # 未配置租户的配额（0为不限）
+)
+TENANT_HEADER = "X-Tenant"  # 标识租户的请求头
+
+# 管理接口令牌（设置后访问管理接口、通过请求头开启剖析都需要提供该令牌）
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") or None
+ADMIN_TOKEN_HEADER = "X-Admin-Token"  # 携带管理令牌的请求头
+
+# 创建请求剖析（按请求头或采样率开启，只保留最慢的若干个剖析结果）
+profiler = Profiler(
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),  # 随机剖析的请求比例（0为只按请求头开启）
+    keep=int(os.getenv("PROFILE_KEEP", "20")),  # 保留的最慢请求数
+    clock=os.getenv("PROFILE_CLOCK", "wall"),  # cProfile时钟：wall（墙钟）或 cpu（线程CPU时间）
+    header_token=ADMIN_TOKEN  # 设置了管理令牌时，请求头的值必须等于该令牌
+)
+PROFILE_HEADER = "X-Debug-Profile"  # 开启剖析的请求头
+
+# 批量下载配置（所有批次共享的整体并发上限，单个平台的上限见平台配置）
+batch_runner = BatchRunner(max_concurrency=int(os.getenv("BATCH_CONCURRENCY", "8")))
+
+# 创建异步任务存储（可通过环境变量配置）
+job_store = JobStore(
+    ttl_seconds=int(os.getenv("JOB_TTL_SECONDS", "3600")),  # 任务结果保留时间
+    max_jobs=int(os.getenv("JOB_MAX_JOBS", "10000")),  # 最多保存的任务数
+    max_running=int(os.getenv("JOB_MAX_RUNNING", "16"))  # 同时执行的任务上限
+)
+
+# 创建下载恢复任务（接管重启前或已退出的工作进程留下的未完成下载，从 .part 文件继续）
+recovery = JournalRecovery(
+    video_downloader.journal,
+    video_downloader.cache,
+    resume=lambda entry: resume_download(entry),
+    interval=float(os.getenv("JOURNAL_INTERVAL", "5")),  # 心跳和接管的间隔（秒）
+    stale_after=float(os.getenv("JOURNAL_STALE_AFTER", "15")),  # 心跳超过该时间未更新的进程视为已退出（秒）
+    max_attempts=int(os.getenv("JOURNAL_MAX_ATTEMPTS", "3")),  # 单个下载最多恢复次数
+    max_age=float(os.getenv("JOURNAL_MAX_AGE_HOURS", "24")) * 3600,  # 创建超过该时间的下载不再恢复
+    failed_ttl=float(os.getenv("JOURNAL_FAILED_TTL", "3600"))  # 失败下载的部分文件保留时间（秒）
+)
+
+@app.on_event("startup")
+async def startup_event():
+    """
+    服务启动时开始预热、后台清理、下载恢复和监控指标采样
+    """
+    global metrics_sampler
+    # 进程池模式下先创建工作进程：预热线程导入模块时fork，子进程会继承被持有的导入锁而卡住
+    download_pool.start()
+    postprocess_pool.start()
+    # 在后台加载yt-dlp和支持平台的提取器
+    readiness.start("ytdlp", lambda: preload_extractors(video_downloader.extractors.ie_keys()))
+    janitor.start()
+    recovery.start()
+    metrics_sampler = asyncio.ensure_future(sample_metrics())
+
+async def sample_metrics():
+    """
+    定期把本进程的队列深度和执行数写入监控指标（多进程模式下按进程汇总）
+    """
+    while True:
+        metrics.update_pool_gauges({
+            "download": download_pool.stats(),
+            "postprocess": postprocess_pool.stats(),
+            "admission": admission.stats(),
+        })
+        await asyncio.sleep(METRICS_SAMPLE_INTERVAL)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    服务关闭时停止后台任务，释放工作池和HTTP连接资源
+    """
+    readiness.drain()
+    if metrics_sampler is not None:
+        metrics_sampler.cancel()
+    metrics.mark_process_dead()
+    await janitor.stop()
+    await recovery.stop()
+    await http_client.close()
+    download_pool.shutdown(wait=False)
+    postprocess_pool.shutdown(wait=False)
 
 @app.get("/")
 async def root():
@@ -48,42 +256,261 @@ async def root():
 @app.get("/health")
 async def health_check():
     """
-    健康检查接口
+    健康检查接口（存活检查，兼容旧地址）
     用于监控服务是否正常运行
     """
     return {"status": "healthy", "service": "video-downloader"}
 
+@app.get("/health/live")
+async def liveness_check():
+    """
+    存活检查接口
+    进程能响应请求即返回200，不检查预热状态（存活检查失败时进程会被重启，不应受预热耗时影响）
+    """
+    return {"status": "alive", "service": "video-downloader"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    就绪检查接口
+    预热（加载yt-dlp和支持平台的提取器）完成后返回200，预热中、预热失败或正在关闭时返回503，
+    负载均衡器据此决定是否转发请求
+    """
+    status = readiness.status()
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=status)
+
+def tenant_of(http_request: Request) -> str:
+    """
+    获取请求所属租户
+    
+    参数:
+    - http_request: HTTP请求
+    
+    返回:
+    - 租户名称，未指定时为默认租户
+    """
+    return http_request.headers.get(TENANT_HEADER) or DEFAULT_TENANT
+
+def profile_reason(http_request: Request) -> Optional[str]:
+    """
+    判断请求是否开启剖析
+    
+    参数:
+    - http_request: HTTP请求
+    
+    返回:
+    - 开启原因（header 或 sample），不开启时为None
+    """
+    return profiler.should_profile(http_request.headers.get(PROFILE_HEADER))
+
+def require_admin(http_request: Request):
+    """
+    校验管理令牌（未配置管理令牌时不校验）
+    
+    参数:
+    - http_request: HTTP请求
+    """
+    if ADMIN_TOKEN is None:
+        return
+    token = http_request.headers.get(ADMIN_TOKEN_HEADER) or ""
+    if not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="需要管理令牌")
+
+def retry_later_error(status_code: int, error: Exception, retry_after: float) -> HTTPException:
+    """
+    需要客户端稍后重试的错误响应（通过Retry-After告知重试时间）
+    
+    参数:
+    - status_code: HTTP状态码（429或503）
+    - error: 异常
+    - retry_after: 建议的重试等待时间（秒）
+    
+    返回:
+    - HTTP异常
+    """
+    return HTTPException(
+        status_code=status_code,
+        detail=f"下载失败: {str(error)}",
+        headers={"Retry-After": str(int(retry_after) + 1)}
+    )
+
+def file_url(base_url: str, filename: str) -> str:
+    """
+    生成已下载文件的访问地址
+    
+    参数:
+    - base_url: 请求的基础地址
+    - filename: 文件名
+    
+    返回:
+    - 文件访问URL
+    """
+    return f"{(PUBLIC_BASE_URL or base_url).rstrip('/')}/api/files/{filename}"
+
+async def run_download(request: DownloadRequest, base_url: str, fields: Optional[Set[str]] = None,
+                       progress: Optional[ProgressChannel] = None, tenant: str = DEFAULT_TENANT,
+                       max_wait: Optional[float] = -1, profile: Optional[str] = None,
+                       accepted: bool = False) -> Union[DownloadResponse, Dict[str, Any]]:
+    """
+    执行下载并构建响应（同步接口、批量下载和异步任务共用）
+    命中缓存的请求直接返回，其余请求经过准入控制，短视频平台优先执行
+    
+    参数:
+    - request: 下载请求对象
+    - base_url: 请求的基础地址（用于生成文件访问地址）
+    - fields: 需要返回的字段，None表示返回默认的DownloadResponse
+    - progress: 接收下载进度的通道（异步任务使用）
+    - tenant: 租户
+    - max_wait: 最长排队时间（秒），-1表示使用默认值，None表示不限（异步任务）
+    - profile: 剖析开启原因，None表示不剖析
+    - accepted: 请求是否已在接收时通过准入检查（异步任务、批量下载），是则执行时只排队、不再因繁忙被拒绝
+    
+    返回:
+    - 下载结果响应，指定fields时只包含这些字段
+    """
+    url = str(request.url)
+    if profile is not None:
+        # 在剖析会话中执行，结束后按耗时决定是否保留剖析结果
+        with profiler.activate(url, profile):
+            return await run_download(request, base_url, fields, progress, tenant, max_wait, accepted=accepted)
+    
+    # 平台识别、短链接解析和链接别名查询只做一次，结果交给下载流程
+    with profiling.span("resolve"):
+        resolved = await video_downloader.resolve(url)
+        match = resolved[1]
+        entry = None
+        if match is not None:
+            entry = await video_downloader.lookup_cached(resolved[0], request.remove_watermark, request.quality)
+    
+    download = lambda: video_downloader.download_video(
+        url=url,
+        remove_watermark=request.remove_watermark,
+        quality=request.quality,
+        progress=progress,
+        resolved=resolved,
+        entry=entry
+    )
+    
+    if match is None or entry is not None:
+        # 命中缓存（或链接无效）时不占用下载名额
+        result = await download()
+    else:
+        # 已知时长（预览过的链接）时按实际时长排优先级，否则按平台
+        priority = priority_of(match.platform.short_form, video_downloader.known_duration(resolved[0]))
+        async with admission.admit(priority, tenant, max_wait, check=not accepted):
+            result = await download()
+    
+    # 下载成功时平台一定已识别（沿用解析得到的平台配置，不再按名称查找）
+    with metrics.timed(metrics.STAGE_SERIALIZE, match.platform.key), profiling.span("serialize"):
+        response = DownloadResponse(
+            success=True,
+            message="下载成功",
+            video_url=file_url(base_url, result["filename"]),
+            filename=result.get("filename"),
+            file_size=result.get("file_size"),
+            duration=result.get("duration"),
+            thumbnail_url=result.get("thumbnail_url"),
+            platform=result.get("platform")
+        )
+        
+        if fields is None:
+            return response
+        return await project_response(response, result, fields)
+
+def resume_download(entry: Dict[str, Any]):
+    """
+    恢复下载日志中未完成的下载：作为异步任务重新提交（属于异步任务的沿用原任务ID，客户端可以继续查询），
+    yt-dlp从 .part 文件已下载的位置继续；原请求的地址已不可知，文件地址使用 PUBLIC_BASE_URL 或相对路径
+    
+    参数:
+    - entry: 下载日志记录
+    """
+    request = DownloadRequest(url=entry["url"], remove_watermark=bool(entry["remove_watermark"]),
+                              quality=entry["quality"])
+    progress = ProgressChannel()
+    journal = video_downloader.journal
+    
+    async def run():
+        try:
+            result = await run_download(request, PUBLIC_BASE_URL or "/", progress=progress, max_wait=None,
+                                        accepted=True)
+        except Exception as e:
+            await run_in_threadpool(journal.fail, entry["url_key"], str(e))
+            raise
+        # 命中缓存时下载器不经过日志，由这里删除记录
+        await run_in_threadpool(journal.finish, entry["url_key"])
+        return result
+    
+    try:
+        job_store.submit(run, payload=request.model_dump(mode="json"), progress=progress, job_id=entry["job_id"])
+    except RuntimeError as e:
+        # 任务数量达到上限，按失败处理（部分文件保留到失败下载的保留时间结束）
+        logger.error(f"恢复下载失败: {entry['url']}, {str(e)}")
+        journal.fail(entry["url_key"], str(e))
+
+async def project_response(response: DownloadResponse, result: Dict[str, Any],
+                           fields: Set[str]) -> Dict[str, Any]:
+    """
+    按请求的字段构建精简响应
+    重量字段（格式列表、字幕等）只在被请求时才从 .info.json 读取
+    
+    参数:
+    - response: 默认下载响应
+    - result: 下载器返回的结果（轻量字段）
+    - fields: 需要返回的字段
+    
+    返回:
+    - 只包含请求字段的响应字典
+    """
+    file_path = video_downloader.file_path(result["filename"])
+    heavy = await run_in_threadpool(load_heavy_fields, file_path, fields)
+    base = response.model_dump(mode="json", include=fields)
+    
+    data = {"success": response.success, "message": response.message}
+    for name in sorted(fields):
+        if name in heavy:
+            data[name] = heavy[name]
+        elif name in base:
+            data[name] = base[name]
+        else:
+            data[name] = result.get(name)
+    return data
+
 @app.post("/api/download", response_model=DownloadResponse)
-async def download_video(request: DownloadRequest):
+async def download_video(request: DownloadRequest, http_request: Request,
+                         fields: Optional[str] = Query(default=None, description="逗号分隔的返回字段，如 title,duration,formats")):
     """
     视频下载接口
     
     参数:
     - request: 包含下载链接和选项的请求对象
+    - http_request: HTTP请求（用于生成文件访问地址）
+    - fields: 需要返回的字段（可选），未指定时返回DownloadResponse
     
     返回:
     - 下载结果信息，包括视频URL、文件名等
     """
+    try:
+        requested_fields = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
         # 记录请求日志
         logger.info(f"收到下载请求: {request.url}")
         
-        # 调用视频下载器处理请求
-        result = await video_downloader.download_video(
-            url=request.url,
-            remove_watermark=request.remove_watermark
-        )
-        
-        # 返回下载结果
-        return DownloadResponse(
-            success=True,
-            message="下载成功",
-            video_url=result.get("video_url"),
-            filename=result.get("filename"),
-            file_size=result.get("file_size"),
-            duration=result.get("duration")
-        )
+        # 调用视频下载器处理请求并返回结果
+        response = await run_download(request, str(http_request.base_url), requested_fields,
+                                      tenant=tenant_of(http_request), profile=profile_reason(http_request))
+        if requested_fields is not None:
+            return JSONResponse(response)
+        return response
         
+    except AdmissionRejected as e:
+        raise retry_later_error(e.status_code, e, e.retry_after)
+    except CircuitOpenError as e:
+        logger.warning(f"平台熔断，拒绝请求: {str(e)}")
+        raise retry_later_error(503, e, e.retry_after)
     except Exception as e:
         # 记录错误日志
         logger.error(f"下载失败: {str(e)}")
@@ -94,18 +521,401 @@ async def download_video(request: DownloadRequest):
             detail=f"下载失败: {str(e)}"
         )
 
+@app.get("/api/info", response_model=VideoInfoResponse)
+async def get_video_info(url: str):
+    """
+    视频预览接口
+    只提取视频信息（标题、缩略图、时长等）不下载；结果保存在信息缓存中，随后下载同一链接时不再重复提取
+    
+    参数:
+    - url: 视频链接
+    
+    返回:
+    - 视频预览信息
+    """
+    logger.info(f"收到预览请求: {url}")
+    try:
+        info = await video_downloader.preview(url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpenError as e:
+        logger.warning(f"平台熔断，拒绝请求: {str(e)}")
+        raise retry_later_error(503, e, e.retry_after)
+    except Exception as e:
+        logger.error(f"获取视频信息失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取视频信息失败: {str(e)}")
+    
+    return VideoInfoResponse(
+        success=True,
+        message="获取成功",
+        title=info.get("title"),
+        duration=info.get("duration"),
+        thumbnail_url=info.get("thumbnail_url"),
+        uploader=info.get("uploader"),
+        webpage_url=info.get("webpage_url"),
+        platform=info.get("platform"),
+        cached=info.get("cached", False)
+    )
+
+@app.post("/api/download/batch")
+async def download_batch(batch: BatchDownloadRequest, http_request: Request):
+    """
+    批量下载接口
+    所有项并发执行（受整体和单个平台的并发上限限制），每完成一项立即返回一行JSON（NDJSON），
+    无需等待最慢的一项；各项与其他请求一起经过准入控制（排队不限时）
+    
+    参数:
+    - batch: 下载请求列表
+    - http_request: HTTP请求（用于生成文件访问地址）
+    
+    返回:
+    - application/x-ndjson 响应，每行是一个BatchItemResult
+    """
+    base_url = str(http_request.base_url)
+    tenant = tenant_of(http_request)
+    logger.info(f"收到批量下载请求: {len(batch.items)} 项")
+    
+    # 服务繁忙时在开始返回结果前直接拒绝整批
+    try:
+        admission.check(tenant)
+    except AdmissionRejected as e:
+        raise retry_later_error(e.status_code, e, e.retry_after)
+    
+    async def download_item(index: int, item: DownloadRequest) -> Dict[str, Any]:
+        """下载单项，失败时返回错误信息而不是中断整批"""
+        try:
+            response = await run_download(item, base_url, tenant=tenant, max_wait=None,
+                                          profile=profile_reason(http_request), accepted=True)
+            line = BatchItemResult(index=index, url=str(item.url), success=True, result=response)
+        except Exception as e:
+            logger.error(f"批量下载第 {index} 项失败: {str(e)}")
+            line = BatchItemResult(index=index, url=str(item.url), success=False, error=str(e))
+        return line.model_dump(mode="json")
+    
+    def platform_of(item: DownloadRequest) -> Optional[str]:
+        """按平台分组（短链接与主域名属于同一平台）"""
+        match = video_downloader.detect(str(item.url))
+        return match.platform.key if match else None
+    
+    def platform_limit(key: str) -> int:
+        """平台的并发上限"""
+        return video_downloader.platforms.get(key).max_concurrency
+    
+    async def lines():
+        async for result in batch_runner.run(batch.items, download_item, platform_of, platform_limit):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/api/download/stream")
+async def stream_video(url: str, http_request: Request, quality: str = "best"):
+    """
+    流式下载接口（不去水印）
+    提取信息后直接透传上游媒体数据，边下载边返回，同时写入下载缓存
+    已缓存的视频直接返回文件；需要合并或分片下载的视频先完整下载再返回；
+    未缓存时与普通下载一样经过准入控制（名额保持到流结束），并与同一视频的普通下载合并
+    
+    参数:
+    - url: 视频链接
+    - quality: 视频质量
+    
+    返回:
+    - 视频数据流
+    """
+    logger.info(f"收到流式下载请求: {url}")
+    
+    try:
+        try:
+            quality = normalize_quality(quality)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        match = None
+        if url.startswith(('http://', 'https://')):
+            url, match = await video_downloader.resolve(url)
+        if match is None:
+            raise HTTPException(status_code=400, detail="无效或不支持的视频链接")
+        
+        # 已缓存的视频直接返回文件
+        entry = await video_downloader.lookup_cached(url, False, quality)
+        if entry is None:
+            entry = await stream_or_download(url, match, quality, tenant_of(http_request))
+            if isinstance(entry, StreamResponse):
+                return entry
+        
+        return FileRangeResponse(
+            entry["file_path"],
+            method=http_request.method,
+            request_headers=http_request.headers,
+            content_hash=entry["content_hash"],
+            accel_prefix=FILES_ACCEL_PREFIX,
+            accel_path=video_downloader.storage.relative(entry["file_path"])
+        )
+        
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise retry_later_error(e.status_code, e, e.retry_after)
+    except CircuitOpenError as e:
+        logger.warning(f"平台熔断，拒绝流式下载: {str(e)}")
+        raise retry_later_error(503, e, e.retry_after)
+    except StreamingError as e:
+        logger.error(f"流式下载失败: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"下载失败: {str(e)}")
+    except Exception as e:
+        logger.error(f"流式下载失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"下载失败: {str(e)}")
+
+async def stream_or_download(url: str, match: PlatformMatch, quality: str,
+                             tenant: str) -> Union[StreamResponse, Dict[str, Any]]:
+    """
+    流式下载接口未命中缓存时的处理：经过准入控制后透传上游数据；
+    同一视频已在下载（普通下载或另一个流）时加入该下载，普通下载也会加入正在进行的流，两者不会同时写同一个缓存文件
+    
+    参数:
+    - url: 视频链接（已解析）
+    - match: 平台识别结果
+    - quality: 视频质量（已规范化）
+    - tenant: 租户
+    
+    返回:
+    - 可以透传时返回流式响应（准入名额在响应结束后归还），否则返回下载完成后的缓存条目
+    """
+    key = video_downloader.flight_key(url, False, quality)
+    slot = AsyncExitStack()
+    priority = priority_of(match.platform.short_form, video_downloader.known_duration(url))
+    await slot.enter_async_context(admission.admit(priority, tenant))
+    handed_off = False
+    try:
+        if not video_downloader.singleflight.running(key):
+            info = await video_downloader.extract_info(url, quality, match.platform)
+            if is_streamable(info):
+                stream = StreamingDownload(video_downloader, url, info, quality, match.platform)
+                await stream.open()
+                _, created = video_downloader.singleflight.start(key, lambda: stream.completion)
+                if created:
+                    async def on_close():
+                        stream.close()
+                        await slot.aclose()
+                    
+                    headers = {}
+                    if stream.content_length is not None:
+                        headers["Content-Length"] = str(stream.content_length)
+                    handed_off = True
+                    return StreamResponse(stream.iter_chunks(), on_close, media_type=stream.content_type,
+                                          headers=headers)
+                # 提取期间同一视频的下载已经开始，放弃透传，等待该下载完成
+                stream.abandon()
+        
+        # 无法透传或已有同一视频的下载时，完整下载（或加入该下载）后返回文件
+        result = await video_downloader.download_video(url, False, quality, resolved=(url, match))
+        return await run_in_threadpool(video_downloader.cache.get_by_path,
+                                       video_downloader.file_path(result["filename"]))
+    finally:
+        if not handed_off:
+            await slot.aclose()
+
+@app.post("/api/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(request: DownloadRequest, http_request: Request):
+    """
+    提交异步下载任务
+    立即返回任务ID，客户端通过 GET /api/jobs/{job_id} 轮询结果，或通过 GET /api/jobs/{job_id}/events 订阅进度
+    
+    参数:
+    - request: 包含下载链接和选项的请求对象
+    - http_request: HTTP请求（用于生成文件访问地址）
+    
+    返回:
+    - 任务ID和初始状态
+    """
+    logger.info(f"收到下载任务: {request.url}")
+    base_url = str(http_request.base_url)
+    tenant = tenant_of(http_request)
+    profile = profile_reason(http_request)
+    
+    try:
+        # 服务繁忙时直接拒绝，不创建任务；已接收的任务排队不限时
+        admission.check(tenant)
+    except AdmissionRejected as e:
+        raise retry_later_error(e.status_code, e, e.retry_after)
+    
+    try:
+        progress = ProgressChannel()
+        job = job_store.submit(
+            lambda: run_download(request, base_url, progress=progress, tenant=tenant, max_wait=None,
+                                 profile=profile, accepted=True),
+            payload=request.model_dump(mode="json"),
+            progress=progress
+        )
+    except RuntimeError as e:
+        # 任务数量达到上限
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return JobSubmitResponse(job_id=job.id, status=job.status, created_at=job.created_at)
+
+@app.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """
+    查询下载任务状态
+    
+    参数:
+    - job_id: 任务ID
+    
+    返回:
+    - 任务状态，成功时包含下载结果，失败时包含错误信息
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    
+    return job_status(job)
+
+def job_status(job) -> JobStatusResponse:
+    """
+    构建任务状态响应
+    
+    参数:
+    - job: 任务对象
+    
+    返回:
+    - 任务状态响应
+    """
+    return JobStatusResponse(
+        job_id=job.id,
+        status=job.status,
+        result=job.result,
+        error=job.error,
+        progress=job.progress.latest,
+        created_at=job.created_at,
+        updated_at=job.updated_at
+    )
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    订阅下载任务进度（Server-Sent Events）
+    下载过程中推送 progress 事件（节流合并，默认每0.5秒最多一次，阶段变化立即推送），
+    任务结束时推送一个与任务状态同名的事件（succeeded/failed），数据为完整的任务状态
+    
+    参数:
+    - job_id: 任务ID
+    
+    返回:
+    - text/event-stream 响应
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    
+    async def events():
+        async for snapshot in job.progress.subscribe():
+            if snapshot is None:
+                # 心跳，防止代理因长时间无数据断开连接
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: progress\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+        
+        # 通道关闭后任务状态已更新
+        yield f"event: {job.status}\ndata: {job_status(job).model_dump_json()}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.api_route("/api/files/{filename}", methods=["GET", "HEAD"])
+async def serve_file(filename: str, http_request: Request):
+    """
+    已下载视频文件接口
+    支持Range断点续传（206）、ETag协商缓存（304）和基于内容哈希的长期缓存
+    
+    参数:
+    - filename: 文件名（下载接口返回的filename）
+    - http_request: HTTP请求
+    
+    返回:
+    - 文件内容
+    """
+    # 只允许访问下载目录下的文件
+    if filename != os.path.basename(filename) or filename.startswith('.'):
+        raise HTTPException(status_code=404, detail="文件不存在")
+    
+    # 只提供下载缓存中登记过的文件
+    file_path = video_downloader.file_path(filename)
+    entry = await run_in_threadpool(video_downloader.cache.get_by_path, file_path)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="文件不存在")
+    
+    return FileRangeResponse(
+        file_path,
+        method=http_request.method,
+        request_headers=http_request.headers,
+        content_hash=entry['content_hash'],
+        accel_prefix=FILES_ACCEL_PREFIX,
+        accel_path=video_downloader.storage.relative(filename)
+    )
+
 @app.get("/api/supported_platforms")
 async def get_supported_platforms():
     """
     获取支持的平台列表
     返回当前系统支持下载视频的平台信息
     """
-    platforms = [
-        "抖音", "快手", "微博", "B站", "YouTube", 
-        "Instagram", "TikTok", "小红书", "西瓜视频"
-    ]
+    platforms = video_downloader.platforms.names()
     return {"platforms": platforms}
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus监控指标
+    包括各阶段耗时直方图（按平台和结果）、缓存命中、返回字节数、队列深度和执行数
+    """
+    data, content_type = metrics.render()
+    return Response(content=data, media_type=content_type)
+
+@app.get("/api/admin/profiles")
+async def list_profiles(http_request: Request):
+    """
+    获取保留的请求剖析结果（从慢到快，不含cProfile报告）
+    配置了 ADMIN_TOKEN 时需要在 X-Admin-Token 请求头中提供
+    """
+    require_admin(http_request)
+    return {"profiler": profiler.stats(), "profiles": profiler.slowest()}
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, http_request: Request):
+    """
+    获取单个请求的完整剖析结果
+    包括各阶段耗时和工作池中提取、下载过程的cProfile报告
+    """
+    require_admin(http_request)
+    data = profiler.get(profile_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="剖析结果不存在或已被淘汰")
+    return data
+
+@app.get("/api/pool/stats")
+async def get_pool_stats():
+    """
+    获取下载工作池状态
+    返回队列深度、活跃任务数等统计信息
+    """
+    return {
+        "pools": [download_pool.stats(), postprocess_pool.stats()],
+        "admission": admission.stats(),
+        "jobs": job_store.stats(),
+        "singleflight": video_downloader.singleflight.stats(),
+        "short_links": video_downloader.resolver.stats(),
+        "info_cache": video_downloader.info_cache.stats(),
+        "extractors": video_downloader.extractors.stats(),
+        "parallel": parallel_downloader.stats(),
+        "postprocess": postprocess_stage.stats(),
+        "progress": video_downloader.progress_stats(),
+        "platforms": video_downloader.guards.stats(),
+        "cache": video_downloader.cache.stats(),
+        "janitor": janitor.stats(),
+        "journal": recovery.stats(),
+        "profiler": profiler.stats()
+    }
+
 if __name__ == "__main__":
     # 启动服务器
     uvicorn.run(
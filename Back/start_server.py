@@ -7,7 +7,9 @@
 
 import os
 import sys
+import shutil
 import subprocess
+import tempfile
 import argparse
 import logging
 from pathlib import Path
@@ -32,7 +34,8 @@ def check_dependencies():
         'fastapi',
         'uvicorn',
         'yt-dlp',
-        'pydantic'
+        'pydantic',
+        'prometheus_client'
     ]
     
     missing_packages = []
@@ -92,17 +95,36 @@ def start_server(host='0.0.0.0', port=8000, reload=True, workers=1):
     if reload:
         cmd.append('--reload')
     
+    env = os.environ.copy()
+    temp_metrics_dir = None
     if workers > 1:
+        # 多个工作进程共享 downloads/cache.db（SQLite WAL模式）中的下载缓存
         cmd.extend(['--workers', str(workers)])
+        
+        # 监控指标使用多进程模式：每个进程写入共享目录，/metrics 合并导出
+        if env.get('PROMETHEUS_MULTIPROC_DIR'):
+            # 使用指定的目录：只删除上次运行留下的指标文件，不动目录中的其他内容
+            metrics_dir = Path(env['PROMETHEUS_MULTIPROC_DIR'])
+            metrics_dir.mkdir(parents=True, exist_ok=True)
+            for path in metrics_dir.glob('*.db'):
+                path.unlink()
+        else:
+            # 未指定时创建本次运行专用的临时目录，服务退出后删除
+            metrics_dir = temp_metrics_dir = Path(tempfile.mkdtemp(prefix='dowproject-metrics-'))
+            env['PROMETHEUS_MULTIPROC_DIR'] = str(metrics_dir)
+        logger.info(f"监控指标多进程目录: {metrics_dir}")
     
     try:
         # 启动服务器
-        subprocess.run(cmd, check=True)
+        subprocess.run(cmd, check=True, env=env)
     except KeyboardInterrupt:
         logger.info("服务器已停止")
     except subprocess.CalledProcessError as e:
         logger.error(f"启动服务器失败: {e}")
         sys.exit(1)
+    finally:
+        if temp_metrics_dir is not None:
+            shutil.rmtree(temp_metrics_dir, ignore_errors=True)
 
 def main():
     """主函数"""
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+运维工具包
+下载目录迁移等一次性维护脚本
+"""
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+下载目录布局迁移工具
+把旧版本平铺在下载目录中的文件（<hash>.<ext> 及其 .info.json、缩略图）移动到分片子目录，并更新缓存索引中的路径。
+每个文件先硬链接到新路径、更新索引后再删除旧路径，迁移过程中服务可以继续运行
+
+运行方式（在Back目录下，与服务使用相同的下载目录）:
+    python -m tools.migrate_layout --root downloads
+    python -m tools.migrate_layout --root downloads --dry-run
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+from typing import Dict, List, Tuple
+
+from app.download_cache import DownloadCache
+from app.storage import FSYNC_NONE, ShardedStorage
+
+# 下载器生成的文件名：32位十六进制哈希 + 扩展名
+MANAGED_NAME = re.compile(r"^[0-9a-f]{32}\.")
+
+
+def link_or_move(old_path: str, new_path: str):
+    """
+    让文件同时出现在新路径（不支持硬链接的文件系统上直接重命名）
+
+    参数:
+    - old_path: 原路径
+    - new_path: 新路径
+    """
+    try:
+        os.link(old_path, new_path)
+    except OSError:
+        os.replace(old_path, new_path)
+
+
+def migrate(root: str, batch_size: int = 500, dry_run: bool = False) -> Dict[str, int]:
+    """
+    迁移下载目录
+
+    参数:
+    - root: 下载目录
+    - batch_size: 每批迁移的文件数（每批更新一次索引）
+    - dry_run: 只统计不修改
+
+    返回:
+    - 迁移统计
+    """
+    storage = ShardedStorage(root, fsync=FSYNC_NONE)
+    cache = DownloadCache(os.path.join(root, "cache.db"))
+    counts = {"moved": 0, "index_updated": 0, "skipped": 0}
+
+    def flush(batch: List[Tuple[str, str]]):
+        if dry_run:
+            return
+        counts["index_updated"] += cache.relocate_many(batch)
+        for old_path, _ in batch:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+
+    batch: List[Tuple[str, str]] = []
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            if not MANAGED_NAME.match(entry.name):
+                # 数据库文件、旧版本按标题命名的文件等不移动
+                counts["skipped"] += 1
+                continue
+
+            new_path = storage.path(entry.name, create=not dry_run)
+            if not dry_run and not os.path.exists(new_path):
+                link_or_move(entry.path, new_path)
+            batch.append((entry.path, new_path))
+            counts["moved"] += 1
+
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    flush(batch)
+    return counts
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="下载目录布局迁移（平铺 -> 分片子目录）")
+    parser.add_argument("--root", default=os.getenv("DOWNLOAD_DIR", "downloads"), help="下载目录")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批迁移的文件数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计不修改")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    started = time.perf_counter()
+    counts = migrate(args.root, args.batch_size, args.dry_run)
+    print(f"迁移文件: {counts['moved']}，更新索引: {counts['index_updated']}，跳过: {counts['skipped']}，"
+          f"耗时: {time.perf_counter() - started:.2f}s" + ("（未修改）" if args.dry_run else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -226,7 +226,7 @@ Page({
     return qualityMap[this.data.qualityIndex] || 'best'
   },
 
-  // 调用下载API
+  // 调用下载API（提交异步任务后轮询结果，避免长时间占用连接）
   callDownloadAPI: function (requestData) {
     // 显示加载提示
     wx.showLoading({
@@ -234,34 +234,108 @@ Page({
       mask: true
     })
 
-    // 发起网络请求
+    // 提交下载任务
     wx.request({
-      url: `${this.data.apiBaseUrl}/api/download`,
+      url: `${this.data.apiBaseUrl}/api/jobs`,
       method: 'POST',
       header: {
         'Content-Type': 'application/json'
       },
       data: requestData,
       success: (res) => {
-        console.log('下载API响应:', res)
-        this.handleDownloadSuccess(res.data)
+        console.log('任务提交响应:', res)
+        if (res.data && res.data.job_id) {
+          this.pollJobStatus(res.data.job_id, 0)
+        } else {
+          this.finishDownload()
+          this.handleDownloadSuccess({
+            success: false,
+            message: (res.data && res.data.detail) || '任务提交失败，请重试'
+          })
+        }
       },
       fail: (err) => {
-        console.error('下载API失败:', err)
+        console.error('任务提交失败:', err)
+        this.finishDownload()
         this.handleDownloadError(err)
+      }
+    })
+  },
+
+  // 轮询任务状态
+  pollJobStatus: function (jobId, attempt) {
+    const pollInterval = 1500  // 轮询间隔（毫秒）
+    const maxAttempts = 400  // 最多轮询次数（约10分钟）
+
+    if (attempt >= maxAttempts) {
+      this.finishDownload()
+      this.handleDownloadError({ errMsg: 'request:fail timeout' })
+      return
+    }
+
+    wx.request({
+      url: `${this.data.apiBaseUrl}/api/jobs/${jobId}`,
+      method: 'GET',
+      success: (res) => {
+        const job = res.data || {}
+        console.log('任务状态:', job.status)
+
+        if (job.status === 'succeeded') {
+          this.finishDownload()
+          this.handleDownloadSuccess(job.result)
+        } else if (job.status === 'failed' || res.statusCode === 404) {
+          this.finishDownload()
+          this.handleDownloadSuccess({
+            success: false,
+            message: job.error || job.detail || '下载失败，请重试'
+          })
+        } else {
+          // 任务未结束，显示进度后稍后继续查询
+          this.showProgress(job.progress)
+          setTimeout(() => this.pollJobStatus(jobId, attempt + 1), pollInterval)
+        }
       },
-      complete: () => {
-        // 隐藏加载提示
-        wx.hideLoading()
-        
-        // 重置下载状态
-        this.setData({
-          isDownloading: false
-        })
+      fail: (err) => {
+        console.error('查询任务状态失败:', err)
+        this.finishDownload()
+        this.handleDownloadError(err)
       }
     })
   },
 
+  // 显示下载进度
+  showProgress: function (progress) {
+    if (!progress) {
+      return
+    }
+
+    const stageText = {
+      queued: '排队中...',
+      extract: '解析视频...',
+      download: '正在下载',
+      postprocess: '处理视频...'
+    }
+    let title = stageText[progress.stage] || '正在下载...'
+    if (progress.stage === 'download' && progress.percent != null) {
+      title = `正在下载 ${Math.floor(progress.percent)}%`
+    }
+    wx.showLoading({
+      title: title,
+      mask: true
+    })
+  },
+
+  // 结束下载状态
+  finishDownload: function () {
+    // 隐藏加载提示
+    wx.hideLoading()
+
+    // 重置下载状态
+    this.setData({
+      isDownloading: false
+    })
+  },
+
   // 处理下载成功
   handleDownloadSuccess: function (data) {
     console.log('下载成功:', data)